@@ -0,0 +1,94 @@
+""" Builds a small fake /sys hierarchy for tests that need USB and PCI devices. """
+import os
+import pathlib
+
+
+class FakeSysfs(object):
+
+    def __init__(self, tmp_path):
+        self.sys_path = pathlib.Path(tmp_path).resolve() / "sys"
+        self.devices_path = self.sys_path / "devices"
+        self.devices_path.mkdir(parents=True)
+
+    @property
+    def basepath(self):
+        return str(self.devices_path)
+
+    @property
+    def sys_bus_dirpath(self):
+        return str(self.sys_path / "bus")
+
+    def link_to_bus(self, bus, device_path):
+        bus_dirpath = self.sys_path / "bus" / bus / "devices"
+        bus_dirpath.mkdir(parents=True, exist_ok=True)
+        os.symlink(device_path, bus_dirpath / device_path.name)
+
+    def add_other(self, relpath):
+        device_path = self.devices_path / relpath
+        device_path.mkdir(parents=True, exist_ok=True)
+        (device_path / "power").mkdir(exist_ok=True)
+        return str(device_path)
+
+    def add_pci_device(self, relpath, vendor, device, pci_class="0x0c0330"):
+        device_path = self.devices_path / relpath
+        device_path.mkdir(parents=True)
+        (device_path / "power").mkdir()
+        (device_path / "vendor").write_text(vendor + "\n")
+        (device_path / "device").write_text(device + "\n")
+        (device_path / "class").write_text(pci_class + "\n")
+        self.link_to_bus("pci", device_path)
+        return str(device_path)
+
+    def add_usb_device(self, relpath, id_vendor, id_product, busnum, devnum, product=None):
+        device_path = self.devices_path / relpath
+        device_path.mkdir(parents=True)
+        (device_path / "power").mkdir()
+        (device_path / "ep_00").mkdir()
+        attributes = {
+            "idVendor": id_vendor,
+            "idProduct": id_product,
+            "busnum": str(busnum),
+            "devnum": str(devnum),
+        }
+        if product is not None:
+            attributes["product"] = product
+        for filename, value in attributes.items():
+            (device_path / filename).write_text(value + "\n")
+        (device_path / "uevent").write_text(
+            f"DEVTYPE=usb_device\nPRODUCT={int(id_vendor, 16):x}/{int(id_product, 16):x}/100\n"
+            f"BUSNUM={busnum:03d}\nDEVNUM={devnum:03d}\n")
+        self.link_to_bus("usb", device_path)
+        if device_path.name.startswith("usb"):
+            interface_path = device_path / f"{device_path.name[3:]}-0:1.0"
+        else:
+            interface_path = device_path / f"{device_path.name}:1.0"
+        interface_path.mkdir()
+        (interface_path / "ep_81").mkdir()
+        self.link_to_bus("usb", interface_path)
+        return str(device_path)
+
+    def remove_device(self, dirpath):
+        for bus in ["usb", "pci"]:
+            bus_dirpath = self.sys_path / "bus" / bus / "devices"
+            if bus_dirpath.is_dir():
+                for link in list(bus_dirpath.iterdir()):
+                    if os.path.realpath(link).startswith(dirpath):
+                        link.unlink()
+        for root, dirnames, filenames in os.walk(dirpath, topdown=False):
+            for filename in filenames:
+                os.unlink(os.path.join(root, filename))
+            for dirname in dirnames:
+                os.rmdir(os.path.join(root, dirname))
+        os.rmdir(dirpath)
+
+
+def make_typical_sysfs(tmp_path):
+    """ A PCI USB controller with a root hub, a hub, and a network adapter plugged into the hub. """
+    sysfs = FakeSysfs(tmp_path)
+    sysfs.add_other("pci0000:00")
+    sysfs.add_pci_device("pci0000:00/0000:00:14.0", "0x8086", "0xa36d")
+    sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1", "1d6b", "0002", 1, 1)
+    sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2", "05e3", "0610", 1, 2)
+    sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.1", "0bda", "8153", 1, 3, product="USB 10/100/1000 LAN")
+    sysfs.add_other("virtual/net/lo")
+    return sysfs
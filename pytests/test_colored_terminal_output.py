@@ -20,3 +20,10 @@ def test_print_more_concise():
     print(f"Base text {start('blue')} some blue text "
           f"{start('red')}red test{end('red')} "
           f"some more blue text  {end('blue')} more base text")
+
+
+def test_escape_sequences_are_shared():
+    escape_sequence = astutus.util.AnsiSequenceStack.attribute_to_escape_sequence('orange')
+    assert escape_sequence == '\x1b[38;2;255;165;0m'
+    assert astutus.util.AnsiSequenceStack.escape_sequence_by_attribute['orange'] is escape_sequence
+    assert astutus.util.AnsiSequenceStack.attribute_to_escape_sequence('#FFA500') == escape_sequence
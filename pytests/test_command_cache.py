@@ -0,0 +1,116 @@
+import threading
+
+import astutus.util
+import astutus.util.command_cache
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_counting_runner():
+    calls = []
+
+    def counting_runner(cmd, cwd=None):
+        calls.append((cmd, cwd))
+        return 0, f"{cmd} {len(calls)}", ""
+
+    return counting_runner, calls
+
+
+def test_results_expire_after_ttl():
+    runner, calls = make_counting_runner()
+    clock = FakeClock()
+    cache = astutus.util.command_cache.CommandCache(
+        default_ttl=10.0, ttls={'lsusb': 2.0, 'lsusb -v': 0}, command_runner=runner, clock=clock)
+    assert cache.run_cmd('lspci') == (0, 'lspci 1', '')
+    assert cache.run_cmd('lsusb') == (0, 'lsusb 2', '')
+    clock.now = 5.0
+    assert cache.run_cmd('lspci') == (0, 'lspci 1', '')
+    assert cache.run_cmd('lsusb') == (0, 'lsusb 3', '')
+    # A zero time to live disables caching.
+    cache.run_cmd('lsusb -v')
+    cache.run_cmd('lsusb -v')
+    assert len(calls) == 5
+    # The working directory is part of the key.
+    cache.run_cmd('lspci', cwd='/tmp')
+    assert len(calls) == 6
+    stats = cache.get_stats()
+    assert stats[0] == {'cmd': 'lspci', 'hits': 1, 'misses': 2}
+
+
+def test_lru_eviction_and_invalidation():
+    runner, calls = make_counting_runner()
+    cache = astutus.util.command_cache.CommandCache(max_entries=2, command_runner=runner)
+    cache.run_cmd('a')
+    cache.run_cmd('b')
+    cache.run_cmd('a')
+    cache.run_cmd('c')  # Evicts b, the least recently used.
+    assert len(calls) == 3
+    cache.run_cmd('a')
+    assert len(calls) == 3
+    cache.run_cmd('b')
+    assert len(calls) == 4
+    assert cache.invalidate('b') == 1
+    cache.run_cmd('b')
+    assert len(calls) == 5
+    assert cache.invalidate() == 2
+
+
+def test_concurrent_calls_run_once():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_runner(cmd, cwd=None):
+        calls.append(cmd)
+        started.set()
+        release.wait(5)
+        return 0, 'slow', ''
+
+    cache = astutus.util.command_cache.CommandCache(command_runner=slow_runner)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.run_cmd('slow'))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ['slow']
+    assert results == [(0, 'slow', '')] * 4
+
+
+def test_run_cmds_with_command_runner():
+    runner, calls = make_counting_runner()
+    cache = astutus.util.command_cache.CommandCache(command_runner=runner)
+    astutus.util.run_cmds(['a', 'a', 'b'], command_runner=cache.run_cmd)
+    assert calls == [('a', None), ('b', None)]
+
+
+def test_argument_list_commands_and_failures():
+    calls = []
+
+    def runner(cmd, cwd=None):
+        calls.append(cmd)
+        return (1, '', 'failed') if cmd == ['false'] else (0, 'ok', '')
+
+    cache = astutus.util.command_cache.CommandCache(ttls={'lsusb -v': 0}, command_runner=runner)
+    cache.run_cmd(['lsusb', '-t'])
+    cache.run_cmd(['lsusb', '-t'])
+    assert calls == [['lsusb', '-t']]
+    # Time to live prefixes and invalidation match the shell quoted form of argument lists.
+    cache.run_cmd(['lsusb', '-v'])
+    cache.run_cmd(['lsusb', '-v'])
+    assert len(calls) == 3
+    assert cache.invalidate('lsusb -t') == 1
+    # Failures are not cached.
+    assert cache.run_cmd(['false']) == (1, '', 'failed')
+    assert cache.run_cmd(['false']) == (1, '', 'failed')
+    assert calls[-2:] == [['false'], ['false']]
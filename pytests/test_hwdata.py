@@ -0,0 +1,115 @@
+import astutus.util.hwdata
+import astutus.util.pci
+
+SAMPLE_USB_IDS = """\
+# List of USB ID's
+1a86  QinHeng Electronics
+\t7523  CH340 serial converter
+\t\t00  some interface
+1d6b  Linux Foundation
+\t0002  2.0 root hub
+
+# List of known device classes, subclasses and protocols
+C 09  Hub
+\t00  Unused
+\t\t01  Single TT
+AT 0000  Undefined
+"""
+
+SAMPLE_PCI_IDS = """\
+8086  Intel Corporation
+\ta36d  Cannon Lake PCH USB 3.1 xHCI Host Controller
+\t\t1028 085c  Dell xHCI Host Controller
+C 0c  Serial bus controller
+\t03  USB controller
+\t\t30  XHCI
+"""
+
+
+def write_ids_file(tmp_path, name, content):
+    filepath = tmp_path / name
+    filepath.write_text(content)
+    return str(filepath)
+
+
+def test_parse_usb_ids(tmp_path):
+    filepath = write_ids_file(tmp_path, "usb.ids", SAMPLE_USB_IDS)
+    database = astutus.util.hwdata.load_ids_database(filepath, cache_dirpath=str(tmp_path / "cache"))
+    assert database.vendor_name("1a86") == "QinHeng Electronics"
+    assert database.device_name("1a86", "7523") == "CH340 serial converter"
+    assert database.device_name("1a86", "0000") is None
+    assert database.class_name("09") == "Hub"
+    assert database.class_name("0900") == "Unused"
+    assert database.class_name("090001") == "Single TT"
+    assert len(database.subsystems) == 0
+
+
+def test_parse_pci_ids(tmp_path):
+    filepath = write_ids_file(tmp_path, "pci.ids", SAMPLE_PCI_IDS)
+    database = astutus.util.hwdata.load_ids_database(filepath, cache_dirpath=str(tmp_path / "cache"))
+    assert database.vendor_name("0x8086") == "Intel Corporation"
+    assert database.subsystem_name("0x8086", "0xa36d", "1028", "085c") == "Dell xHCI Host Controller"
+    assert database.class_name("0C0330") == "XHCI"
+
+
+def test_database_cached_on_disk(tmp_path):
+    filepath = write_ids_file(tmp_path, "usb.ids", SAMPLE_USB_IDS)
+    cache_dirpath = tmp_path / "cache"
+    astutus.util.hwdata.load_ids_database(filepath, cache_dirpath=str(cache_dirpath))
+    assert (cache_dirpath / "usb.ids.pickle").is_file()
+    database = astutus.util.hwdata.load_ids_database(filepath, cache_dirpath=str(cache_dirpath))
+    assert database.vendor_name("1d6b") == "Linux Foundation"
+    # Changing the source invalidates the cached form.
+    write_ids_file(tmp_path, "usb.ids", SAMPLE_USB_IDS + "1234  Added Vendor\n")
+    database = astutus.util.hwdata.load_ids_database(filepath, cache_dirpath=str(cache_dirpath))
+    assert database.vendor_name("1234") == "Added Vendor"
+
+
+def test_pci_device_info_from_sysfs(tmp_path):
+    device_path = tmp_path / "0000:00:14.0"
+    device_path.mkdir()
+    attributes = {
+        "vendor": "0x8086",
+        "device": "0xa36d",
+        "class": "0x0c0330",
+        "subsystem_vendor": "0x1028",
+        "subsystem_device": "0x085c",
+        "revision": "0x10",
+        "numa_node": "-1",
+    }
+    for filename, value in attributes.items():
+        (device_path / filename).write_text(value + "\n")
+    database = astutus.util.hwdata.IdsDatabase()
+    database.parse_lines(SAMPLE_PCI_IDS.splitlines())
+    astutus.util.hwdata.pci_ids = database
+    astutus.util.hwdata.pci_ids_loaded = True
+    try:
+        device_info = astutus.util.pci.get_device_info_for_slot("00:14.0", sysfs_dirpath=str(tmp_path))
+        slot_to_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_sysfs(sysfs_dirpath=str(tmp_path))
+    finally:
+        astutus.util.hwdata.pci_ids = None
+        astutus.util.hwdata.pci_ids_loaded = False
+    assert device_info == {
+        "Slot": "00:14.0",
+        "Class": "USB controller",
+        "Vendor": "Intel Corporation",
+        "Device": "Cannon Lake PCH USB 3.1 xHCI Host Controller",
+        "SVendor": "Vendor 1028",
+        "SDevice": "Dell xHCI Host Controller",
+        "Rev": "10",
+        "ProgIf": "30",
+    }
+    assert slot_to_device_info_map == {"00:14.0": device_info}
+
+
+def test_pci_device_info_from_lspci_uses_command_runner(tmp_path):
+    cmds = []
+
+    def command_runner(cmd):
+        cmds.append(cmd)
+        return 0, "Slot:\t00:14.0\nClass:\tUSB controller\nVendor:\tIntel Corporation\n\n", ""
+
+    device_info = astutus.util.pci.get_device_info_for_slot(
+        "00:14.0", sysfs_dirpath=str(tmp_path / "missing"), command_runner=command_runner)
+    assert cmds == ["lspci -mm -v"]
+    assert device_info == {"Slot": "00:14.0", "Class": "USB controller", "Vendor": "Intel Corporation"}
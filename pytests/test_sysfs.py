@@ -0,0 +1,69 @@
+import astutus.usb.node
+import astutus.usb.usb_impl
+import astutus.util.sysfs
+
+
+def make_usb_device_dir(tmp_path):
+    device_path = tmp_path / "usb1" / "1-1"
+    device_path.mkdir(parents=True)
+    (device_path / "busnum").write_text("1\n")
+    (device_path / "devnum").write_text("3\n")
+    (device_path / "idVendor").write_text("1a86\n")
+    (device_path / "idProduct").write_text("7523\n")
+    return device_path
+
+
+def test_read_attribute(tmp_path):
+    device_path = make_usb_device_dir(tmp_path)
+    assert astutus.util.sysfs.read_attribute(str(device_path), "idVendor") == "1a86"
+    assert astutus.util.sysfs.read_attribute(str(device_path), "serial") is None
+
+
+def test_read_attributes_skips_missing(tmp_path):
+    device_path = make_usb_device_dir(tmp_path)
+    attributes = astutus.util.sysfs.read_attributes(str(device_path), ["busnum", "devnum", "serial"])
+    assert attributes == {"busnum": "1", "devnum": "3"}
+
+
+def test_read_attributes_missing_directory(tmp_path):
+    assert astutus.util.sysfs.read_attributes(str(tmp_path / "nowhere"), ["busnum"]) == {}
+
+
+def test_extract_specified_data(tmp_path):
+    device_path = make_usb_device_dir(tmp_path)
+    data = astutus.usb.usb_impl.extract_specified_data(str(device_path), astutus.usb.usb_impl.USB_KEY_ATTRIBUTES)
+    assert data["dirname"] == "1-1"
+    assert data["parent_dirpath"] == str(tmp_path / "usb1")
+    assert data["idVendor"] == "1a86"
+    assert data.get("serial") is None
+
+
+def test_read_uevent(tmp_path):
+    device_path = make_usb_device_dir(tmp_path)
+    (device_path / "uevent").write_text("DEVTYPE=usb_device\nPRODUCT=1a86/7523/264\nBUSNUM=001\nDEVNUM=003\n")
+    uevent = astutus.util.sysfs.read_uevent(str(device_path))
+    assert uevent["PRODUCT"] == "1a86/7523/264"
+    assert astutus.util.sysfs.read_uevent(str(tmp_path)) == {}
+
+
+def test_usb_extract_data_from_uevent_matches_files(tmp_path):
+    device_path = make_usb_device_dir(tmp_path)
+    (device_path / "uevent").write_text("DEVTYPE=usb_device\nPRODUCT=1a86/7523/264\nBUSNUM=001\nDEVNUM=003\n")
+    (device_path / "product").write_text("USB Serial\n")
+    from_uevent = astutus.usb.node.UsbDeviceNodeData.extract_data(str(device_path), use_uevent=True)
+    from_files = astutus.usb.node.UsbDeviceNodeData.extract_data(str(device_path), use_uevent=False)
+    assert from_uevent == from_files
+    assert from_uevent["node_id"] == "usb(1a86:7523)"
+    assert from_uevent["product"] == "USB Serial"
+
+
+def test_pci_extract_data_from_uevent(tmp_path):
+    device_path = tmp_path / "0000:00:14.0"
+    device_path.mkdir()
+    (device_path / "uevent").write_text(
+        "DRIVER=xhci_hcd\nPCI_CLASS=C0330\nPCI_ID=8086:A36D\nPCI_SLOT_NAME=0000:00:14.0\n")
+    data = astutus.usb.node.PciDeviceNodeData.extract_data(str(device_path))
+    assert data["vendor"] == "0x8086"
+    assert data["device"] == "0xa36d"
+    assert data["class"] == "0x0c0330"
+    assert data["node_id"] == "pci(0x8086:0xa36d)"
@@ -0,0 +1,17 @@
+import astutus.util.templates
+
+
+def test_render_with_missing_fields():
+    data = {"product": "Hub", "busnum": 1}
+    assert astutus.util.templates.render("{product} - {serial}", data) == "Hub - --serial missing--"
+    assert astutus.util.templates.render("{busnum:03d} {product!r:>6}", data) == "001  'Hub'"
+    assert astutus.util.templates.render("{product}", {"product": "Override"}, data) == "Override"
+    assert astutus.util.templates.render("no fields", data) == "no fields"
+    assert astutus.util.templates.render("{{literal}} {product}", data) == "{literal} Hub"
+
+
+def test_compiled_templates_are_shared():
+    compiled = astutus.util.templates.compile_template("{Device} on {Slot}")
+    assert compiled is astutus.util.templates.compile_template("{Device} on {Slot}")
+    assert compiled.field_names == ["Device", "Slot"]
+    assert astutus.util.templates.find_field_names("{a.b} {c[0]} {d:{width}}") == ["a", "c", "d", "width"]
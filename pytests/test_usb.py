@@ -4,6 +4,7 @@ import pathlib
 
 import astutus.usb
 import astutus.usb.device_aliases
+import astutus.usb.node
 import pytest
 
 logger = logging.getLogger(__name__)
@@ -89,3 +90,33 @@ def test_execute_tree_cmd():
     print("Start Tree")
     print(tree_html)
     print("End Tree")
+
+
+def test_device_node_labels_are_lazy_and_not_serialized():
+    node = astutus.usb.node.OtherDeviceNodeData(
+        data={"dirpath": "/sys/devices/virtual", "dirname": "virtual", "node_id": "other(virtual)"},
+        config=None,
+        alias=None)
+    assert node.labels == {}
+    assert "html_label" not in json.loads(json.dumps(node))
+    assert node["html_label"] == node.get("html_label") == node.html_label
+    assert "html_label" in node and "terminal_colored_description" in node
+    assert "html_label" not in node.keys()
+    assert '<span class="dirname_class">virtual</span>' in node.html_label
+    # Rendering the HTML label does not render the terminal labels.
+    assert list(node.labels) == ["html_label"]
+    assert node.colorized_node_label_for_terminal.startswith("virtual - ")
+    node.include_labels(["terminal_colored_description"])
+    assert list(json.loads(json.dumps(node))).count("terminal_colored_description") == 1
+
+
+def test_device_node_leaves_raw_data_untouched():
+    raw_data = {"dirpath": "/sys/devices/virtual", "dirname": "virtual", "node_id": "other(virtual)"}
+    node = astutus.usb.node.OtherDeviceNodeData(data=raw_data, config=None, alias=None)
+    assert raw_data == {"dirpath": "/sys/devices/virtual", "dirname": "virtual", "node_id": "other(virtual)"}
+    assert node["description"] == "/sys/devices/virtual"
+    assert node["dirname"] == "virtual"
+    # The payload is held once, by the node itself.
+    assert node.data is node
+    assert astutus.usb.node.robust_format_map("{dirname} {serial}", raw_data) == "virtual --serial missing--"
+    assert "serial" not in raw_data
@@ -0,0 +1,48 @@
+import astutus.usb.compact_tree
+
+
+def make_tree():
+    tree = astutus.usb.compact_tree.CompactTree()
+    tree.create_node("devices", "/sys/devices", data="root")
+    tree.create_node("pci0000:00", "/sys/devices/pci0000:00", parent="/sys/devices", data="bus")
+    tree.create_node("usb2", "/sys/devices/pci0000:00/usb2", parent="/sys/devices/pci0000:00", data="hub 2")
+    tree.create_node("usb1", "/sys/devices/pci0000:00/usb1", parent="/sys/devices/pci0000:00", data="hub 1")
+    tree.create_node("1-1", "/sys/devices/pci0000:00/usb1/1-1", parent="/sys/devices/pci0000:00/usb1", data="dev")
+    tree.create_node("platform", "/sys/devices/platform", parent="/sys/devices", data="platform")
+    return tree
+
+
+def test_structure():
+    tree = make_tree()
+    assert len(tree) == 6
+    bus = tree.get_nid("/sys/devices/pci0000:00")
+    assert [tree.tags[child] for child in tree.children(bus)] == ["usb2", "usb1"]
+    assert [tree.tags[child] for child in tree.sorted_children(bus)] == ["usb1", "usb2"]
+    assert tree.node(tree.get_nid("/sys/devices/pci0000:00/usb1/1-1")).data == "dev"
+    assert [depth for _, depth in tree.iter_depth_first()] == [0, 1, 2, 3, 2, 1]
+
+
+def test_to_dict():
+    tree = make_tree()
+    assert tree.to_dict() == {
+        "devices": {"children": [
+            {"pci0000:00": {"children": [{"usb1": {"children": ["1-1"]}}, "usb2"]}},
+            "platform",
+        ]}
+    }
+    tree_dict = tree.to_dict(with_data=True)
+    assert tree_dict["devices"]["data"] == "root"
+    assert tree_dict["devices"]["children"][1] == {"platform": {"data": "platform"}}
+
+
+def test_show():
+    tree = make_tree()
+    rendered = tree.show(stdout=False, key=lambda node: node.data)
+    assert rendered == (
+        "devices\n"
+        "├── pci0000:00\n"
+        "│   ├── usb1\n"
+        "│   │   └── 1-1\n"
+        "│   └── usb2\n"
+        "└── platform\n"
+    )
@@ -0,0 +1,36 @@
+import astutus.usb.descriptors
+
+# Device descriptor for a 046d:c52b Logitech Unifying Receiver
+DEVICE_DESCRIPTOR = bytes([
+    0x12, 0x01, 0x00, 0x02, 0x00, 0x00, 0x00, 0x08,
+    0x6d, 0x04, 0x2b, 0xc5, 0x11, 0x12, 0x01, 0x02,
+    0x00, 0x01])
+CONFIGURATION_DESCRIPTOR = bytes([0x09, 0x02, 0x54, 0x00, 0x02, 0x01, 0x04, 0xa0, 0x31])
+HID_INTERFACE_DESCRIPTOR = bytes([0x09, 0x04, 0x00, 0x00, 0x01, 0x03, 0x01, 0x01, 0x00])
+VENDOR_INTERFACE_DESCRIPTOR = bytes([0x09, 0x04, 0x01, 0x00, 0x01, 0xff, 0x00, 0x00, 0x00])
+ENDPOINT_DESCRIPTOR = bytes([0x07, 0x05, 0x81, 0x03, 0x08, 0x00, 0x08])
+
+
+def test_parse_descriptors():
+    raw_descriptors = (
+        DEVICE_DESCRIPTOR
+        + CONFIGURATION_DESCRIPTOR
+        + HID_INTERFACE_DESCRIPTOR + ENDPOINT_DESCRIPTOR
+        + VENDOR_INTERFACE_DESCRIPTOR + ENDPOINT_DESCRIPTOR)
+    descriptors = astutus.usb.descriptors.parse_descriptors(raw_descriptors)
+    assert descriptors['idVendor'] == '046d'
+    assert descriptors['idProduct'] == 'c52b'
+    assert descriptors['bDeviceClass'] == 0
+    assert descriptors['bInterfaceClass_list'] == [0x03, 0xff]
+
+
+def test_parse_truncated_descriptors():
+    descriptors = astutus.usb.descriptors.parse_descriptors(DEVICE_DESCRIPTOR + bytes([0x00, 0x04]))
+    assert descriptors['idVendor'] == '046d'
+    assert descriptors['bInterfaceClass_list'] == []
+
+
+def test_class_name():
+    assert astutus.usb.descriptors.class_name(0x09) == 'Hub'
+    assert astutus.usb.descriptors.class_name(0x03) == 'Human Interface Device'
+    assert astutus.usb.descriptors.class_name(0x42) == '[unknown]'
@@ -2,6 +2,7 @@ import logging
 import json
 
 from astutus.usb import DeviceConfigurations
+import astutus.usb
 import astutus.util
 import pytest
 
@@ -46,3 +47,9 @@ def test_to_generate_command_runner_data():
 
     with open('device_configurations_command_record.json', 'w') as config_file:
         json.dump(command_results, config_file, indent=4, sort_keys=True)
+
+
+def test_device_configuration_resolves_colors_once():
+    config = astutus.usb.DeviceConfiguration({"name_of_config": "Test", "color": "orange", "description_template": "x"})
+    assert config.stylers == [{"color": "#ffa500", "description_template": "x"}]
+    assert config.stylers is config.stylers
@@ -0,0 +1,87 @@
+import json
+import socket
+
+import astutus.usb.hotplug
+import astutus.usb.tree
+import fake_sysfs
+import pytest
+
+
+def usb_event(action, sysfs, dirpath, devtype="usb_device"):
+    return {
+        "ACTION": action,
+        "DEVPATH": dirpath[len(str(sysfs.sys_path)):],
+        "SUBSYSTEM": "usb",
+        "DEVTYPE": devtype,
+    }
+
+
+def test_parse_uevent_message():
+    message = b"add@/devices/pci0000:00/usb1/1-2\0ACTION=add\0DEVPATH=/devices/pci0000:00/usb1/1-2\0SUBSYSTEM=usb\0"
+    event = astutus.usb.hotplug.parse_uevent_message(message)
+    assert event == {"ACTION": "add", "DEVPATH": "/devices/pci0000:00/usb1/1-2", "SUBSYSTEM": "usb"}
+    assert astutus.usb.hotplug.parse_uevent_message(b"libudev\0\xfe\xed") is None
+
+
+def test_replay_applies_events_to_tree(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    tree.get_tree_as_dict()
+    # Plug a second hub and a webcam into the root hub, and unplug the network adapter.
+    hub_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-3", "05e3", "0610", 1, 4)
+    webcam_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-3/1-3.1", "046d", "082c", 1, 5)
+    adapter_path = sysfs.basepath + "/pci0000:00/0000:00:14.0/usb1/1-2/1-2.1"
+    events = [
+        usb_event("add", sysfs, hub_path),
+        usb_event("add", sysfs, hub_path + "/1-3:1.0", devtype="usb_interface"),
+        usb_event("add", sysfs, webcam_path),
+        usb_event("remove", sysfs, adapter_path),
+    ]
+    log_filepath = tmp_path / "uevents.log"
+    log_filepath.write_text("".join(json.dumps(event) + "\n" for event in events))
+    source = astutus.usb.hotplug.ReplayUeventSource.from_file(str(log_filepath))
+    monitor = astutus.usb.hotplug.HotplugMonitor(tree, source, sys_dirpath=str(sysfs.sys_path))
+    deltas = []
+    monitor.subscribe(lambda event, delta: deltas.append((event["ACTION"], delta)))
+    sysfs.remove_device(adapter_path)
+    monitor.run()
+    assert deltas == [
+        ("add", {"added": [hub_path], "removed": [], "changed": []}),
+        ("add", {"added": [webcam_path], "removed": [], "changed": []}),
+        ("remove", {"added": [], "removed": [adapter_path], "changed": []}),
+    ]
+    assert webcam_path in tree.get_compact_tree()
+    assert adapter_path not in tree.get_compact_tree()
+    assert tree.get_data_by_dirpath()[webcam_path]["nodepath"].endswith("/usb(05e3:0610)/usb(046d:082c)")
+    # The tree built in place matches one built from scratch.
+    fresh_tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    assert sorted(fresh_tree.get_data_by_dirpath()) == sorted(tree.get_data_by_dirpath())
+
+
+def test_netlink_source_can_be_closed():
+    try:
+        source = astutus.usb.hotplug.NetlinkUeventSource()
+    except (OSError, AttributeError) as exception:
+        pytest.skip(f"netlink uevent sockets not available: {exception}")
+    assert isinstance(source.sock, socket.socket)
+    source.close()
+    assert list(source.events()) == []
+
+
+def test_add_event_for_vanished_device_is_ignored(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    tree.get_tree_as_dict()
+    # A hub that is plugged in and unplugged again before its add event is handled.
+    hub_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-3", "05e3", "0610", 1, 4)
+    sysfs.remove_device(hub_path)
+    webcam_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-4", "046d", "082c", 1, 5)
+    events = [usb_event("add", sysfs, hub_path), usb_event("add", sysfs, webcam_path)]
+    source = astutus.usb.hotplug.ReplayUeventSource(events)
+    monitor = astutus.usb.hotplug.HotplugMonitor(tree, source, sys_dirpath=str(sysfs.sys_path))
+    deltas = []
+    monitor.subscribe(lambda event, delta: deltas.append(delta))
+    monitor.run()
+    assert deltas == [{"added": [webcam_path], "removed": [], "changed": []}]
+    assert hub_path not in tree.get_compact_tree()
+    assert webcam_path in tree.get_compact_tree()
@@ -0,0 +1,69 @@
+import astutus.usb.device_aliases
+import astutus.usb.paths
+
+
+def test_path_table_interns_paths():
+    table = astutus.usb.paths.PathTable()
+    path_id = table.intern("/sys/devices/pci0000:00/0000:00:14.0")
+    assert table.path(path_id) == "/sys/devices/pci0000:00/0000:00:14.0"
+    assert table.name(path_id) == "0000:00:14.0"
+    assert table.path(table.parent(path_id)) == "/sys/devices/pci0000:00"
+    size = len(table)
+    sibling_id = table.intern("/sys/devices/pci0000:00/0000:00:1a.0")
+    # Only the last component is new.
+    assert len(table) == size + 1
+    assert table.parent(sibling_id) == table.parent(path_id)
+    assert table.intern("/sys/devices/pci0000:00/0000:00:14.0") == path_id
+    assert table.canonical("/sys/devices/pci0000:00/" + "0000:00:14.0") is table.path(path_id)
+    assert table.split("/sys/devices/pci0000:00") == ("/sys/devices", "pci0000:00")
+    devices_id = table.find("/sys/devices")
+    assert [table.name(i) for i in table.lineage(path_id, devices_id)] == ["devices", "pci0000:00", "0000:00:14.0"]
+    assert table.find("/sys/class") is None
+
+
+def test_path_table_relative_paths():
+    table = astutus.usb.paths.PathTable()
+    parent_id = table.intern_child(astutus.usb.paths.NO_PATH, "usb(1d6b:0002)")
+    child_id = table.intern_child(parent_id, "usb(05e3:0610)")
+    assert table.path(child_id) == "usb(1d6b:0002)/usb(05e3:0610)"
+    assert table.intern("usb(1d6b:0002)/usb(05e3:0610)") == child_id
+
+
+def test_process_wide_table_is_replaced_when_full(monkeypatch):
+    monkeypatch.setattr(astutus.usb.paths, "MAX_PATHS", 4)
+    monkeypatch.setattr(astutus.usb.paths, "nodepath_table", None)
+    table = astutus.usb.paths.get_nodepath_table()
+    table.intern("a/b/c/d")
+    assert astutus.usb.paths.get_nodepath_table() is table
+    table.intern("a/b/c/e")
+    new_table = astutus.usb.paths.get_nodepath_table()
+    assert new_table is not table
+    assert len(new_table) == 0
+    # Ids already issued stay valid for the table that issued them.
+    assert table.path(table.find("a/b/c/e")) == "a/b/c/e"
+
+
+def test_device_aliases_forget_found_aliases_when_changed(tmp_path):
+    filepath = tmp_path / "device_aliases.json"
+    filepath.write_text("{}")
+    aliases = astutus.usb.device_aliases.DeviceAliases(filepath=str(filepath))
+    nodepath = "pci(0x8086:0xa36d)/usb(1d6b:0002)/usb(05e3:0610)"
+    assert aliases.find(nodepath) == []
+    alias = {"name": "hub", "color": "#ff0000", "description_template": "Hub", "order": "00", "priority": 50}
+    aliases["usb(05e3:0610)"] = alias
+    assert aliases.find(nodepath) == [alias]
+    del aliases["usb(05e3:0610)"]
+    assert aliases.find(nodepath) == []
+
+
+def test_device_aliases_forget_found_aliases_after_setdefault_and_popitem(tmp_path):
+    filepath = tmp_path / "device_aliases.json"
+    filepath.write_text("{}")
+    aliases = astutus.usb.device_aliases.DeviceAliases(filepath=str(filepath))
+    nodepath = "pci(0x8086:0xa36d)/usb(1d6b:0002)/usb(05e3:0610)"
+    assert aliases.find(nodepath) == []
+    alias = {"name": "hub", "color": "#ff0000", "description_template": "Hub", "order": "00", "priority": 50}
+    aliases.setdefault("usb(05e3:0610)", alias)
+    assert aliases.find(nodepath) == [alias]
+    assert aliases.popitem() == ("usb(05e3:0610)", alias)
+    assert aliases.find(nodepath) == []
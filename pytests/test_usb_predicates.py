@@ -0,0 +1,50 @@
+import astutus.usb.device_configurations
+import astutus.usb.predicates
+
+
+def make_receiver(tmp_path):
+    receiver_path = tmp_path / "1-2"
+    mouse_path = receiver_path / "1-2:1.2" / "0003:046D:4069.0004" / "input" / "input9" / "mouse1"
+    mouse_path.mkdir(parents=True)
+    (mouse_path / "uevent").write_text("MAJOR=13\nMINOR=33\nDEVNAME=input/mouse1\n")
+    (receiver_path / "idVendor").write_text("046d\n")
+    return receiver_path
+
+
+def test_subtree_contains(tmp_path):
+    receiver_path = make_receiver(tmp_path)
+    assert astutus.usb.predicates.subtree_contains(str(receiver_path), "mouse")
+    assert not astutus.usb.predicates.subtree_contains(str(receiver_path), "numlock")
+    # The uevent file is five levels below the receiver.
+    assert not astutus.usb.predicates.subtree_contains(str(receiver_path), "mouse", max_depth=4)
+
+
+def test_attribute_equals(tmp_path):
+    receiver_path = make_receiver(tmp_path)
+    assert astutus.usb.predicates.attribute_equals(str(receiver_path), "idVendor", "046d")
+    assert not astutus.usb.predicates.attribute_equals(str(receiver_path), "idVendor", "046")
+    assert not astutus.usb.predicates.attribute_equals(str(receiver_path), "idProduct", "c52b")
+
+
+def test_find_styler_memoizes_tests(tmp_path):
+    receiver_path = str(make_receiver(tmp_path))
+    commands = []
+
+    def recording_command_runner(cmd, cwd=None):
+        commands.append((cmd, cwd))
+        return 0, "", ""
+
+    config = {
+        "name_of_config": "Receiver",
+        "stylers": [
+            {"test": "value_in_stdout", "cmd": "grep -r . -e keyboard", "value": "keyboard", "color": "red"},
+            {"test": "subtree_contains", "value": "mouse", "color": "purple", "description_template": "mouse"},
+        ],
+    }
+    device_config = astutus.usb.device_configurations.DeviceConfiguration(config, recording_command_runner)
+    assert device_config.find_description_template(receiver_path) == "mouse"
+    assert device_config.get_color(receiver_path) == "#800080"
+    assert commands == [("grep -r . -e keyboard", receiver_path)]
+    device_config.predicate_cache.clear()
+    device_config.find_styler(receiver_path)
+    assert len(commands) == 2
@@ -0,0 +1,84 @@
+import astutus.usb.snapshot
+import astutus.usb.tree
+import fake_sysfs
+
+
+def make_tree(sysfs, snapshot_filepath):
+    return astutus.usb.tree.UsbDeviceTree(
+        basepath=sysfs.basepath,
+        device_aliases_filepath=None,
+        snapshot_filepath=snapshot_filepath,
+        sys_bus_dirpath=sysfs.sys_bus_dirpath)
+
+
+def test_snapshot_round_trip(tmp_path):
+    filepath = str(tmp_path / "snapshot")
+    data_by_dirpath = {
+        "/sys/devices/a": {"ilk": "other", "dirpath": "/sys/devices/a", "nodepath": None},
+        "/sys/devices/a/b": {"ilk": "usb", "dirpath": "/sys/devices/a/b", "product": "Café ☃"},
+    }
+    astutus.usb.snapshot.save_snapshot(
+        filepath,
+        boot_id="boot",
+        signature=b"s" * 32,
+        tree_dirpaths=list(data_by_dirpath),
+        usb_device_dirpaths=["/sys/devices/a/b"],
+        data_by_dirpath=data_by_dirpath)
+    tree_data = astutus.usb.snapshot.load_snapshot(filepath, boot_id="boot", signature=b"s" * 32)
+    assert tree_data == {
+        "tree_dirpaths": ["/sys/devices/a", "/sys/devices/a/b"],
+        "usb_device_dirpaths": ["/sys/devices/a/b"],
+        "ilk_by_dirpath": {"/sys/devices/a": "other", "/sys/devices/a/b": "usb"},
+        "data_by_dirpath": data_by_dirpath,
+    }
+    assert astutus.usb.snapshot.load_snapshot(filepath, boot_id="other boot", signature=b"s" * 32) is None
+    assert astutus.usb.snapshot.load_snapshot(filepath, boot_id="boot", signature=b"t" * 32) is None
+    # A node that refers to a string beyond the string table is treated as missing.
+    contents = bytearray((tmp_path / "snapshot").read_bytes())
+    contents[astutus.usb.snapshot.HEADER.size:astutus.usb.snapshot.HEADER.size + 4] = b"\xff\xff\xff\x7f"
+    (tmp_path / "snapshot").write_bytes(bytes(contents))
+    assert astutus.usb.snapshot.load_snapshot(filepath, boot_id="boot", signature=b"s" * 32) is None
+    (tmp_path / "snapshot").write_bytes(b"garbage")
+    assert astutus.usb.snapshot.load_snapshot(filepath, boot_id="boot", signature=b"s" * 32) is None
+
+
+def test_tree_uses_snapshot_until_topology_changes(tmp_path, monkeypatch):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    snapshot_filepath = str(tmp_path / "cache" / "usb_tree.snapshot")
+    expected_tree_dict = make_tree(sysfs, snapshot_filepath).get_tree_as_dict()
+
+    def fail_to_find_data(*args):
+        raise AssertionError("Data should have come from the snapshot")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(astutus.usb.tree.UsbDeviceTree, "find_data_for_paths", fail_to_find_data)
+        patch.setattr(astutus.usb.tree.UsbDeviceTree, "walk_basepath_for_usb", fail_to_find_data)
+        tree = make_tree(sysfs, snapshot_filepath)
+        assert tree.get_tree_as_dict() == expected_tree_dict
+        # The loaded tree can still be refreshed.
+        assert tree.signature_by_dirpath is not None
+
+    webcam_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.2", "046d", "082c", 1, 4)
+    tree = make_tree(sysfs, snapshot_filepath)
+    assert webcam_path in tree.get_data_by_dirpath()
+
+
+def test_walked_tree_snapshot_notices_devices_below_basepath(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    snapshot_filepath = str(tmp_path / "cache" / "usb_tree.snapshot")
+
+    def make_walked_tree():
+        # Without links in /sys/bus, only the walked directories can show that the topology changed.
+        return astutus.usb.tree.UsbDeviceTree(
+            basepath=sysfs.basepath,
+            device_aliases_filepath=None,
+            enumeration="walk",
+            snapshot_filepath=snapshot_filepath,
+            sys_bus_dirpath=str(tmp_path / "no_bus"))
+
+    make_walked_tree().get_data_by_dirpath()
+    assert make_walked_tree().load_snapshot()
+    webcam_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.2", "046d", "082c", 1, 4)
+    tree = make_walked_tree()
+    assert not tree.load_snapshot()
+    assert webcam_path in tree.get_data_by_dirpath()
@@ -0,0 +1,101 @@
+import os
+
+import astutus.usb.sysfs_index
+import astutus.usb.usb_impl
+
+
+def make_class_device(sys_path, class_name, name, device_dirpath):
+    class_device_path = sys_path / device_dirpath / name
+    class_device_path.mkdir(parents=True)
+    class_dirpath = sys_path / "class" / class_name
+    class_dirpath.mkdir(parents=True, exist_ok=True)
+    os.symlink(class_device_path, class_dirpath / name)
+
+
+def make_fake_sys(tmp_path):
+    sys_path = tmp_path.resolve() / "sys"
+    serial_interface = "devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2:1.0"
+    receiver_interface = "devices/pci0000:00/0000:00:14.0/usb1/1-3/1-3:1.0/0003:046D:C52B.0001"
+    make_class_device(sys_path, "tty", "ttyUSB0", serial_interface + "/ttyUSB0/tty")
+    make_class_device(sys_path, "input", "mouse0", receiver_interface + "/input/input5")
+    make_class_device(sys_path, "input", "event5", receiver_interface + "/input/input5")
+    make_class_device(sys_path, "leds", "input6::numlock", receiver_interface + "/input/input6")
+    return sys_path
+
+
+def test_find_class_devices_in_subtree(tmp_path):
+    sys_path = make_fake_sys(tmp_path)
+    index = astutus.usb.sysfs_index.ClassDeviceIndex(sys_class_dirpath=str(sys_path / "class"))
+    usb_device_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1/1-2")
+    assert index.find(usb_device_dirpath, "tty") == ["ttyUSB0"]
+    assert index.find(usb_device_dirpath, "input") == []
+    receiver_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1/1-3")
+    assert index.find(receiver_dirpath, "input") == ["event5", "mouse0"]
+    assert index.find(receiver_dirpath, "leds") == ["input6::numlock"]
+    hub_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1")
+    assert index.find(hub_dirpath + "/", "tty") == ["ttyUSB0"]
+
+
+def test_refresh_picks_up_new_devices(tmp_path):
+    sys_path = make_fake_sys(tmp_path)
+    index = astutus.usb.sysfs_index.ClassDeviceIndex(sys_class_dirpath=str(sys_path / "class"))
+    usb_device_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1/1-4")
+    assert index.find(usb_device_dirpath, "tty") == []
+    make_class_device(sys_path, "tty", "ttyACM0", "devices/pci0000:00/0000:00:14.0/usb1/1-4/1-4:1.0/tty")
+    index.refresh()
+    assert index.find(usb_device_dirpath, "tty") == ["ttyACM0"]
+
+
+def test_find_current_notices_renumbered_class_devices(tmp_path):
+    sys_path = make_fake_sys(tmp_path)
+    index = astutus.usb.sysfs_index.ClassDeviceIndex(sys_class_dirpath=str(sys_path / "class"))
+    usb_device_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1/1-2")
+    assert index.find_current(usb_device_dirpath, "tty") == ["ttyUSB0"]
+    # Replug the serial adapter, and plug in another one first, so that the names swap around.
+    os.unlink(sys_path / "class/tty/ttyUSB0")
+    make_class_device(sys_path, "tty", "ttyUSB0", "devices/pci0000:00/0000:00:14.0/usb1/1-4/1-4:1.0/ttyUSB0/tty")
+    make_class_device(sys_path, "tty", "ttyUSB1", "devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2:1.0/ttyUSB1/tty")
+    assert index.find(usb_device_dirpath, "tty") == ["ttyUSB0"]
+    assert index.find_current(usb_device_dirpath, "tty") == ["ttyUSB1"]
+
+
+def test_find_tty_from_pci_path_without_a_tty(tmp_path, monkeypatch):
+    sys_path = make_fake_sys(tmp_path)
+    index = astutus.usb.sysfs_index.ClassDeviceIndex(sys_class_dirpath=str(sys_path / "class"))
+    monkeypatch.setattr(astutus.usb.sysfs_index, "class_device_index", index)
+    usb1_dirpath = str(sys_path / "devices/pci0000:00/0000:00:14.0/usb1")
+    assert astutus.usb.usb_impl.find_tty_from_pci_path(usb1_dirpath + "/1-2") == "ttyUSB0"
+    assert astutus.usb.usb_impl.find_tty_from_pci_path(usb1_dirpath + "/1-3") is None
+
+
+def make_usb_device(sys_path, device_dirpath, id_vendor, id_product):
+    device_path = sys_path / device_dirpath
+    device_path.mkdir(parents=True)
+    (device_path / "idVendor").write_text(id_vendor + "\n")
+    (device_path / "idProduct").write_text(id_product + "\n")
+    bus_dirpath = sys_path / "bus/usb/devices"
+    bus_dirpath.mkdir(parents=True, exist_ok=True)
+    os.symlink(device_path, bus_dirpath / device_path.name)
+    return str(device_path)
+
+
+def test_usb_device_index_find(tmp_path):
+    sys_path = tmp_path.resolve() / "sys"
+    relay_dirpath = make_usb_device(sys_path, "devices/pci0000:00/usb1/1-2", "1a86", "7523")
+    make_usb_device(sys_path, "devices/pci0000:00/usb1/1-3", "046d", "c52b")
+    make_usb_device(sys_path, "devices/pci0000:00/usb1/1-3/1-3:1.0", "046d", "c52b")
+    index = astutus.usb.sysfs_index.UsbDeviceIndex(sys_bus_usb_devices_dirpath=str(sys_path / "bus/usb/devices"))
+    assert index.find("1a86", "7523") == [relay_dirpath]
+    assert len(index.find("046d", "C52B")) == 1
+    assert index.find("1a86", "0000") == []
+
+
+def test_usb_device_index_refreshes_only_on_change(tmp_path):
+    sys_path = tmp_path.resolve() / "sys"
+    make_usb_device(sys_path, "devices/pci0000:00/usb1/1-2", "1a86", "7523")
+    index = astutus.usb.sysfs_index.UsbDeviceIndex(sys_bus_usb_devices_dirpath=str(sys_path / "bus/usb/devices"))
+    assert index.refresh_if_changed()
+    assert not index.refresh_if_changed()
+    make_usb_device(sys_path, "devices/pci0000:00/usb1/1-4", "1a86", "7523")
+    assert len(index.find("1a86", "7523")) == 2
+    assert not index.refresh_if_changed()
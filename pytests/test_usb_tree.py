@@ -0,0 +1,158 @@
+import asyncio
+
+import astutus.usb.tree
+import astutus.usb.walker
+import astutus.util.aio
+import fake_sysfs
+
+
+def test_bus_enumeration_matches_walk(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    UsbDeviceTree = astutus.usb.tree.UsbDeviceTree
+    walked_paths, walked_ilks = UsbDeviceTree.walk_basepath_for_usb(sysfs.basepath)
+    bus_paths, bus_ilks = UsbDeviceTree.enumerate_bus_for_usb(sysfs.basepath, sysfs.sys_bus_dirpath)
+    assert sorted(walked_paths) == bus_paths
+    assert len(bus_paths) == 3
+    tree_dirpaths = UsbDeviceTree.find_tree_dirpaths(sysfs.basepath, bus_paths)
+    for dirpath in tree_dirpaths:
+        assert bus_ilks[dirpath] == walked_ilks[dirpath], dirpath
+    assert bus_ilks[sysfs.basepath + "/pci0000:00/0000:00:14.0"] == "pci"
+
+
+def test_bus_enumeration_limited_to_basepath(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    basepath = sysfs.basepath + "/pci0000:00/0000:00:14.0/usb1/1-2"
+    bus_paths, _ = astutus.usb.tree.UsbDeviceTree.enumerate_bus_for_usb(basepath, sysfs.sys_bus_dirpath)
+    assert bus_paths == [basepath + "/1-2.1"]
+
+
+def test_default_enumeration(tmp_path):
+    assert astutus.usb.tree.UsbDeviceTree.default_enumeration("/tmp/sys/devices") == "walk"
+    # The mode comes from the tree's own bus directory, rather than the host's /sys/bus.
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    default_enumeration = astutus.usb.tree.UsbDeviceTree.default_enumeration
+    assert default_enumeration(sysfs.basepath, sysfs.sys_bus_dirpath) == "bus"
+    assert default_enumeration(sysfs.basepath, str(tmp_path / "no" / "bus")) == "walk"
+    tree = astutus.usb.tree.UsbDeviceTree(
+        basepath=sysfs.basepath, device_aliases_filepath=None, sys_bus_dirpath=sysfs.sys_bus_dirpath)
+    assert tree.enumeration == "bus"
+
+
+def test_tree_as_dict(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    tree_dict = tree.execute_tree_cmd(to_dict=True)
+    devices = tree_dict["devices"]
+    pci_bus = devices["children"][0]["pci0000:00"]
+    controller = pci_bus["children"][0]["0000:00:14.0"]
+    assert controller["data"]["node_id"] == "pci(0x8086:0xa36d)"
+    root_hub = controller["children"][0]["usb1"]
+    hub = root_hub["children"][0]["1-2"]
+    adapter = hub["children"][0]["1-2.1"]
+    assert adapter["data"]["node_id"] == "usb(0bda:8153)"
+    assert adapter["data"]["nodepath"].endswith("/usb(1d6b:0002)/usb(05e3:0610)/usb(0bda:8153)")
+    assert "children" not in adapter
+
+
+def test_async_tree_build_matches_sync(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    async_tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    tree_dict = asyncio.run(async_tree.get_tree_as_dict_async())
+    assert async_tree.get_data_by_dirpath() == tree.get_data_by_dirpath()
+    assert list(async_tree.get_data_by_dirpath()) == list(tree.get_data_by_dirpath())
+    assert list(tree_dict) == ["devices"]
+
+
+def test_async_tree_build_keeps_hotplug_update(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    find_data_for_paths_async = tree.find_data_for_paths_async
+    webcam_path = sysfs.basepath + "/pci0000:00/0000:00:14.0/usb1/1-2/1-2.2"
+
+    async def plug_in_while_extracting(ilk_by_dirpath, dirpaths):
+        # A hotplug event, applied on another thread while the async build is extracting the data.
+        sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.2", "046d", "082c", 1, 4)
+        await astutus.util.aio.run_in_executor(tree.add_usb_device, webcam_path)
+        return await find_data_for_paths_async(ilk_by_dirpath, dirpaths)
+
+    tree.find_data_for_paths_async = plug_in_while_extracting
+    data_by_dirpath = asyncio.run(tree.get_data_by_dirpath_async())
+    assert webcam_path in data_by_dirpath
+    assert tree.get_tree_dirpaths() == list(data_by_dirpath)
+
+
+def test_refresh_reports_delta(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    tree.get_tree_as_dict()
+    assert tree.refresh() == {"added": [], "removed": [], "changed": []}
+    hub_path = sysfs.basepath + "/pci0000:00/0000:00:14.0/usb1/1-2"
+    webcam_path = sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.2", "046d", "082c", 1, 4)
+    adapter_path = hub_path + "/1-2.1"
+    # Replugging the adapter gives it a new devnum.
+    (tmp_path / "sys/devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2.1/devnum").write_text("5\n")
+    unchanged_node_data = tree.get_compact_tree().datas[tree.get_compact_tree().get_nid(hub_path)]
+    delta = tree.refresh()
+    assert delta == {"added": [webcam_path], "removed": [], "changed": [adapter_path]}
+    compact_tree = tree.get_compact_tree()
+    assert compact_tree.datas[compact_tree.get_nid(hub_path)] is unchanged_node_data
+    hub = tree.get_tree_as_dict()["devices"]["children"][0]["pci0000:00"]["children"][0]["0000:00:14.0"]
+    hub = hub["children"][0]["usb1"]["children"][0]["1-2"]
+    assert [list(child)[0] for child in hub["children"]] == ["1-2.1", "1-2.2"]
+    sysfs.remove_device(webcam_path)
+    assert tree.refresh() == {"added": [], "removed": [webcam_path], "changed": []}
+    assert webcam_path not in tree.get_compact_tree()
+
+
+def test_walker_prunes_subtrees(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    walker = astutus.usb.walker.SysfsWalker()
+    usb_device_paths, ilk_by_dirpath = walker.walk(sysfs.basepath)
+    assert len(usb_device_paths) == 3
+    assert not any(dirpath.endswith("/power") for dirpath in ilk_by_dirpath)
+    assert not any(":1.0" in dirpath for dirpath in ilk_by_dirpath)
+    assert walker.visited_count == len(ilk_by_dirpath)
+    assert walker.pruned_count > 0
+    # The virtual hierarchy is pruned as a whole.
+    assert sysfs.basepath + "/virtual" not in ilk_by_dirpath
+
+
+def test_walker_extra_prune_patterns(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    walker = astutus.usb.walker.SysfsWalker(prune_patterns=[r"usb\d+"])
+    usb_device_paths, _ = walker.walk(sysfs.basepath)
+    assert usb_device_paths == []
+
+
+def test_walker_with_workers_matches_sequential(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    sysfs.add_pci_device("pci0000:00/0000:00:1d.0", "0x8086", "0xa32c")
+    sysfs.add_usb_device("pci0000:00/0000:00:1d.0/usb2", "1d6b", "0003", 2, 1)
+    sysfs.add_usb_device("pci0000:00/0000:00:1d.0/usb2/2-1", "1a86", "7523", 2, 2)
+    sequential_walker = astutus.usb.walker.SysfsWalker()
+    expected = sequential_walker.walk(sysfs.basepath)
+    walker = astutus.usb.walker.SysfsWalker(workers=4)
+    usb_device_paths, ilk_by_dirpath = walker.walk(sysfs.basepath)
+    assert usb_device_paths == expected[0]
+    assert list(ilk_by_dirpath.items()) == list(expected[1].items())
+    assert walker.visited_count == sequential_walker.visited_count
+    assert walker.pruned_count == sequential_walker.pruned_count
+
+
+def test_iter_lines_streams_the_rendered_tree(tmp_path):
+    sysfs = fake_sysfs.make_typical_sysfs(tmp_path)
+    sysfs.add_usb_device("pci0000:00/0000:00:14.0/usb1/1-2/1-2.2", "046d", "082c", 1, 4)
+    built_tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    expected_lines = list(built_tree.get_compact_tree().iter_lines(
+        data_property="colorized_node_label_for_terminal", key=astutus.usb.tree.key_by_node_data_key))
+
+    tree = astutus.usb.tree.UsbDeviceTree(basepath=sysfs.basepath, device_aliases_filepath=None)
+    lines = tree.iter_lines(data_property="colorized_node_label_for_terminal")
+    assert next(lines) == expected_lines[0]
+    # Nothing is kept until the whole tree has been streamed.
+    assert tree.data_by_dirpath is None
+    assert [expected_lines[0]] + list(lines) == expected_lines
+    assert tree.get_tree_as_dict() == built_tree.get_tree_as_dict()
+    # Streaming an already built tree reuses its nodes.
+    assert list(tree.iter_lines(data_property="colorized_node_label_for_terminal")) == expected_lines
@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+import astutus.util
+import astutus.util.aio
+
+
+def test_run_argv_passes_arguments_without_a_shell():
+    argv = [sys.executable, '-c', 'import sys; print(sys.argv[1:])', 'a b', '$HOME', '*']
+    return_code, stdout, stderr = astutus.util.run_argv(argv)
+    assert return_code == 0
+    assert stdout == "['a b', '$HOME', '*']\n"
+    assert stderr == ""
+
+
+def test_run_argv_missing_program():
+    return_code, stdout, stderr = astutus.util.run_argv(['no-such-program-for-astutus'])
+    assert return_code == 127
+    assert stdout == ""
+
+
+def test_run_argv_streams_stdout():
+    lines = []
+    argv = [sys.executable, '-c', 'import sys; print("one"); print("two"); sys.exit(3)']
+    return_code, stdout, stderr = astutus.util.run_argv(argv, stdout_callback=lines.append)
+    assert return_code == 3
+    assert lines == ["one\n", "two\n"]
+    assert stdout == "one\ntwo\n"
+
+
+def test_run_cmds_with_argv_lists():
+    results = astutus.util.run_cmds([[sys.executable, '-c', 'print(1)'], 'exit 2', 'echo skipped'])
+    assert [result[0] for result in results] == [0, 2]
+
+
+def test_run_cmds_concurrently_with_dependencies():
+    sleep = [sys.executable, '-c', 'import time; time.sleep(0.3)']
+    cmds = [sleep, sleep, sleep, 'exit 1', 'echo after failure', 'echo independent']
+    dependencies = {3: [0], 4: [3], 5: [1, 2]}
+    results = astutus.util.run_cmds(cmds, max_workers=3, dependencies=dependencies, with_timings=True)
+    # The command after the failure is skipped, and has no result.
+    assert results[4] is None
+    assert [result[0] for result in results if result is not None] == [0, 0, 0, 1, 0]
+    assert results[5][1] == "independent\n"
+    timings = [result[3] for result in results if result is not None]
+    # The three sleeps ran at the same time, rather than one after another.
+    assert max(timing['start'] for timing in timings[:3]) < 0.25
+    assert timings[3]['start'] >= timings[0]['duration']
+
+
+def test_run_cmds_concurrently_keeps_order_without_dependencies():
+    results = astutus.util.run_cmds(['echo 1', 'exit 4', 'echo 3'], max_workers=4)
+    assert results == [(0, "1\n", ""), (4, "", ""), None]
+
+
+def test_run_cmds_concurrently_keeps_a_result_for_each_command():
+    cmds = ['exit 1', 'echo depends', 'echo independent']
+    results = astutus.util.run_cmds(cmds, max_workers=2, dependencies={1: [0]})
+    assert results == [(1, "", ""), None, (0, "independent\n", "")]
+
+
+def test_run_cmds_rejects_later_dependencies():
+    with pytest.raises(ValueError):
+        astutus.util.run_cmds(['echo 1', 'echo 2'], max_workers=2, dependencies={0: [1]})
+
+
+def test_aio_run_commands_concurrently():
+    sleep = [sys.executable, '-c', 'import time; time.sleep(0.3); print("done")']
+
+    async def run_all():
+        return await asyncio.gather(
+            *[astutus.util.aio.run_argv(sleep) for _ in range(5)],
+            astutus.util.aio.run_cmd('echo $((1 + 2))'),
+            astutus.util.aio.run_argv(['no-such-program-for-astutus']))
+
+    start_time = time.monotonic()
+    results = asyncio.run(run_all())
+    assert time.monotonic() - start_time < 1.0
+    assert results[:5] == [(0, "done\n", "")] * 5
+    assert results[5] == (0, "3\n", "")
+    assert results[6][0] == 127
+
+
+def test_aio_read_attributes(tmp_path):
+    (tmp_path / "idVendor").write_text("1a86\n")
+
+    async def read():
+        return await asyncio.gather(
+            astutus.util.aio.read_attribute(str(tmp_path), "idVendor"),
+            astutus.util.aio.read_attributes(str(tmp_path), ["idVendor", "idProduct"]))
+
+    assert asyncio.run(read()) == ["1a86", {"idVendor": "1a86"}]
+
+
+def test_convert_color_for_html_input_type_color():
+    convert = astutus.util.convert_color_for_html_input_type_color
+    assert convert('cyan') == '#00ffff'
+    assert convert('DarkOrange') == '#ff8c00'
+    assert convert('#ABC') == '#ABC'
+    assert convert('#FF8c00') == '#FF8c00'
+    assert convert(None) == convert('None') == '#008000'
+    with pytest.raises(ValueError):
+        convert('not a color')
+
+
+def test_run_argv_missing_working_directory_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        astutus.util.run_argv([sys.executable, '-c', 'pass'], cwd=str(tmp_path / 'missing'))
+
+
+def test_run_cmds_runs_argv_lists_with_command_runner():
+    calls = []
+
+    def command_runner(cmd, cwd=None):
+        calls.append(cmd)
+        return 0, "", ""
+
+    astutus.util.run_cmds([['lsusb', '-t'], 'lspci'], command_runner=command_runner)
+    assert calls == [['lsusb', '-t'], 'lspci']
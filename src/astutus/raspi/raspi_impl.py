@@ -14,6 +14,12 @@ class RaspberryPiRuntimeError(RuntimeError):
     pass
 
 
+def as_completed_process(argv: [str], result: Tuple[int, str, str]) -> subprocess.CompletedProcess:
+    """ Wrap the result of run_argv, so that the errors raised carry the returncode, stdout, and stderr as before. """
+    return_code, stdout, stderr = result
+    return subprocess.CompletedProcess(argv, return_code, stdout, stderr)
+
+
 class RaspberryPi():
 
     def __init__(self, *, db_data=None, ipv4: str = None):
@@ -57,9 +63,11 @@ class RaspberryPi():
         return interface, parsed_section
 
     def get_ifconfig(self) -> str:
-        cmd = f"ssh pi@{self.ipv4} /usr/sbin/ifconfig"
-        logger.debug(f"cmd: {cmd}")
-        output = subprocess.getoutput(cmd)
+        argv = ['ssh', f'pi@{self.ipv4}', '/usr/sbin/ifconfig']
+        logger.debug(f"argv: {argv}")
+        _, stdout, stderr = astutus.util.run_argv(argv)
+        # Like subprocess.getoutput, include any error output.
+        output = (stdout + stderr).rstrip('\n')
         sections = [section for section in output.split("\n\n")]
         results = {}
         for section in sections:
@@ -70,44 +78,38 @@ class RaspberryPi():
     def publish_wheels(self) -> None:
         working_dir = (pathlib.Path(__file__).parent.parent / 'wheels').absolute()
         logger.debug(f"working_dir: {working_dir}")
-        cmd = f'/usr/bin/rsync --human-readable --verbose --progress * pi@{self.ipv4}:wheels'
-        logger.debug(f"cmd: {cmd}")
-        completed_process = subprocess.run(
-            args=cmd,
-            cwd=working_dir,
-            shell=True,
-            capture_output=True
-        )
-        logger.debug(f"type(completed_process.stdout): {type(completed_process.stdout)}")
-        stdout = completed_process.stdout.decode("utf-8")
+        # Expand the wildcard here, the same way the shell would, rather than running a shell.
+        filenames = sorted(path.name for path in working_dir.iterdir() if not path.name.startswith('.'))
+        argv = ['/usr/bin/rsync', '--human-readable', '--verbose', '--progress', *filenames, f'pi@{self.ipv4}:wheels']
+        logger.debug(f"argv: {argv}")
+        result = astutus.util.run_argv(argv, cwd=working_dir)
+        return_code, stdout, _ = result
         logger.debug(f"stdout: \n{stdout}")
-        if completed_process.returncode != 0:
-            raise RaspberryPiRuntimeError(completed_process)
+        if return_code != 0:
+            raise RaspberryPiRuntimeError(as_completed_process(argv, result))
 
     def uninstall_and_then_install_astutus(self) -> None:
         # Since the version may not be an identified version upgrade during devlopment,
         # uninstall the old version and install the new one from the wheel.
-        cmds = [
-            f'ssh pi@{self.ipv4} /usr/bin/pip3 uninstall astutus -y  || true',
-            f'ssh pi@{self.ipv4} /usr/bin/pip3 install --no-index --find-links=/home/pi/wheels/ astutus',
+        # Each is an argument list and whether a failure is an error.  Uninstalling fails
+        # if astutus is not installed, which is fine.
+        argvs_and_checks = [
+            (['ssh', f'pi@{self.ipv4}', '/usr/bin/pip3', 'uninstall', 'astutus', '-y'], False),
+            (['ssh', f'pi@{self.ipv4}', '/usr/bin/pip3', 'install', '--no-index', '--find-links=/home/pi/wheels/', 'astutus'], True),  # noqa
         ]
-        for cmd in cmds:
-            logger.debug(f"cmd: {cmd}")
-            completed_process = subprocess.run(
-                args=cmd,
-                shell=True,
-                capture_output=True
-            )
-            logger.debug(f"type(completed_process.stdout): {type(completed_process.stdout)}")
-            stdout = completed_process.stdout.decode("utf-8")
+        for argv, check in argvs_and_checks:
+            logger.debug(f"argv: {argv}")
+            result = astutus.util.run_argv(argv)
+            return_code, stdout, _ = result
             logger.debug(f"stdout: \n{stdout}")
-            if completed_process.returncode != 0:
-                raise RaspberryPiRuntimeError(completed_process)
+            if check and return_code != 0:
+                raise RaspberryPiRuntimeError(as_completed_process(argv, result))
 
     def launch_web_app(self) -> Tuple[bool, Tuple]:
+        # The remote commands are still interpreted by the shell on the Raspberry Pi.
         cmds = [
-            f'ssh -v pi@{self.ipv4} "sudo pkill -f \'/usr/bin/python3 /home/pi/.local/bin/astutus-web-app\'"',
-            f'ssh -f pi@{self.ipv4} "nohup /home/pi/.local/bin/astutus-web-app < /dev/null > std.out 2> std.err & "',
+            ['ssh', '-v', f'pi@{self.ipv4}', "sudo pkill -f '/usr/bin/python3 /home/pi/.local/bin/astutus-web-app'"],
+            ['ssh', '-f', f'pi@{self.ipv4}', "nohup /home/pi/.local/bin/astutus-web-app < /dev/null > std.out 2> std.err & "],  # noqa
         ]
         results = astutus.util.run_cmds(cmds, stop_on_error=True)
         logger.debug(f"results: {results}")
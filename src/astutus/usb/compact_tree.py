@@ -0,0 +1,199 @@
+"""
+
+A compact, array backed tree for the nodes of a UsbDeviceTree.
+
+Each node is identified by a small integer, its position in a set of
+parallel lists holding the tag, identifier, data, parent, first child, and
+next sibling of every node.  The tags are interned, since the same
+directory names, such as usb1 or 1-1, occur over and over again.  Lookups
+from identifier to node id are only needed while the tree is being built.
+
+The rendering and dictionary export follow the conventions of treelib, so
+that the output is unchanged::
+
+    {tag: {'children': [child_dict, ...], 'data': data}}
+
+for a node with children, sorted by tag, and for a leaf::
+
+    {tag: {'data': data}}
+
+"""
+import logging
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+NO_NODE = -1
+
+# Vertical line, box, and corner, as in the treelib ascii-ex line type.
+LINE_DRAWING = ('│', '├── ', '└── ')
+
+
+class CompactNode(object):
+    """ A lightweight view of a single node, used for sort keys and filtering. """
+
+    __slots__ = ('tree', 'nid')
+
+    def __init__(self, tree: 'CompactTree', nid: int):
+        self.tree = tree
+        self.nid = nid
+
+    @property
+    def tag(self) -> str:
+        return self.tree.tags[self.nid]
+
+    @property
+    def identifier(self) -> str:
+        return self.tree.identifiers[self.nid]
+
+    @property
+    def data(self):
+        return self.tree.datas[self.nid]
+
+    def __repr__(self):
+        return f"CompactNode(tag={self.tag}, identifier={self.identifier})"
+
+
+class CompactTree(object):
+
+    def __init__(self):
+        self.tags = []  # type: List[str]
+        self.identifiers = []  # type: List[str]
+        self.datas = []
+        self.parents = []  # type: List[int]
+        self.first_children = []  # type: List[int]
+        self.last_children = []  # type: List[int]
+        self.next_siblings = []  # type: List[int]
+        self.nid_by_identifier = {}  # type: Dict[str, int]
+        self.root = NO_NODE
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, identifier):
+        return identifier in self.nid_by_identifier
+
+    def create_node(self, tag: str, identifier: str, parent: str = None, data=None) -> int:
+        """ Add a node as the last child of the parent, returning its node id.
+
+        A node without a parent becomes the root.
+        """
+        if identifier in self.nid_by_identifier:
+            raise ValueError(f"Duplicate node identifier: {identifier}")
+        nid = len(self.tags)
+        if parent is None:
+            if self.root != NO_NODE:
+                raise ValueError(f"Tree already has a root, so {identifier} must have a parent")
+            parent_nid = NO_NODE
+            self.root = nid
+        else:
+            parent_nid = self.nid_by_identifier[parent]
+        self.tags.append(sys.intern(tag))
+        self.identifiers.append(identifier)
+        self.datas.append(data)
+        self.parents.append(parent_nid)
+        self.first_children.append(NO_NODE)
+        self.last_children.append(NO_NODE)
+        self.next_siblings.append(NO_NODE)
+        self.nid_by_identifier[identifier] = nid
+        if parent_nid != NO_NODE:
+            last_child = self.last_children[parent_nid]
+            if last_child == NO_NODE:
+                self.first_children[parent_nid] = nid
+            else:
+                self.next_siblings[last_child] = nid
+            self.last_children[parent_nid] = nid
+        return nid
+
+    def get_nid(self, identifier: str) -> int:
+        return self.nid_by_identifier[identifier]
+
+    def node(self, nid: int) -> CompactNode:
+        return CompactNode(self, nid)
+
+    def children(self, nid: int) -> Iterator[int]:
+        child = self.first_children[nid]
+        while child != NO_NODE:
+            yield child
+            child = self.next_siblings[child]
+
+    def sorted_children(self, nid: int, key: Callable[[CompactNode], object] = None) -> List[int]:
+        """ The children of a node, sorted by key applied to their views, or by tag if no key is given. """
+        children = list(self.children(nid))
+        if key is None:
+            children.sort(key=self.tags.__getitem__)
+        else:
+            children.sort(key=lambda child: key(CompactNode(self, child)))
+        return children
+
+    def iter_depth_first(
+            self,
+            nid: int = None,
+            key: Callable[[CompactNode], object] = None) -> Iterator[Tuple[int, int]]:
+        """ Yield (nid, depth) for the nodes in display order, with the children sorted by key. """
+        if nid is None:
+            nid = self.root
+        if nid == NO_NODE:
+            return
+        stack = [(nid, 0)]
+        while stack:
+            nid, depth = stack.pop()
+            yield nid, depth
+            children = self.sorted_children(nid, key)
+            stack.extend((child, depth + 1) for child in reversed(children))
+
+    def to_dict(self, nid: int = None, *, with_data: bool = False, key: Callable[[CompactNode], object] = None):
+        if nid is None:
+            nid = self.root
+        tag = self.tags[nid]
+        children = self.sorted_children(nid, key)
+        if not children:
+            if with_data:
+                return {tag: {'data': self.datas[nid]}}
+            return tag
+        tree_dict = {tag: {'children': [self.to_dict(child, with_data=with_data, key=key) for child in children]}}
+        if with_data:
+            tree_dict[tag]['data'] = self.datas[nid]
+        return tree_dict
+
+    def iter_lines(
+            self,
+            *,
+            data_property: str = None,
+            key: Callable[[CompactNode], object] = None) -> Iterator[str]:
+        """ Yield the lines of the rendered tree, with each label being the tag or a property of the data. """
+        if self.root == NO_NODE:
+            return
+        vertical_line, line_box, line_corner = LINE_DRAWING
+        # Each item is the node id, the leading for its descendants, and the prefix for its own line.
+        stack = [(self.root, '', '')]
+        while stack:
+            nid, leading, prefix = stack.pop()
+            if data_property is None:
+                label = self.tags[nid]
+            else:
+                label = getattr(self.datas[nid], data_property)
+            yield f"{prefix}{label}"
+            children = self.sorted_children(nid, key)
+            for idx in reversed(range(len(children))):
+                is_last = idx == len(children) - 1
+                child_prefix = leading + (line_corner if is_last else line_box)
+                child_leading = leading + (' ' * 4 if is_last else vertical_line + ' ' * 3)
+                stack.append((children[idx], child_leading, child_prefix))
+
+    def show(
+            self,
+            *,
+            data_property: str = None,
+            key: Callable[[CompactNode], object] = None,
+            stdout: bool = True) -> Optional[str]:
+        """ Render the tree like treelib's show, printing it, or returning it if stdout is False. """
+        if self.root == NO_NODE:
+            print("Tree is empty")
+            return None
+        rendered = ''.join(line + '\n' for line in self.iter_lines(data_property=data_property, key=key))
+        if not stdout:
+            return rendered
+        print(rendered)
+        return None
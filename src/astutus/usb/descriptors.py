@@ -0,0 +1,91 @@
+"""
+
+Decoding of the raw USB descriptors that sysfs exposes for each USB device.
+
+The **descriptors** file in a USB device directory holds the device
+descriptor followed by the configuration descriptors, each with its
+interface and endpoint descriptors, exactly as reported by the device.
+This holds the same information about classes that ``lsusb --verbose``
+reports, without running a subprocess.
+
+Each descriptor starts with its length and its type:
+
+    * Device descriptor (type 1) - bDeviceClass is at offset 4
+    * Interface descriptor (type 4) - bInterfaceClass is at offset 5
+
+"""
+import logging
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+DEVICE_DESCRIPTOR_TYPE = 1
+INTERFACE_DESCRIPTOR_TYPE = 4
+
+# Base class codes as defined by usb.org, with names as used by lsusb.
+CLASS_NAMES = {
+    0x00: '(Defined at Interface level)',
+    0x01: 'Audio',
+    0x02: 'Communications',
+    0x03: 'Human Interface Device',
+    0x05: 'Physical Interface Device',
+    0x06: 'Imaging',
+    0x07: 'Printer',
+    0x08: 'Mass Storage',
+    0x09: 'Hub',
+    0x0a: 'CDC Data',
+    0x0b: 'Chip/SmartCard',
+    0x0d: 'Content Security',
+    0x0e: 'Video',
+    0x0f: 'Personal Healthcare',
+    0x10: 'Audio/Video',
+    0x11: 'Billboard',
+    0x12: 'Type-C Bridge',
+    0x58: 'Xbox',
+    0xdc: 'Diagnostic',
+    0xe0: 'Wireless',
+    0xef: 'Miscellaneous Device',
+    0xfe: 'Application Specific Interface',
+    0xff: 'Vendor Specific Class',
+}
+
+
+def class_name(class_code: int) -> str:
+    return CLASS_NAMES.get(class_code, '[unknown]')
+
+
+def parse_descriptors(raw_descriptors: bytes) -> Dict:
+    """ Parse the raw descriptors of a USB device.
+
+    Returns a dictionary with the idVendor and idProduct as four digit hex strings,
+    the bDeviceClass, and the bInterfaceClass of every interface descriptor in
+    the order found, as in this example:
+
+    .. code-block:: python
+
+        {
+            'idVendor': '046d',
+            'idProduct': 'c52b',
+            'bDeviceClass': 0,
+            'bInterfaceClass_list': [3, 3, 3],
+        }
+    """
+    descriptors = {
+        'bInterfaceClass_list': [],
+    }
+    offset = 0
+    while offset + 2 <= len(raw_descriptors):
+        length = raw_descriptors[offset]
+        descriptor_type = raw_descriptors[offset + 1]
+        if length < 2:
+            logger.warning(f"Invalid descriptor length {length} at offset {offset}")
+            break
+        descriptor = raw_descriptors[offset:offset + length]
+        if descriptor_type == DEVICE_DESCRIPTOR_TYPE and len(descriptor) >= 12:
+            descriptors['bDeviceClass'] = descriptor[4]
+            descriptors['idVendor'] = f"{int.from_bytes(descriptor[8:10], 'little'):04x}"
+            descriptors['idProduct'] = f"{int.from_bytes(descriptor[10:12], 'little'):04x}"
+        elif descriptor_type == INTERFACE_DESCRIPTOR_TYPE and len(descriptor) >= 6:
+            descriptors['bInterfaceClass_list'].append(descriptor[5])
+        offset += length
+    return descriptors
@@ -35,6 +35,9 @@ import os
 from typing import Dict, List, Optional, Set, Tuple  # noqa
 
 import astutus.usb.node
+import astutus.usb.paths
+import astutus.usb.sysfs_index
+import astutus.usb.walker
 import astutus.usb.usb_impl
 
 logger = logging.getLogger(__name__)
@@ -48,7 +51,7 @@ def matches_as_usb_node(dirpath: str, vendor: str, product: str) -> bool:
 
 
 def matches_as_pci_node(dirpath: str, vendor: str, device: str) -> bool:
-    data = astutus.usb.usb_impl.extract_specified_data('', dirpath, ['vendor', 'device'])
+    data = astutus.usb.usb_impl.extract_specified_data(dirpath, ['vendor', 'device'])
     if data.get('vendor') == vendor and data.get('device') == device:
         return True
     return False
@@ -66,19 +69,24 @@ def matches_as_node(dirpath: str, ilk: str, vendor: str, device: str) -> bool:
     return False
 
 
-def find_all_pci_paths(value: str) -> List[str]:
+def find_all_pci_paths(value: str, workers: int = 1) -> List[str]:
     """ Find all that terminate with a node that matches the value.
 
     The value is something like usb(1a86:7523) or pci(0x1002:0x5a19)
+
+    USB devices are found through the USB device index, while PCI devices
+    are found by walking sysfs with the given number of worker threads.
     """
     logger.info(f"In find_all_pci_paths with value: {value}")
     ilk, vendor, device = astutus.usb.node.parse_value(value)
+    basepath = '/sys/devices/pci0000:00'
+    if ilk == "usb":
+        dirpaths = astutus.usb.sysfs_index.get_usb_device_index().find(vendor, device)
+        return [dirpath for dirpath in dirpaths if dirpath.startswith(basepath + '/')]
+    _, ilk_by_dirpath = astutus.usb.walker.SysfsWalker(workers=workers).walk(basepath)
     device_paths = []
-    for dirpath, dirnames, filenames in os.walk('/sys/devices/pci0000:00'):
-        if ilk == "usb" and "busnum" in filenames and "devnum" in filenames:
-            if matches_as_node(dirpath, ilk, vendor, device):
-                device_paths.append(dirpath)
-        if ilk == "pci" and "vendor" in filenames and "device" in filenames:
+    for dirpath, dirpath_ilk in ilk_by_dirpath.items():
+        if dirpath_ilk == "pci":
             if matches_as_node(dirpath, ilk, vendor, device):
                 device_paths.append(dirpath)
     return device_paths
@@ -89,20 +97,21 @@ def find_node_paths(value: str) -> List[str]:
     pci_paths = find_all_pci_paths(value)
     logger.debug(f"pci_paths {pci_paths}")
     for pci_path in pci_paths:
-        pci_path += '/'
         logger.debug(f"pci_path {pci_path}")
-        idx = 0
-        node_ids = []
-        while True:
-            idx = pci_path.find('/', idx + 1)
-            if idx < 0:
-                break
-            dirpath = pci_path[:idx]
+        dirpath_table = astutus.usb.paths.get_dirpath_table()
+        nodepath_table = astutus.usb.paths.get_nodepath_table()
+        nodepath_id = astutus.usb.paths.NO_PATH
+        # Skip the root directory, which is the empty path before the first slash.
+        for path_id in dirpath_table.lineage(dirpath_table.intern(pci_path))[1:]:
+            dirpath = dirpath_table.path(path_id)
             logger.debug(f"dirpath {dirpath}")
             node_id = astutus.usb.node.node_id_for_dirpath(dirpath)
             if node_id is not None:
-                node_ids.append(node_id)
-        node_paths.append("/".join(node_ids))
+                nodepath_id = nodepath_table.intern_child(nodepath_id, node_id)
+        if nodepath_id == astutus.usb.paths.NO_PATH:
+            node_paths.append("")
+        else:
+            node_paths.append(nodepath_table.path(nodepath_id))
     logger.debug(f"node_paths {node_paths}")
     return node_paths
 
@@ -180,22 +189,58 @@ class DeviceAliases(dict):
     def __init__(self, *, filepath: str):
         self.filepath = filepath
         logger.info("Initializing DeviceAliases")
+        # The aliases found for each nodepath, keyed by the canonical string for the nodepath.
+        self.aliases_by_nodepath = {}  # type: Dict[str, List[Dict]]
         super(DeviceAliases, self).__init__()
         raw_aliases = self.read_raw_from_json(filepath)
 
         self.update(self.parse_raw_aliases(raw_aliases))
 
+    # The found aliases depend on the patterns, so forget them whenever the patterns change.
+
+    def __setitem__(self, pattern, value):
+        self.aliases_by_nodepath.clear()
+        super().__setitem__(pattern, value)
+
+    def __delitem__(self, pattern):
+        self.aliases_by_nodepath.clear()
+        super().__delitem__(pattern)
+
+    def update(self, *args, **kwargs):
+        self.aliases_by_nodepath.clear()
+        super().update(*args, **kwargs)
+
+    def pop(self, *args):
+        self.aliases_by_nodepath.clear()
+        return super().pop(*args)
+
+    def popitem(self):
+        self.aliases_by_nodepath.clear()
+        return super().popitem()
+
+    def setdefault(self, pattern, default=None):
+        self.aliases_by_nodepath.clear()
+        return super().setdefault(pattern, default)
+
+    def clear(self):
+        self.aliases_by_nodepath.clear()
+        super().clear()
+
     def find(self, nodepath: str) -> [Dict]:
         """ Find all aliases that partially match the nodepath.  """
         logger.debug(f"nodepath: {nodepath}")
         if nodepath is None:
             assert False
-        aliases = []
-        for pattern, value in super().items():
-            if nodepath.endswith(pattern):
-                aliases.append(value)
+        nodepath = astutus.usb.paths.get_nodepath_table().canonical(nodepath)
+        aliases = self.aliases_by_nodepath.get(nodepath)
+        if aliases is None:
+            aliases = []
+            for pattern, value in super().items():
+                if nodepath.endswith(pattern):
+                    aliases.append(value)
+            self.aliases_by_nodepath[nodepath] = aliases
         logger.debug(f"aliases: {aliases}")
-        return aliases
+        return list(aliases)
 
     def find_highest_priority(self, nodepath: str) -> Dict:
         """ Find the alias with the highest priority."""
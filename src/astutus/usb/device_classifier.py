@@ -1,9 +1,13 @@
 import logging
 import re
-import copy
 from typing import Dict, List, Optional, Set, Tuple  # noqa
 
+import astutus.usb.descriptors
+import astutus.usb.sysfs_index
+import astutus.util.hwdata
 import astutus.util.pci
+import astutus.util.sysfs
+import astutus.util.templates
 import pymemcache
 import pymemcache.client.base
 
@@ -13,23 +17,14 @@ logger = logging.getLogger(__name__)
 # Make this a plain function, to support eventual registration process
 # for custom field searchers
 def get_logitech_unifying_receiver_input_type(dirpath: str, device_data: Dict[str, str]):
-    tests = [
-        {
-            'cmd': 'grep -r . -e "mouse" 2>/dev/null',
-            'value': 'mouse',
-        },
-        {
-            'cmd': 'grep -r . -e "kbd-numlock" 2>/dev/null',
-            'value': 'kbd-numlock',
-            'type': 'keyboard'
-        }
-    ]
+    # A mouse is exposed as an input class device like mouse0, and a keyboard
+    # has a numlock LED, exposed as a leds class device like input5::numlock.
+    class_device_index = astutus.usb.sysfs_index.get_class_device_index()
     input_types = []
-    for test in tests:
-        cmd = test.get('cmd')
-        _, stdout, stderr = astutus.util.run_cmd(cmd, cwd=dirpath)
-        if test.get('value') in stdout:
-            input_types.append(test.get('type'))
+    if any(name.startswith('mouse') for name in class_device_index.find(dirpath, 'input')):
+        input_types.append('mouse')
+    if any(name.endswith('::numlock') for name in class_device_index.find(dirpath, 'leds')):
+        input_types.append('keyboard')
     return ','.join(input_types)
 
 
@@ -41,12 +36,6 @@ class DeviceClassifier(object):
         self.cache = pymemcache.client.base.Client(
             'localhost', serde=pymemcache.serde.pickle_serde, connect_timeout=0.1, timeout=0.1)
 
-        self.pci_device_info_map_key = self.make_key('pci_device_info_map')
-        self.pci_device_info_map = self.cache.get(self.pci_device_info_map_key)
-        if self.pci_device_info_map is None:
-            self.pci_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_lspci()
-            self.cache.set(self.pci_device_info_map_key, self.pci_device_info_map, expire=self.expire_seconds)
-
         self.aliases_key = self.make_key('astutus.usb.device_aliases.DeviceAliases')
         self.aliases = None  # lazy fetching, and necessary reading of aliases until used.
 
@@ -76,10 +65,9 @@ class DeviceClassifier(object):
         return ilk
 
     def get_pci_device_info(self, dirpath: str) -> Dict[str, str]:
-        parent_dirpath, dirname = dirpath.rsplit('/', 1)
         ilk = self.get_ilk(dirpath)
         if ilk == 'pci':
-            pci_device_info = astutus.util.pci.get_device_info_from_dirname(self.pci_device_info_map, dirname)
+            pci_device_info = astutus.util.pci.get_device_info_for_dirpath(dirpath)
         else:
             pci_device_info = None
         return pci_device_info
@@ -131,13 +119,17 @@ class DeviceClassifier(object):
             if device_data.get(field) is not None:
                 continue
             if field == 'tty':
-                device_data['tty'] = astutus.usb.find_tty_from_pci_path(dirpath)
+                tty = astutus.usb.find_tty_from_pci_path(dirpath)
+                if tty is None:
+                    # Left out, so that the template shows it as missing.
+                    continue
+                device_data['tty'] = tty
             elif field == 'vendor':
-                self.augument_from_lsusb(device_data)
+                self.augment_from_descriptors(dirpath, device_data)
             elif field == 'product_text':
-                self.augument_from_lsusb(device_data)
+                self.augment_from_descriptors(dirpath, device_data)
             elif field == 'device_class':
-                self.augument_from_lsusb(device_data)
+                self.augment_from_descriptors(dirpath, device_data)
             elif field == 'nodepath':
                 parent_dirpath = device_data['parent_dirpath']
                 if parent_dirpath == '/sys':
@@ -159,9 +151,43 @@ class DeviceClassifier(object):
                 expire=self.expire_seconds)
             logger.error('Wrote to cache')
 
+    def augment_from_descriptors(self, dirpath: str, device_data: Dict[str, str]) -> None:
+        """ Augment the vendor, product_text, device_class, and interface_class_list from the descriptors file.
+
+        Falls back to running lsusb if the descriptors can not be read.
+        """
+        raw_descriptors = astutus.util.sysfs.read_binary_attribute(dirpath, 'descriptors')
+        if raw_descriptors is None:
+            self.augument_from_lsusb(device_data)
+            return
+        descriptors = astutus.usb.descriptors.parse_descriptors(raw_descriptors)
+        id_vendor = descriptors.get('idVendor', device_data.get('idVendor'))
+        id_product = descriptors.get('idProduct', device_data.get('idProduct'))
+        usb_ids = astutus.util.hwdata.get_usb_ids()
+        vendor = None
+        product_text = None
+        if usb_ids is not None and id_vendor is not None and id_product is not None:
+            vendor = usb_ids.vendor_name(id_vendor)
+            product_text = usb_ids.device_name(id_vendor, id_product)
+        if vendor is None:
+            vendor = device_data.get('manufacturer', '')
+        device_data['vendor'] = vendor
+        if product_text is not None:
+            device_data['product_text'] = product_text
+        elif device_data.get('product_text') is None:
+            device_data['product_text'] = ''
+        device_class = descriptors.get('bDeviceClass')
+        if device_class is not None:
+            device_data['device_class'] = astutus.usb.descriptors.class_name(device_class)
+        interface_class_list = [
+            astutus.usb.descriptors.class_name(interface_class)
+            for interface_class in descriptors['bInterfaceClass_list']
+        ]
+        device_data['interface_class_list'] = ','.join(interface_class_list)
+
     def augument_from_lsusb(self, device_data: Dict[str, str]) -> None:
-        cmd = f"lsusb -s {device_data['busnum']}:{device_data['devnum']} --verbose"
-        return_code, stdout, stderr = astutus.util.run_cmd(cmd)
+        argv = ['lsusb', '-s', f"{device_data['busnum']}:{device_data['devnum']}", '--verbose']
+        return_code, stdout, stderr = astutus.util.run_argv(argv)
         if return_code != 0:
             raise RuntimeError(return_code, stderr, stdout)
         interface_class_list = []
@@ -233,19 +259,5 @@ class DeviceClassifier(object):
 
     @staticmethod
     def robust_format_map(template: str, device_data: Dict[str, str], formatting_data: Dict[str, str]):
-        data = copy.deepcopy(device_data)
-        data.update(formatting_data)
-        data
-        max_count = template.count('{')
-        count = 0
-        while True:
-            try:
-                value = template.format_map(data)
-                return value
-            except KeyError as exception:
-                logger.error(f'exception: {exception}')
-                data[exception.args[0]] = f"--{exception.args[0]} missing--"
-                count += 1
-                if count > max_count:
-                    # Just a double check to prevent infinite loop in case of coding error'
-                    return f'robust_format_map error. template: {template} - data: {data}'
+        # The formatting data takes precedence over the device data.
+        return astutus.util.templates.render(template, formatting_data or {}, device_data)
@@ -1,4 +1,3 @@
-import copy
 import json
 import logging
 import os
@@ -7,8 +6,10 @@ import shutil
 from typing import Dict, List, Optional, Set, Tuple  # noqa
 
 import astutus.log
+import astutus.usb.predicates
 import astutus.util
 import astutus.util.pci
+import astutus.util.templates
 
 
 logger = logging.getLogger(__name__)
@@ -16,11 +17,15 @@ logger = logging.getLogger(__name__)
 
 class DeviceConfiguration(dict):
 
-    def __init__(self, config, command_runner=astutus.util.run_cmd):
+    def __init__(self, config, command_runner=astutus.util.run_cmd, predicate_cache=None):
         self.config = config
         # Command runner is a dependency injection point to make code more testable
         self.command_runner = command_runner
-        config['stylers'] = self.stylers
+        if predicate_cache is None:
+            predicate_cache = astutus.usb.predicates.PredicateCache()
+        self.predicate_cache = predicate_cache
+        # Resolve the colors once, so that rendering never needs to.
+        config['stylers'] = self.resolve_stylers(config)
         super().update(config)
 
     def __repr__(self):
@@ -37,24 +42,24 @@ class DeviceConfiguration(dict):
     def name(self):
         return self.config['name_of_config']
 
-    @property
-    def stylers(self):
-        stylers = self.config.get('stylers')
+    @staticmethod
+    def resolve_stylers(config):
+        stylers = config.get('stylers')
         if stylers is None:
             # This is a simple config, where style attributes are directly expressed in the configuration.
             # So, dynamically create a single styler, with no special selection attributes,
             # and return that as a list
-            styler = copy.deepcopy(self.config)
-            if styler.get("name_of_config"):
-                del styler["name_of_config"]  # A styler is not a config.
-            if styler.get("name"):
-                del styler["name"]  # A styler is not a config.
+            # A styler is not a config, so it leaves out the names.
+            styler = {key: value for key, value in config.items() if key not in ('name_of_config', 'name')}
             stylers = [styler]
-        # For now, apply color conversion at this point.
         for styler in stylers:
             styler['color'] = astutus.util.convert_color_for_html_input_type_color(styler.get('color'))
         return stylers
 
+    @property
+    def stylers(self):
+        return self.config['stylers']
+
     def get_color(self, dirpath):
         """ Get color in #rrggbb format suitable for HTML input control. """
         styler = self.find_styler(dirpath)
@@ -69,24 +74,12 @@ class DeviceConfiguration(dict):
 
     def generate_description(self, dirpath, data):
         description_template = self.find_description_template(dirpath)
-        try:
-            description = description_template.format_map(data)
-            return description
-        except KeyError as exception:
-            return f"exception: {exception}, description_template{description_template}, data{data}"
+        return astutus.util.templates.render(description_template, data)
 
     def find_styler(self, dirpath):
         for styler in self.stylers:
-            styler['color'] = astutus.util.convert_color_for_html_input_type_color(styler.get('color'))
-            if styler.get('test') is None:
+            if self.predicate_cache.evaluate(dirpath, styler, self.command_runner):
                 return styler
-            elif styler.get('test') == 'value_in_stdout':
-                cmd = styler.get('cmd')
-                if cmd is None:
-                    raise ValueError('cmd must be given for test value_in_stdout')
-                _, stdout, stderr = self.command_runner(cmd, cwd=dirpath)
-                if styler.get('value') in stdout:
-                    return styler
         return None
 
     def find_description_template(self, dirpath):
@@ -136,9 +129,10 @@ class DeviceConfigurations(object):
     def __init__(self, filepath=None, command_runner=astutus.util.run_cmd):
         logger.info("Initializing device configurations")
         self.command_runner = command_runner
+        # Shared by the configurations, so that styler tests are evaluated once per device.
+        self.predicate_cache = astutus.usb.predicates.PredicateCache()
         self.device_map = None
         self.read_from_json(filepath)
-        self.pci_device_info_map = None
         logger.info("Done initializing device configurations")
 
     def __len__(self):
@@ -153,10 +147,7 @@ class DeviceConfigurations(object):
             return self.make_generic_other_configuration(data, self.command_runner)
 
     def find_device_info(self, slot: str) -> dict:
-        if self.pci_device_info_map is None:
-            self.pci_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_lspci(
-                command_runner=self.command_runner)
-        return self.pci_device_info_map.get(slot)
+        return astutus.util.pci.get_device_info_for_slot(slot, command_runner=self.command_runner)
 
     def find_pci_configuration(self, data):
         return self.make_pci_configuration(data, self.command_runner)
@@ -168,7 +159,7 @@ class DeviceConfigurations(object):
         config = self.device_map.get(key)
         if config is None:
             return self.make_generic_usb_configuration(data, self.command_runner)
-        return DeviceConfiguration(config, self.command_runner)
+        return DeviceConfiguration(config, self.command_runner, self.predicate_cache)
 
     def find_usb_configuration_for_node(self, node):
         ilk, vendor, device = astutus.usb.node.parse_value(node)
@@ -198,7 +189,7 @@ class DeviceConfigurations(object):
         self.device_map = {}
         for key, config in configuration_map.items():
             config['idx'] = key
-            device_config = DeviceConfiguration(config, self.command_runner)
+            device_config = DeviceConfiguration(config, self.command_runner, self.predicate_cache)
             self.device_map[key] = device_config
 
     def get_item(self, key):
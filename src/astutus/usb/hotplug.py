@@ -0,0 +1,185 @@
+"""
+
+Keeps a UsbDeviceTree up to date as USB devices are plugged in and unplugged.
+
+The kernel announces each change to the device hierarchy as a uevent,
+which is broadcast over a netlink socket.  The message for a newly plugged
+in device looks like::
+
+    add@/devices/pci0000:00/0000:00:14.0/usb1/1-2
+    ACTION=add
+    DEVPATH=/devices/pci0000:00/0000:00:14.0/usb1/1-2
+    SUBSYSTEM=usb
+    DEVTYPE=usb_device
+    ...
+
+with the lines separated by null characters.  Rather than rescanning
+/sys after every change, a HotplugMonitor applies each event for a USB
+device to the tree, and then notifies its subscribers of the delta::
+
+    monitor = astutus.usb.hotplug.HotplugMonitor(tree, astutus.usb.hotplug.NetlinkUeventSource())
+    monitor.subscribe(lambda event, delta: print(event['ACTION'], delta))
+    monitor.start()
+
+The event source is pluggable.  A ReplayUeventSource plays back a recorded
+log of events, such as against a fake /sys hierarchy in tests.
+
+"""
+import json
+import logging
+import socket
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+# The multicast group for the events sent directly by the kernel, rather than relayed by udev.
+KERNEL_UEVENT_GROUP = 1
+RECEIVE_BUFFER_SIZE = 16384
+RECEIVE_TIMEOUT = 0.5
+
+ADD_ACTIONS = {'add'}
+REMOVE_ACTIONS = {'remove'}
+CHANGE_ACTIONS = {'change', 'bind', 'unbind'}
+
+
+def parse_uevent_message(message: bytes) -> Optional[Dict[str, str]]:
+    """ Parse a kernel uevent message into a dictionary of its KEY=VALUE fields.
+
+    Returns None for messages that are not kernel uevents, such as those relayed by udev.
+    """
+    fields = message.split(b'\0')
+    if not fields or b'@' not in fields[0]:
+        return None
+    event = {}
+    for field in fields[1:]:
+        key, separator, value = field.partition(b'=')
+        if separator:
+            event[key.decode('utf-8', errors='replace')] = value.decode('utf-8', errors='replace')
+    if 'ACTION' not in event or 'DEVPATH' not in event:
+        return None
+    return event
+
+
+class NetlinkUeventSource(object):
+    """ Receives uevents from the kernel over a netlink socket.  Linux only. """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+        # A port id of zero lets the kernel assign one.
+        self.sock.bind((0, KERNEL_UEVENT_GROUP))
+        # Wake up periodically, so that closing the source from another thread is noticed.
+        self.sock.settimeout(RECEIVE_TIMEOUT)
+        self.closed = False
+
+    def events(self) -> Iterator[Dict[str, str]]:
+        while not self.closed:
+            try:
+                message = self.sock.recv(RECEIVE_BUFFER_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.closed:
+                    return
+                raise
+            event = parse_uevent_message(message)
+            if event is not None:
+                yield event
+
+    def close(self) -> None:
+        self.closed = True
+        self.sock.close()
+
+
+class ReplayUeventSource(object):
+    """ Plays back a recorded list of uevents, each a dictionary of KEY=VALUE fields. """
+
+    def __init__(self, events: List[Dict[str, str]]):
+        self.recorded_events = list(events)
+        self.closed = False
+
+    @classmethod
+    def from_file(cls, filepath: str) -> 'ReplayUeventSource':
+        """ Load a log with one JSON encoded event per line. """
+        with open(filepath, 'r') as log_file:
+            return cls([json.loads(line) for line in log_file if line.strip()])
+
+    def events(self) -> Iterator[Dict[str, str]]:
+        for event in self.recorded_events:
+            if self.closed:
+                return
+            yield event
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class HotplugMonitor(object):
+    """ Applies the uevents for USB devices from a source to a tree, and notifies subscribers. """
+
+    def __init__(self, tree, source, *, sys_dirpath: str = '/sys'):
+        self.tree = tree
+        self.source = source
+        self.sys_dirpath = sys_dirpath
+        self.subscribers = []  # type: List[Callable[[Dict, Dict], None]]
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, callback: Callable[[Dict, Dict], None]) -> Callable[[Dict, Dict], None]:
+        """ Call callback(event, delta) whenever an event changes the tree.  Returns the callback. """
+        with self.lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[Dict, Dict], None]) -> None:
+        with self.lock:
+            self.subscribers.remove(callback)
+
+    def handle_event(self, event: Dict[str, str]) -> Optional[Dict]:
+        """ Apply a single uevent to the tree, returning the delta, or None if the event is not relevant. """
+        if event.get('SUBSYSTEM') != 'usb' or event.get('DEVTYPE') != 'usb_device':
+            # Interfaces and other subsystems do not add nodes to the tree.
+            return None
+        dirpath = self.sys_dirpath.rstrip('/') + event['DEVPATH']
+        action = event['ACTION']
+        if action in ADD_ACTIONS:
+            delta = self.tree.add_usb_device(dirpath)
+        elif action in REMOVE_ACTIONS:
+            delta = self.tree.remove_usb_device(dirpath)
+        elif action in CHANGE_ACTIONS:
+            delta = self.tree.change_device(dirpath)
+        else:
+            return None
+        if not any(delta.values()):
+            return delta
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(event, delta)
+            except Exception:
+                logger.exception(f"Hotplug subscriber failed for event: {event}")
+        return delta
+
+    def run(self) -> None:
+        """ Apply events until the source is exhausted or closed, logging rather than raising any failures. """
+        for event in self.source.events():
+            logger.debug(f"uevent: {event}")
+            try:
+                self.handle_event(event)
+            except Exception:
+                # Such as for a device that vanished while its data was being extracted.
+                logger.exception(f"Unable to apply uevent: {event}")
+
+    def start(self) -> threading.Thread:
+        """ Apply events on a background thread. """
+        self.thread = threading.Thread(target=self.run, name='astutus-hotplug', daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self) -> None:
+        self.source.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -1,35 +1,41 @@
 import logging
 import re
-import copy
+import sys
 from typing import Dict, List, Optional, Set, Tuple  # noqa
 
 import astutus.util
+import astutus.util.templates
 from astutus.usb.device_configurations import DeviceConfiguration
 
 logger = logging.getLogger(__name__)
 
 
 def robust_format_map(template, data):
-    data = copy.deepcopy(data)
-    max_count = template.count('{')
-    count = 0
-    while True:
-        try:
-            value = template.format_map(data)
-            return value
-        except KeyError as exception:
-            logger.error(f'exception: {exception}')
-            data[exception.args[0]] = f"--{exception.args[0]} missing--"
-            count += 1
-            if count > max_count:
-                # Just a double check to prevent infinite loop in case of coding error'
-                return f'robust_format_map error. template: {template} - data: {data}'
+    return astutus.util.templates.render(template, data)
 
 
 class DeviceNode(dict):
-    """ Base class for particular device nodes """
+    """ Base class for particular device nodes
+
+    The labels for display, in LABEL_KEYS, are only rendered when first
+    used, since a given consumer needs either the terminal or the HTML
+    forms, but not both.  They are available as properties, through item
+    access and get, and the in operator finds them.  However, they are not
+    stored in the dictionary, so keys, iteration, and JSON serialization
+    leave them out unless they are added with include_labels.
+
+    The subclasses take a shallow copy of the raw extracted data, rather
+    than a deep copy, and add their derived fields to it.  The raw data is
+    not modified, and the node holds the result as its payload.
+    """
 
     verbose = False
+    LABEL_KEYS = (
+        'terminal_colored_description',
+        'terminal_colored_node_label_concise',
+        'terminal_colored_node_label_verbose',
+        'html_label',
+    )
 
     def __init__(
             self,
@@ -66,35 +72,89 @@ class DeviceNode(dict):
         else:
             self.order = alias['order']
         self.cls_order = cls_order
+        # The rendered labels, by key, filled in on first use.
+        self.labels = {}
 
-        ansi = astutus.util.AnsiSequenceStack()
-        start = ansi.push
-        end = ansi.end
-        color = data['resolved_color']
-        colored_description = f"{start(color)}{data['resolved_description'] }{end(color)}"
-        data['terminal_colored_description'] = colored_description
-        data['terminal_colored_node_label_concise'] = f"{data['dirname']} - {colored_description}"
-        colored_node_id = f"{start(self.node_color)}{data['node_id']}{end(self.node_color)}"
-        data['terminal_colored_node_label_verbose'] = f"{data['dirname']} - {colored_node_id} - {colored_description}"
-        dirname_span = f'<span class="dirname_class">{data["dirname"]}</span>'
-        node_id_span = f'<span class="node_id_class">{data["node_id"]}</span>'
-        description_span = f'<span style="color:{color}">{data["resolved_description"]}</span>'
-        data['html_label'] = f'{dirname_span} {node_id_span} {description_span}'
-
-        self.data = data
         # Inititialize super to support JSON serialization.
         super(DeviceNode, self).__init__(data)
 
+    @property
+    def data(self) -> Dict:
+        """ The payload of the node, which is the node itself. """
+        return self
+
     def key(self) -> str:
         key_value = f"{self.cls_order} - {self.order} - {self.data['dirname']}"
         logger.debug(f"key_value: {key_value}")
         return key_value
 
+    def __missing__(self, key):
+        if key in self.LABEL_KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.LABEL_KEYS or super().__contains__(key)
+
+    def get(self, key, default=None):
+        if key in self.LABEL_KEYS and not super().__contains__(key):
+            return getattr(self, key)
+        return super().get(key, default)
+
+    def include_labels(self, label_keys=None) -> 'DeviceNode':
+        """ Add the labels to the dictionary, so that they are serialized.  Returns the node. """
+        if label_keys is None:
+            label_keys = self.LABEL_KEYS
+        for key in label_keys:
+            self[key] = getattr(self, key)
+        return self
+
+    def render_terminal_labels(self) -> None:
+        ansi = astutus.util.AnsiSequenceStack()
+        start = ansi.push
+        end = ansi.end
+        color = self.data['resolved_color']
+        colored_description = f"{start(color)}{self.data['resolved_description'] }{end(color)}"
+        self.labels['terminal_colored_description'] = colored_description
+        self.labels['terminal_colored_node_label_concise'] = f"{self.data['dirname']} - {colored_description}"
+        colored_node_id = f"{start(self.node_color)}{self.data['node_id']}{end(self.node_color)}"
+        self.labels['terminal_colored_node_label_verbose'] = \
+            f"{self.data['dirname']} - {colored_node_id} - {colored_description}"
+
+    def get_terminal_label(self, key: str) -> str:
+        if key not in self.labels:
+            self.render_terminal_labels()
+        return self.labels[key]
+
+    @property
+    def terminal_colored_description(self) -> str:
+        return self.get_terminal_label('terminal_colored_description')
+
+    @property
+    def terminal_colored_node_label_concise(self) -> str:
+        return self.get_terminal_label('terminal_colored_node_label_concise')
+
+    @property
+    def terminal_colored_node_label_verbose(self) -> str:
+        return self.get_terminal_label('terminal_colored_node_label_verbose')
+
+    @property
+    def html_label(self) -> str:
+        html_label = self.labels.get('html_label')
+        if html_label is None:
+            dirname_span = f'<span class="dirname_class">{self.data["dirname"]}</span>'
+            node_id_span = f'<span class="node_id_class">{self.data["node_id"]}</span>'
+            description_span = \
+                f'<span style="color:{self.data["resolved_color"]}">{self.data["resolved_description"]}</span>'
+            html_label = f'{dirname_span} {node_id_span} {description_span}'
+            self.labels['html_label'] = html_label
+        return html_label
+
     @property
     def colorized_node_label_for_terminal(self) -> str:
         if self.verbose:
-            return self.data['terminal_colored_node_label_verbose']
-        return self.data['terminal_colored_node_label_concise']
+            return self.terminal_colored_node_label_verbose
+        return self.terminal_colored_node_label_concise
 
 
 class OtherDeviceNodeData(DeviceNode):
@@ -103,7 +163,7 @@ class OtherDeviceNodeData(DeviceNode):
 
     @staticmethod
     def node_id_from_data(data: Dict) -> str:
-        return f'other({data.get("dirname", "???")})'
+        return sys.intern(f'other({data.get("dirname", "???")})')
 
     @classmethod
     def extract_data(cls, dirpath: str) -> Dict:
@@ -113,7 +173,7 @@ class OtherDeviceNodeData(DeviceNode):
         return data
 
     def __init__(self, *, data: Dict, config: DeviceConfiguration, alias: Dict):
-        data = copy.deepcopy(data)
+        data = dict(data)
         assert data.get('dirpath') is not None, data
         data["description"] = data['dirpath']
         super(OtherDeviceNodeData, self).__init__(data, config, alias, self.cls_order)
@@ -125,17 +185,23 @@ class PciDeviceNodeData(DeviceNode):
 
     @staticmethod
     def node_id_from_data(data: Dict) -> str:
-        return f"pci({data.get('vendor', '-')}:{data.get('device', '-')})"
+        return sys.intern(f"pci({data.get('vendor', '-')}:{data.get('device', '-')})")
 
     @classmethod
-    def extract_data(cls, dirpath: str) -> Dict:
-        data = astutus.usb.usb_impl.extract_specified_data(dirpath, astutus.usb.usb_impl.PCI_KEY_ATTRIBUTES)
+    def extract_data(cls, dirpath: str, use_uevent: bool = True) -> Dict:
+        if use_uevent:
+            data = astutus.usb.usb_impl.extract_specified_data_from_uevent(
+                dirpath,
+                astutus.usb.usb_impl.PCI_KEY_ATTRIBUTES,
+                astutus.usb.usb_impl.pci_attributes_from_uevent)
+        else:
+            data = astutus.usb.usb_impl.extract_specified_data(dirpath, astutus.usb.usb_impl.PCI_KEY_ATTRIBUTES)
         data['node_id'] = cls.node_id_from_data(data)
         data['ilk'] = 'pci'
         return data
 
     def __init__(self, *, data: Dict, config: DeviceConfiguration, alias: Dict):
-        data = copy.deepcopy(data)
+        data = dict(data)
         assert data.get('dirpath') is not None, data
         data["description"] = "{Device}"  # f"data: {data}"
         super(PciDeviceNodeData, self).__init__(data, config, alias, self.cls_order)
@@ -147,24 +213,28 @@ class UsbDeviceNodeData(DeviceNode):
 
     @staticmethod
     def node_id_from_data(data: Dict) -> str:
-        return f"usb({data['idVendor']}:{data['idProduct']})"
+        return sys.intern(f"usb({data['idVendor']}:{data['idProduct']})")
 
     @classmethod
-    def extract_data(cls, dirpath):
-        data = astutus.usb.usb_impl.extract_specified_data(dirpath, astutus.usb.usb_impl.USB_KEY_ATTRIBUTES)
+    def extract_data(cls, dirpath: str, use_uevent: bool = True) -> Dict:
+        if use_uevent:
+            data = astutus.usb.usb_impl.extract_specified_data_from_uevent(
+                dirpath,
+                astutus.usb.usb_impl.USB_KEY_ATTRIBUTES,
+                astutus.usb.usb_impl.usb_attributes_from_uevent)
+        else:
+            data = astutus.usb.usb_impl.extract_specified_data(dirpath, astutus.usb.usb_impl.USB_KEY_ATTRIBUTES)
         data['node_id'] = cls.node_id_from_data(data)
         data['ilk'] = 'usb'
         return data
 
     def __init__(self, *, data: Dict, config: DeviceConfiguration, alias: Dict):
-        data = copy.deepcopy(data)
-        busnum = int(data['busnum'])
-        devnum = int(data['devnum'])
-        _, _, description = astutus.usb.find_vendor_info_from_busnum_and_devnum(busnum, devnum)
-        data["description"] = description
+        data = dict(data)
+        data["description"] = astutus.usb.usb_impl.find_description_for_usb_device(data)
         if config is not None and config.find_tty():
             tty = astutus.usb.find_tty_from_pci_path(data['dirpath'])
-            data['tty'] = tty
+            if tty is not None:
+                data['tty'] = tty
         super(UsbDeviceNodeData, self).__init__(data, config, alias, self.cls_order)
 
 
@@ -172,7 +242,7 @@ def node_id_for_dirpath(dirpath: str) -> str:
     data = UsbDeviceNodeData.extract_data(dirpath)
     if data.get("busnum") is not None:
         return UsbDeviceNodeData.node_id_from_data(data)
-    data = PciDeviceNodeData.extract_data('', dirpath)
+    data = PciDeviceNodeData.extract_data(dirpath)
     if data.get("device") is not None:
         return PciDeviceNodeData.node_id_from_data(data)
     return None
@@ -1,4 +1,5 @@
 import astutus.usb
+import astutus.util.pci
 
 
 class NodeDataSearcher(object):
@@ -6,14 +7,13 @@ class NodeDataSearcher(object):
     def __init__(self):
         self.device_configurations = astutus.usb.DeviceConfigurations()
         self.aliases = astutus.usb.device_aliases.DeviceAliases(filepath=None)
-        self.pci_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_lspci()
         self.node_data_by_dirpath = {}
 
     def get_node_data(self, dirpath):
         parent_dirpath, dirname = dirpath.rsplit('/', 1)
         ilk = astutus.usb.usb_impl.find_ilk_for_dirpath(dirpath)
         if ilk == 'pci':
-            pci_device_info = astutus.util.pci.get_device_info_from_dirname(self.pci_device_info_map, dirname)
+            pci_device_info = astutus.util.pci.get_device_info_for_dirpath(dirpath)
         else:
             pci_device_info = None
         data_for_dirpath = astutus.usb.tree.get_data_for_dirpath(ilk, dirpath, pci_device_info)
@@ -48,5 +48,5 @@ class NodeDataSearcher(object):
             'html_label': node_data['html_label'],
             'nodepath': nodepath,
             'alias': alias,
-            'node_data': node_data,
+            'node_data': node_data.include_labels(),
         }
@@ -0,0 +1,145 @@
+"""
+
+Interning of dirpaths and nodepaths, with canonical strings and integer ids.
+
+The same long dirpaths, such as
+/sys/devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2.1, turn up as keys and
+values all through the tree data, and nodepaths repeat the same node ids
+over and over again.  A PathTable gives each path a small integer id, and
+records the id of its parent and its last component, so that the parent,
+name, and ancestors of a path are found without splitting strings::
+
+    table = astutus.usb.paths.get_dirpath_table()
+    path_id = table.intern('/sys/devices/pci0000:00/0000:00:14.0')
+    table.path(path_id)  # The canonical string, the same object every time.
+    table.name(path_id)  # '0000:00:14.0'
+    table.path(table.parent(path_id))  # '/sys/devices/pci0000:00'
+
+Using the canonical strings everywhere means that equal paths are the same
+object, so dictionary lookups succeed on the identity check without
+comparing characters, and the tree data holds one copy of each path.
+This is interning, not compression: the full string for each path is
+stored, so paths with a common prefix do not share the memory for it.
+
+The process wide tables only grow, so once one holds more than MAX_PATHS
+paths, the getter replaces it with a new, empty table.  Path ids are only
+meaningful for the table that issued them, so callers get the table once,
+use its ids within a single operation, and never keep them.
+
+"""
+import logging
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+NO_PATH = -1
+MAX_PATHS = 65536
+
+
+class PathTable(object):
+    """ Maps paths to small integer ids and canonical strings, recording the parent id and last component of each. """
+
+    def __init__(self, separator: str = '/'):
+        self.separator = separator
+        self.parents = []  # type: List[int]
+        self.names = []  # type: List[str]
+        self.paths = []  # type: List[str]
+        self.id_by_path = {}  # type: Dict[str, int]
+        # Lookups of existing paths need no lock, but adding paths does, since the tree data may be extracted on
+        # several threads.
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def intern_child(self, parent_id: int, name: str) -> int:
+        """ Get the id for the path made of a parent path and a last component.
+
+        A parent_id of NO_PATH gives a path consisting of just the name.
+        """
+        if parent_id == NO_PATH:
+            path = name
+        else:
+            path = self.paths[parent_id] + self.separator + name
+        path_id = self.id_by_path.get(path)
+        if path_id is not None:
+            return path_id
+        with self.lock:
+            path_id = self.id_by_path.get(path)
+            if path_id is None:
+                path_id = len(self.paths)
+                self.parents.append(parent_id)
+                self.names.append(sys.intern(name))
+                self.paths.append(path)
+                self.id_by_path[path] = path_id
+        return path_id
+
+    def intern(self, path: str) -> int:
+        """ Get the id for a path, adding it and any of its ancestors that are not already present. """
+        path_id = self.id_by_path.get(path)
+        if path_id is not None:
+            return path_id
+        parent_path, separator, name = path.rpartition(self.separator)
+        if not separator:
+            return self.intern_child(NO_PATH, name)
+        return self.intern_child(self.intern(parent_path), name)
+
+    def find(self, path: str) -> Optional[int]:
+        """ Get the id for a path, or None if it has not been interned. """
+        return self.id_by_path.get(path)
+
+    def canonical(self, path: Optional[str]) -> Optional[str]:
+        """ Get the shared string for a path that is equal to it. """
+        if path is None:
+            return None
+        return self.paths[self.intern(path)]
+
+    def path(self, path_id: int) -> str:
+        return self.paths[path_id]
+
+    def name(self, path_id: int) -> str:
+        return self.names[path_id]
+
+    def parent(self, path_id: int) -> int:
+        return self.parents[path_id]
+
+    def split(self, path: str) -> Tuple[str, str]:
+        """ Like path.rsplit(separator, 1), but returning shared strings. """
+        path_id = self.intern(path)
+        parent_id = self.parents[path_id]
+        if parent_id == NO_PATH:
+            raise ValueError(f"Path has no parent: {path}")
+        return self.paths[parent_id], self.names[path_id]
+
+    def lineage(self, path_id: int, ancestor_id: int = NO_PATH) -> List[int]:
+        """ The ids from the ancestor down to the path, inclusive, or from the topmost path if not an ancestor. """
+        ids = []
+        while path_id != NO_PATH:
+            ids.append(path_id)
+            if path_id == ancestor_id:
+                break
+            path_id = self.parents[path_id]
+        ids.reverse()
+        return ids
+
+
+dirpath_table = None
+nodepath_table = None
+
+
+def get_dirpath_table() -> PathTable:
+    """ Get the process wide table for sysfs dirpaths. """
+    global dirpath_table
+    if dirpath_table is None or len(dirpath_table) > MAX_PATHS:
+        dirpath_table = PathTable()
+    return dirpath_table
+
+
+def get_nodepath_table() -> PathTable:
+    """ Get the process wide table for nodepaths, such as usb(1d6b:0002)/usb(05e3:0610). """
+    global nodepath_table
+    if nodepath_table is None or len(nodepath_table) > MAX_PATHS:
+        nodepath_table = PathTable()
+    return nodepath_table
@@ -0,0 +1,122 @@
+"""
+
+In-process evaluation of the tests that select a styler for a device configuration.
+
+A configuration can have several stylers, each with a test that decides
+whether the styler applies to a particular device.  For example, the
+Logitech Unifying Receiver is styled as a mouse or as a keyboard depending
+on what is attached to it, which shows up somewhere below the receiver
+in the /sys/devices hierarchy.
+
+The supported tests are:
+
+    subtree_contains
+        Some regular file under the device directory, within max_depth
+        levels, contains the text given as value.
+
+    attribute_equals
+        The attribute file named by attribute in the device directory
+        holds exactly the text given as value.
+
+    value_in_stdout
+        The legacy form, which runs the shell command given as cmd in the
+        device directory and checks whether its stdout contains the value.
+
+The stylers are looked up more than once for each node, such as for the
+color and for the description, so the results are memoized by a
+PredicateCache for the life of a tree build.
+
+"""
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+import astutus.util
+import astutus.util.sysfs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DEPTH = 8
+
+# Sysfs attribute files are small, but some binary ones, such as config
+# for PCI devices and firmware blobs, are not.  Only the start is searched.
+MAX_BYTES_READ = 65536
+
+
+def subtree_contains(dirpath: str, value: str, max_depth: int = DEFAULT_MAX_DEPTH) -> bool:
+    """ Check whether any regular file in the subtree of dirpath contains the value.
+
+    Like ``grep -r``, symbolic links found within the subtree are not followed.
+    """
+    needle = value.encode('utf-8')
+    stack = [(dirpath, 0)]
+    while stack:
+        current_dirpath, depth = stack.pop()
+        try:
+            with os.scandir(current_dirpath) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    with open(entry.path, 'rb') as subtree_file:
+                        if needle in subtree_file.read(MAX_BYTES_READ):
+                            return True
+                elif entry.is_dir(follow_symlinks=False) and depth < max_depth:
+                    stack.append((entry.path, depth + 1))
+            except OSError:
+                # Write only attributes and attributes that fail on read are common in sysfs.
+                continue
+    return False
+
+
+def attribute_equals(dirpath: str, attribute: str, value: str) -> bool:
+    return astutus.util.sysfs.read_attribute(dirpath, attribute) == value
+
+
+def value_in_stdout(dirpath: str, cmd: str, value: str, command_runner=astutus.util.run_cmd) -> bool:
+    _, stdout, _ = command_runner(cmd, cwd=dirpath)
+    return value in stdout
+
+
+class PredicateCache(object):
+    """ Evaluates styler tests, memoizing the result for each directory and test. """
+
+    def __init__(self):
+        self.results = {}  # type: Dict[Tuple, bool]
+
+    def clear(self) -> None:
+        self.results = {}
+
+    def evaluate(self, dirpath: str, styler: Dict, command_runner=astutus.util.run_cmd) -> bool:
+        test = styler.get('test')
+        if test is None:
+            return True
+        key = (dirpath, test, styler.get('cmd'), styler.get('attribute'), styler.get('value'), styler.get('max_depth'))
+        result = self.results.get(key)
+        if result is None:
+            result = self.evaluate_uncached(dirpath, styler, command_runner)
+            self.results[key] = result
+        return result
+
+    @staticmethod
+    def evaluate_uncached(dirpath: str, styler: Dict, command_runner=astutus.util.run_cmd) -> bool:
+        test = styler.get('test')
+        value = styler.get('value')
+        if test == 'subtree_contains':
+            if value is None:
+                raise ValueError('value must be given for test subtree_contains')
+            return subtree_contains(dirpath, value, styler.get('max_depth', DEFAULT_MAX_DEPTH))
+        elif test == 'attribute_equals':
+            attribute = styler.get('attribute')
+            if attribute is None:
+                raise ValueError('attribute must be given for test attribute_equals')
+            return attribute_equals(dirpath, attribute, value)
+        elif test == 'value_in_stdout':
+            cmd = styler.get('cmd')
+            if cmd is None:
+                raise ValueError('cmd must be given for test value_in_stdout')
+            return value_in_stdout(dirpath, cmd, value, command_runner)
+        logger.warning(f"Unknown styler test: {test}")
+        return False
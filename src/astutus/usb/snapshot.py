@@ -0,0 +1,265 @@
+"""
+
+A persistent snapshot of the raw data of a UsbDeviceTree, for fast startup.
+
+Building a tree means walking sysfs, reading the attributes of every
+node, and possibly running lsusb or lspci.  As long as nothing has been
+plugged in or unplugged, the results are the same every time, so the
+raw data for each node is saved in a compact binary file, which later
+invocations memory map and load in milliseconds.
+
+A snapshot is only used if it was taken during the same boot, and the
+topology signature is unchanged.  When the tree is enumerated from
+/sys/bus, the signature is a hash of the names and inode numbers of the
+entries of /sys/bus/usb/devices and /sys/bus/pci/devices, which are
+recreated whenever a device is plugged in.  When the tree is found by
+walking its basepath, the signature is instead a hash of the names and
+inode numbers of the subdirectories of each directory in the tree, so a
+device plugged in or unplugged below any node of the tree changes it.
+Either way, the settings that determine what is in the tree are included.
+
+The layout, with all integers little endian, is:
+
+    header      magic, version, boot id string, counts, and signature
+    nodes       fixed width records: dirpath string, parent node,
+                first attribute, attribute count, and flags
+    attributes  fixed width records: key string and value string
+    offsets     the offset of each string in the string data, plus the end
+    strings     the UTF-8 encoded strings, each stored only once
+
+"""
+import hashlib
+import logging
+import mmap
+import os
+import os.path
+import struct
+from typing import Callable, Dict, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ASTUTUS\0'
+FORMAT_VERSION = 1
+BOOT_ID_FILEPATH = '/proc/sys/kernel/random/boot_id'
+SIGNATURE_BUSES = ['usb', 'pci']
+
+# magic, version, boot id string, node count, attribute count, string count, signature
+HEADER = struct.Struct('<8sIIIII32s')
+# dirpath string, parent node, first attribute, attribute count, flags
+NODE = struct.Struct('<IiIHH')
+# key string, value string
+ATTRIBUTE = struct.Struct('<II')
+OFFSET = struct.Struct('<I')
+
+NO_PARENT = -1
+NO_STRING = 0xffffffff
+FLAG_USB_DEVICE = 0x01
+
+
+def read_boot_id(filepath: str = BOOT_ID_FILEPATH) -> str:
+    try:
+        with open(filepath, 'r') as boot_id_file:
+            return boot_id_file.read().strip()
+    except OSError:
+        return ''
+
+
+def find_topology_signature(sys_bus_dirpath: str, settings: List[str]) -> bytes:
+    """ Hash the device entries of the USB and PCI buses, along with the settings for the tree. """
+    digest = hashlib.sha256()
+    for setting in settings:
+        digest.update(setting.encode('utf-8') + b'\0')
+    for bus in SIGNATURE_BUSES:
+        bus_dirpath = os.path.join(sys_bus_dirpath, bus, 'devices')
+        try:
+            with os.scandir(bus_dirpath) as entries:
+                items = sorted((entry.name, entry.inode()) for entry in entries)
+        except OSError:
+            items = []
+        digest.update(f'{bus}:{len(items)}\0'.encode('utf-8'))
+        for name, inode in items:
+            digest.update(f'{name}:{inode}\0'.encode('utf-8'))
+    return digest.digest()
+
+
+def find_tree_signature(tree_dirpaths: List[str], settings: List[str]) -> bytes:
+    """ Hash the subdirectories of each directory of a tree, along with the settings for the tree. """
+    digest = hashlib.sha256()
+    for setting in settings:
+        digest.update(setting.encode('utf-8') + b'\0')
+    for dirpath in tree_dirpaths:
+        try:
+            with os.scandir(dirpath) as entries:
+                items = sorted(
+                    (entry.name, entry.inode()) for entry in entries if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            items = []
+        digest.update(f'{dirpath}:{len(items)}\0'.encode('utf-8', errors='surrogateescape'))
+        for name, inode in items:
+            digest.update(f'{name}:{inode}\0'.encode('utf-8', errors='surrogateescape'))
+    return digest.digest()
+
+
+class StringTable(object):
+
+    def __init__(self):
+        self.index_by_string = {}  # type: Dict[str, int]
+        self.encoded_strings = []  # type: List[bytes]
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = self.index_by_string.get(value)
+        if index is None:
+            index = len(self.encoded_strings)
+            self.index_by_string[value] = index
+            self.encoded_strings.append(value.encode('utf-8', errors='surrogateescape'))
+        return index
+
+
+def save_snapshot(
+        filepath: str,
+        *,
+        boot_id: str,
+        signature: bytes,
+        tree_dirpaths: List[str],
+        usb_device_dirpaths: List[str],
+        data_by_dirpath: Dict[str, Dict[str, str]]) -> None:
+    """ Write the raw data for the nodes of a tree, replacing any existing snapshot atomically. """
+    strings = StringTable()
+    boot_id_index = strings.add(boot_id)
+    node_by_dirpath = {}
+    usb_device_dirpath_set = set(usb_device_dirpaths)
+    node_chunks = []
+    attribute_chunks = []
+    attribute_count = 0
+    for node, dirpath in enumerate(tree_dirpaths):
+        node_by_dirpath[dirpath] = node
+        parent_dirpath = dirpath.rsplit('/', 1)[0]
+        parent = node_by_dirpath.get(parent_dirpath, NO_PARENT)
+        data = data_by_dirpath[dirpath]
+        flags = FLAG_USB_DEVICE if dirpath in usb_device_dirpath_set else 0
+        node_chunks.append(NODE.pack(strings.add(dirpath), parent, attribute_count, len(data), flags))
+        for key, value in data.items():
+            attribute_chunks.append(ATTRIBUTE.pack(strings.add(key), strings.add(value)))
+        attribute_count += len(data)
+    offset_chunks = []
+    offset = 0
+    for encoded_string in strings.encoded_strings:
+        offset_chunks.append(OFFSET.pack(offset))
+        offset += len(encoded_string)
+    offset_chunks.append(OFFSET.pack(offset))
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, boot_id_index, len(tree_dirpaths), attribute_count,
+        len(strings.encoded_strings), signature)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    temporary_filepath = f'{filepath}.{os.getpid()}.tmp'
+    with open(temporary_filepath, 'wb') as snapshot_file:
+        snapshot_file.write(header)
+        snapshot_file.write(b''.join(node_chunks))
+        snapshot_file.write(b''.join(attribute_chunks))
+        snapshot_file.write(b''.join(offset_chunks))
+        snapshot_file.write(b''.join(strings.encoded_strings))
+    os.replace(temporary_filepath, filepath)
+
+
+class Snapshot(object):
+    """ A memory mapped snapshot, with the strings decoded on demand. """
+
+    def __init__(self, filepath: str):
+        with open(filepath, 'rb') as snapshot_file:
+            self.buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, boot_id_index, self.node_count, self.attribute_count, self.string_count,
+             self.signature) = HEADER.unpack_from(self.buffer, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Not a version {FORMAT_VERSION} snapshot: {filepath}")
+            self.nodes_offset = HEADER.size
+            self.attributes_offset = self.nodes_offset + self.node_count * NODE.size
+            self.offsets_offset = self.attributes_offset + self.attribute_count * ATTRIBUTE.size
+            self.strings_offset = self.offsets_offset + (self.string_count + 1) * OFFSET.size
+            if len(self.buffer) < self.strings_offset:
+                raise ValueError(f"Truncated snapshot: {filepath}")
+            self.decoded_strings = [None] * self.string_count
+            self.boot_id = self.get_string(boot_id_index)
+        except (IndexError, struct.error, ValueError):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        self.buffer.close()
+
+    def get_string(self, index: int) -> Optional[str]:
+        if index == NO_STRING:
+            return None
+        value = self.decoded_strings[index]
+        if value is None:
+            start, = OFFSET.unpack_from(self.buffer, self.offsets_offset + index * OFFSET.size)
+            end, = OFFSET.unpack_from(self.buffer, self.offsets_offset + (index + 1) * OFFSET.size)
+            raw_value = self.buffer[self.strings_offset + start:self.strings_offset + end]
+            value = raw_value.decode('utf-8', errors='surrogateescape')
+            self.decoded_strings[index] = value
+        return value
+
+    def get_node(self, node: int) -> Tuple[str, int, Dict[str, str], int]:
+        """ Get the dirpath, parent node, data, and flags for a node. """
+        dirpath_index, parent, first_attribute, attribute_count, flags = NODE.unpack_from(
+            self.buffer, self.nodes_offset + node * NODE.size)
+        data = {}
+        for attribute in range(first_attribute, first_attribute + attribute_count):
+            key_index, value_index = ATTRIBUTE.unpack_from(
+                self.buffer, self.attributes_offset + attribute * ATTRIBUTE.size)
+            data[self.get_string(key_index)] = self.get_string(value_index)
+        return self.get_string(dirpath_index), parent, data, flags
+
+    def to_tree_data(self) -> Dict:
+        """ Get the tree_dirpaths, usb_device_dirpaths, ilk_by_dirpath, and data_by_dirpath. """
+        tree_dirpaths = []
+        usb_device_dirpaths = []
+        ilk_by_dirpath = {}
+        data_by_dirpath = {}
+        for node in range(self.node_count):
+            dirpath, _, data, flags = self.get_node(node)
+            tree_dirpaths.append(dirpath)
+            if flags & FLAG_USB_DEVICE:
+                usb_device_dirpaths.append(dirpath)
+            ilk_by_dirpath[dirpath] = data.get('ilk')
+            data_by_dirpath[dirpath] = data
+        return {
+            'tree_dirpaths': tree_dirpaths,
+            'usb_device_dirpaths': usb_device_dirpaths,
+            'ilk_by_dirpath': ilk_by_dirpath,
+            'data_by_dirpath': data_by_dirpath,
+        }
+
+
+def load_snapshot(
+        filepath: str,
+        *,
+        boot_id: str,
+        signature: bytes = None,
+        find_signature: Callable[[List[str]], bytes] = None) -> Optional[Dict]:
+    """ Load the tree data from a snapshot, or None if it is missing, unreadable, corrupt, or out of date.
+
+    The signature may be given directly, or found from the tree dirpaths
+    of the snapshot by find_signature.
+    """
+    try:
+        snapshot = Snapshot(filepath)
+    except (OSError, IndexError, ValueError, struct.error) as exception:
+        logger.debug(f"No usable snapshot at {filepath}: {exception}")
+        return None
+    try:
+        if snapshot.boot_id != boot_id or (signature is not None and snapshot.signature != signature):
+            logger.info(f"Snapshot at {filepath} is out of date")
+            return None
+        tree_data = snapshot.to_tree_data()
+        if find_signature is not None and snapshot.signature != find_signature(tree_data['tree_dirpaths']):
+            logger.info(f"Snapshot at {filepath} is out of date")
+            return None
+        return tree_data
+    except (IndexError, ValueError, struct.error) as exception:
+        logger.debug(f"Corrupt snapshot at {filepath}: {exception}")
+        return None
+    finally:
+        snapshot.close()
@@ -0,0 +1,164 @@
+"""
+
+Indexes over the /sys hierarchy that replace repeated searches of device subtrees.
+
+The class directories, such as /sys/class/tty, hold a symbolic link for
+every class device, which resolves to a directory somewhere below the
+device that owns it.  For example, the tty for a USB serial adapter
+resolves to something like::
+
+    /sys/devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2:1.0/ttyUSB0/tty/ttyUSB0
+
+A single pass over the class directories finds every class device,
+rather than searching the subtree of each device of interest with
+``find`` or ``grep``.
+
+Similarly, /sys/bus/usb/devices holds a symbolic link for every USB
+device and interface, so all of the USB devices can be found without
+searching /sys/devices.
+
+"""
+import logging
+import os
+import os.path
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+import astutus.util.sysfs
+
+logger = logging.getLogger(__name__)
+
+SYS_CLASS_DIRPATH = '/sys/class'
+SYS_BUS_USB_DEVICES = '/sys/bus/usb/devices'
+
+DEFAULT_CLASS_NAMES = ['tty', 'net', 'input', 'block', 'hidraw', 'leds']
+
+
+class ClassDeviceIndex(object):
+    """ Maps each device dirpath to the class devices found anywhere in its subtree.
+
+    The index is built lazily on first use.  Call refresh to rebuild it
+    after devices have been added or removed.
+    """
+
+    def __init__(self, *, class_names: List[str] = None, sys_class_dirpath: str = SYS_CLASS_DIRPATH):
+        if class_names is None:
+            class_names = DEFAULT_CLASS_NAMES
+        self.class_names = class_names
+        self.sys_class_dirpath = sys_class_dirpath
+        self.class_devices_by_dirpath = None
+
+    def refresh(self) -> None:
+        logger.info("Start building class device index")
+        class_devices_by_dirpath = {}
+        for class_name in self.class_names:
+            class_dirpath = os.path.join(self.sys_class_dirpath, class_name)
+            try:
+                names = sorted(os.listdir(class_dirpath))
+            except OSError:
+                continue
+            for name in names:
+                class_device_dirpath = os.path.realpath(os.path.join(class_dirpath, name))
+                # Register the class device with the device that directly owns it,
+                # and with every ancestor of that device.
+                dirpath = os.path.dirname(class_device_dirpath)
+                while dirpath not in ('/', ''):
+                    class_devices = class_devices_by_dirpath.setdefault(dirpath, {})
+                    class_devices.setdefault(class_name, []).append(name)
+                    dirpath = os.path.dirname(dirpath)
+        self.class_devices_by_dirpath = class_devices_by_dirpath
+        logger.info("End building class device index")
+
+    def find(self, dirpath: str, class_name: str) -> List[str]:
+        """ Find the names of the class devices of a class in the subtree of a device. """
+        if self.class_devices_by_dirpath is None:
+            self.refresh()
+        class_devices = self.class_devices_by_dirpath.get(dirpath.rstrip('/'), {})
+        return class_devices.get(class_name, [])
+
+    def is_current(self, dirpath: str, class_name: str, name: str) -> bool:
+        """ Check that a class device still resolves to somewhere in the subtree of a device. """
+        class_device_dirpath = os.path.realpath(os.path.join(self.sys_class_dirpath, class_name, name))
+        return class_device_dirpath.startswith(dirpath.rstrip('/') + '/')
+
+    def find_current(self, dirpath: str, class_name: str) -> List[str]:
+        """ Like find, but rebuild the index if it finds nothing, or anything that has since moved.
+
+        Class devices are renumbered when devices are replugged, so in a long
+        running process, the index may be out of date.
+        """
+        names = self.find(dirpath, class_name)
+        if len(names) == 0 or not all(self.is_current(dirpath, class_name, name) for name in names):
+            self.refresh()
+            names = self.find(dirpath, class_name)
+        return names
+
+
+class_device_index = ClassDeviceIndex()
+
+
+def get_class_device_index() -> ClassDeviceIndex:
+    """ Get the process wide class device index. """
+    return class_device_index
+
+
+class UsbDeviceIndex(object):
+    """ Maps (idVendor, idProduct) to the dirpaths of the USB devices with those ids.
+
+    The index is rebuilt only when the set of USB devices has changed.  The
+    check for changes compares the names and inode numbers of the entries
+    of /sys/bus/usb/devices, which are recreated whenever a device is
+    plugged in, even if it is plugged into the same port.  This costs a
+    single directory read, so repeated lookups stay cheap.
+    """
+
+    def __init__(self, *, sys_bus_usb_devices_dirpath: str = SYS_BUS_USB_DEVICES):
+        self.sys_bus_usb_devices_dirpath = sys_bus_usb_devices_dirpath
+        self.bus_signature = None
+        self.dirpaths_by_ids = {}
+
+    def get_bus_signature(self) -> Tuple:
+        try:
+            with os.scandir(self.sys_bus_usb_devices_dirpath) as entries:
+                return tuple(sorted((entry.name, entry.inode()) for entry in entries))
+        except OSError:
+            return ()
+
+    def refresh(self, bus_signature: Tuple = None) -> None:
+        if bus_signature is None:
+            bus_signature = self.get_bus_signature()
+        logger.info("Start building USB device index")
+        dirpaths_by_ids = {}
+        for name, _ in bus_signature:
+            if ':' in name:
+                # An interface, rather than a device.
+                continue
+            dirpath = os.path.realpath(os.path.join(self.sys_bus_usb_devices_dirpath, name))
+            attributes = astutus.util.sysfs.read_attributes(dirpath, ['idVendor', 'idProduct'])
+            key = (attributes.get('idVendor'), attributes.get('idProduct'))
+            dirpaths_by_ids.setdefault(key, []).append(dirpath)
+        for dirpaths in dirpaths_by_ids.values():
+            dirpaths.sort()
+        self.dirpaths_by_ids = dirpaths_by_ids
+        self.bus_signature = bus_signature
+        logger.info("End building USB device index")
+
+    def refresh_if_changed(self) -> bool:
+        """ Rebuild the index if the USB devices have changed, returning whether it was rebuilt. """
+        bus_signature = self.get_bus_signature()
+        if bus_signature == self.bus_signature:
+            return False
+        self.refresh(bus_signature)
+        return True
+
+    def find(self, id_vendor: str, id_product: str) -> List[str]:
+        """ Find the dirpaths of the USB devices with the given ids, such as 1a86 and 7523 """
+        self.refresh_if_changed()
+        return list(self.dirpaths_by_ids.get((id_vendor.lower(), id_product.lower()), []))
+
+
+usb_device_index = UsbDeviceIndex()
+
+
+def get_usb_device_index() -> UsbDeviceIndex:
+    """ Get the process wide USB device index. """
+    return usb_device_index
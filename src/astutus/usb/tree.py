@@ -1,20 +1,30 @@
 #!/usr/bin/env python3
 
 import argparse
-import copy
+import asyncio
 import json
 import logging
 import os
 import os.path
 import sys
+import threading
 from datetime import datetime
 
 import astutus.log
 import astutus.usb
 
+import astutus.usb.compact_tree
+import astutus.usb.hotplug
 import astutus.usb.node
+import astutus.usb.paths
+import astutus.usb.snapshot
+import astutus.usb.sysfs_index
+import astutus.usb.usb_impl
+import astutus.usb.walker
 import astutus.util
-import treelib
+import astutus.util.aio
+import astutus.util.pci
+import astutus.util.sysfs
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +33,9 @@ logger = logging.getLogger(__name__)
 DEFAULT_BASEPATH = "/sys/devices"
 DEFAULT_DEVICE_ALIASES_FILEPATH = "~/.astutus/device_aliases.json"
 DEFAULT_DEVICE_CONFIGURATIONS_FILEPATH = "~/.astutus/device_configurations.json"
+DEFAULT_SNAPSHOT_FILEPATH = "~/.astutus/cache/usb_tree.snapshot"
+SYS_BUS_DIRPATH = "/sys/bus"
+ENUMERATION_MODES = ['bus', 'walk']
 
 
 def key_by_node_data_key(node):
@@ -81,17 +94,43 @@ class UsbDeviceTree(object):
     To speed up rendering, this code implements caching of intermediate calculations
     and lazy evaluation.
 
+    A HotplugMonitor may update the tree on its own thread.  The updates, and
+    the methods that build the tree, hold the tree's lock.  Updates replace the
+    containers for the tree data with new ones, rather than changing them, so
+    containers already returned stay consistent.
+
     """
 
-    def __init__(self, basepath, device_aliases_filepath, device_configurations_filepath=None):
+    def __init__(
+            self,
+            basepath,
+            device_aliases_filepath,
+            device_configurations_filepath=None,
+            enumeration=None,
+            prune_patterns=None,
+            workers=1,
+            snapshot_filepath=None,
+            sys_bus_dirpath=SYS_BUS_DIRPATH):
         if basepath is None:
             basepath = DEFAULT_BASEPATH
         self.basepath = basepath
+        if enumeration is None:
+            enumeration = self.default_enumeration(basepath, sys_bus_dirpath)
+        assert enumeration in ENUMERATION_MODES, enumeration
+        self.enumeration = enumeration
+        self.prune_patterns = prune_patterns
+        self.walker = astutus.usb.walker.SysfsWalker(prune_patterns=prune_patterns, workers=workers)
         self.device_aliases_filepath = device_aliases_filepath
         self.device_configurations_filepath = device_configurations_filepath
+        if snapshot_filepath is not None:
+            snapshot_filepath = os.path.expanduser(snapshot_filepath)
+        self.snapshot_filepath = snapshot_filepath
+        self.sys_bus_dirpath = sys_bus_dirpath
+        # Guards the lazily evaluated items, which hotplug events update from another thread.
+        self.lock = threading.RLock()
         # These items for lazy evaluation.
         self.slot_to_device_info_map = None
-        self.treelib_tree = None
+        self.compact_tree = None
         self.device_configurations = None
         self.aliases = None
         self.tree_dirpaths = None
@@ -99,75 +138,129 @@ class UsbDeviceTree(object):
         self.ilk_by_dirpath = None
         self.usb_device_dirpaths = None
         self.tree_as_dict = None
+        # The signatures of the directories at the time their data was extracted, used by refresh.
+        self.signature_by_dirpath = None
 
     def get_device_info_map(self):
         if self.slot_to_device_info_map is None:
-            self.slot_to_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_lspci()
+            self.slot_to_device_info_map = astutus.util.pci.get_slot_to_device_info_map()
         return self.slot_to_device_info_map
 
     @staticmethod
-    def walk_basepath_for_usb(basepath):
-        logger.info(f"Start walk for {basepath}")
-        ilk_by_dirpath = {}
+    def default_enumeration(basepath, sys_bus_dirpath=SYS_BUS_DIRPATH):
+        """ Enumerate from the bus directory when the basepath is within the devices directory next to it.
+
+        For the defaults, that is from /sys/bus when the basepath is within /sys/devices.  Otherwise walk the basepath.
+        """
+        sys_bus_dirpath = sys_bus_dirpath.rstrip('/')
+        devices_dirpath = os.path.join(os.path.dirname(sys_bus_dirpath), 'devices')
+        is_within_devices = (basepath.rstrip('/') + '/').startswith(devices_dirpath + '/')
+        if is_within_devices and os.path.isdir(f'{sys_bus_dirpath}/usb/devices'):
+            return 'bus'
+        return 'walk'
+
+    @staticmethod
+    def enumerate_bus_for_usb(basepath, sys_bus_dirpath=SYS_BUS_DIRPATH):
+        """ Find the USB devices and the ilk of their ancestors from the links in /sys/bus.
+
+        This gives the same results as walk_basepath_for_usb for the directories
+        that are part of the tree, but only visits the devices themselves.
+        """
+        logger.info(f"Start bus enumeration for {basepath}")
+
+        def list_device_dirpaths(bus):
+            bus_dirpath = os.path.join(sys_bus_dirpath, bus, 'devices')
+            try:
+                names = os.listdir(bus_dirpath)
+            except OSError:
+                return []
+            return [os.path.realpath(os.path.join(bus_dirpath, name)) for name in names]
+
+        prefix = basepath.rstrip('/') + '/'
         usb_device_paths = []
-        for dirpath, dirnames, filenames in os.walk(basepath):
-            if "busnum" in filenames and "devnum" in filenames:
+        for dirpath in list_device_dirpaths('usb'):
+            # Skip interfaces, such as 1-2:1.0, since only devices have a busnum and devnum.
+            _, dirname = dirpath.rsplit('/', 1)
+            if ':' not in dirname and dirpath.startswith(prefix):
                 usb_device_paths.append(dirpath)
+        usb_device_paths.sort()
+        usb_dirpath_set = set(usb_device_paths)
+        pci_dirpath_set = set(list_device_dirpaths('pci'))
+        ilk_by_dirpath = {}
+        for dirpath in UsbDeviceTree.find_tree_dirpaths(basepath, usb_device_paths):
+            if dirpath in usb_dirpath_set:
                 ilk_by_dirpath[dirpath] = "usb"
-            elif "vendor" in filenames and "device" in filenames:
+            elif dirpath in pci_dirpath_set:
                 ilk_by_dirpath[dirpath] = "pci"
             else:
                 ilk_by_dirpath[dirpath] = "other"
+        logger.info(f"End bus enumeration for {basepath}")
+        return usb_device_paths, ilk_by_dirpath
+
+    @staticmethod
+    def walk_basepath_for_usb(basepath, walker=None):
+        logger.info(f"Start walk for {basepath}")
+        if walker is None:
+            walker = astutus.usb.walker.SysfsWalker()
+        usb_device_paths, ilk_by_dirpath = walker.walk(basepath)
         logger.info(f"End walk for {basepath}")
         return usb_device_paths, ilk_by_dirpath
 
     @staticmethod
     def find_tree_dirpaths(basepath, device_paths):
+        """ Find the basepath, the device paths, and the directories between them, with parents before children. """
+        dirpath_table = astutus.usb.paths.get_dirpath_table()
+        base_id = dirpath_table.intern(basepath)
         tree_dirpaths = []
-        dirpath_set = set()
+        path_id_set = set()
         for device_path in device_paths:
-            slashed_device_path = device_path + "/"
-            idx = len(basepath)
-            while idx > 0:
-                dirpath = slashed_device_path[:idx]
-                if dirpath not in dirpath_set:
-                    tree_dirpaths.append(dirpath)
-                    dirpath_set.add(dirpath)
-                idx = slashed_device_path.find("/", idx + 1)
+            for path_id in dirpath_table.lineage(dirpath_table.intern(device_path), base_id):
+                if path_id not in path_id_set:
+                    tree_dirpaths.append(dirpath_table.path(path_id))
+                    path_id_set.add(path_id)
         return tree_dirpaths
 
+    @staticmethod
+    def find_data_for_path(ilk, dirpath):
+        if ilk == 'pci':
+            device_info = astutus.util.pci.get_device_info_for_dirpath(dirpath)
+        else:
+            device_info = None
+        return get_data_for_dirpath(ilk, dirpath, device_info)
+
     def find_data_for_paths(self, ilk_by_dirpath, dirpaths):
         data_by_dirpath = {}
-        device_info_map = self.get_device_info_map()
         for dirpath in dirpaths:
-            ilk = ilk_by_dirpath[dirpath]
-
-            if ilk == 'pci':
-                _, dirname = dirpath.rsplit('/', 1)
-                slot = dirname[5:]
-                device_info = device_info_map.get(slot)
-            else:
-                device_info = None
-            data = get_data_for_dirpath(ilk, dirpath, device_info)
-            data_by_dirpath[dirpath] = data
+            data_by_dirpath[dirpath] = self.find_data_for_path(ilk_by_dirpath[dirpath], dirpath)
         return data_by_dirpath
 
+    async def find_data_for_paths_async(self, ilk_by_dirpath, dirpaths):
+        """ Like find_data_for_paths, but reads the devices concurrently on the event loop's executor. """
+        datas = await asyncio.gather(*[
+            astutus.util.aio.run_in_executor(self.find_data_for_path, ilk_by_dirpath[dirpath], dirpath)
+            for dirpath in dirpaths
+        ])
+        return dict(zip(dirpaths, datas))
+
     @staticmethod
     def augment_data_by_nodepath(tree_dirpaths, data_by_dirpath):
-        nodepath_by_dirpath = {}
+        dirpath_table = astutus.usb.paths.get_dirpath_table()
+        nodepath_table = astutus.usb.paths.get_nodepath_table()
+        # Maps the id of each dirpath to the id of its nodepath, or NO_PATH if it has none.
+        nodepath_id_by_dirpath_id = {}
         for dirpath in tree_dirpaths:
             data = data_by_dirpath[dirpath]
-            dirpath = data['dirpath']
+            dirpath_id = dirpath_table.intern(data['dirpath'])
             node_id = data.get('node_id')
-            parent_dirpath, dirname = dirpath.rsplit("/", 1)
-            parent_nodepath = nodepath_by_dirpath.get(parent_dirpath)
+            parent_nodepath_id = nodepath_id_by_dirpath_id.get(
+                dirpath_table.parent(dirpath_id), astutus.usb.paths.NO_PATH)
             if node_id is None:
-                nodepath = node_id
-            elif parent_nodepath is None:
-                nodepath = node_id
+                nodepath_id = astutus.usb.paths.NO_PATH
+                nodepath = None
             else:
-                nodepath = parent_nodepath + "/" + node_id
-            nodepath_by_dirpath[dirpath] = nodepath
+                nodepath_id = nodepath_table.intern_child(parent_nodepath_id, node_id)
+                nodepath = nodepath_table.path(nodepath_id)
+            nodepath_id_by_dirpath_id[dirpath_id] = nodepath_id
             data['nodepath'] = nodepath
 
     @staticmethod
@@ -195,14 +288,24 @@ class UsbDeviceTree(object):
                     alias_map[nodepath] = values
         print(json.dumps(alias_map, indent=4, sort_keys=True))
 
+    def find_usb_device_dirpaths_and_ilks(self):
+        if self.enumeration == 'bus':
+            usb_device_dirpaths, ilk_by_dirpath = self.enumerate_bus_for_usb(self.basepath, self.sys_bus_dirpath)
+        else:
+            usb_device_dirpaths, ilk_by_dirpath = self.walk_basepath_for_usb(self.basepath, self.walker)
+        # Share the strings for the paths with the rest of the tree data.
+        canonical = astutus.usb.paths.get_dirpath_table().canonical
+        self.usb_device_dirpaths = [canonical(dirpath) for dirpath in usb_device_dirpaths]
+        self.ilk_by_dirpath = {canonical(dirpath): ilk for dirpath, ilk in ilk_by_dirpath.items()}
+
     def get_usb_device_dirpath(self):
         if self.usb_device_dirpaths is None:
-            self.usb_device_dirpaths, self.ilk_by_dirpath = self.walk_basepath_for_usb(self.basepath)
+            self.find_usb_device_dirpaths_and_ilks()
         return self.usb_device_dirpaths
 
     def get_ilk_by_dirpath(self):
         if self.ilk_by_dirpath is None:
-            self.usb_device_dirpaths, self.ilk_by_dirpath = self.walk_basepath_for_usb(self.basepath)
+            self.find_usb_device_dirpaths_and_ilks()
         return self.ilk_by_dirpath
 
     def get_tree_dirpaths(self):
@@ -210,26 +313,278 @@ class UsbDeviceTree(object):
             self.tree_dirpaths = self.find_tree_dirpaths(self.basepath, self.get_usb_device_dirpath())
         return self.tree_dirpaths
 
+    def find_snapshot_signature(self, tree_dirpaths):
+        """ The topology signature that a snapshot of a tree with the tree_dirpaths must match to be used. """
+        settings = [
+            self.basepath,
+            self.enumeration,
+            repr(self.prune_patterns),
+        ]
+        if self.enumeration == 'bus':
+            return astutus.usb.snapshot.find_topology_signature(self.sys_bus_dirpath, settings)
+        # A walk does not use /sys/bus, so check the directories below the basepath instead.
+        return astutus.usb.snapshot.find_tree_signature(tree_dirpaths, settings)
+
+    def load_snapshot(self):
+        """ Load the raw data for the tree from the snapshot, if it is up to date.  Returns True if loaded. """
+        tree_data = astutus.usb.snapshot.load_snapshot(
+            self.snapshot_filepath,
+            boot_id=astutus.usb.snapshot.read_boot_id(),
+            find_signature=self.find_snapshot_signature)
+        if tree_data is None:
+            return False
+        self.tree_dirpaths = tree_data['tree_dirpaths']
+        self.usb_device_dirpaths = tree_data['usb_device_dirpaths']
+        self.ilk_by_dirpath = tree_data['ilk_by_dirpath']
+        self.signature_by_dirpath = self.find_signatures(self.ilk_by_dirpath, self.tree_dirpaths)
+        self.data_by_dirpath = tree_data['data_by_dirpath']
+        return True
+
+    def save_snapshot(self):
+        try:
+            astutus.usb.snapshot.save_snapshot(
+                self.snapshot_filepath,
+                boot_id=astutus.usb.snapshot.read_boot_id(),
+                signature=self.find_snapshot_signature(self.tree_dirpaths),
+                tree_dirpaths=self.tree_dirpaths,
+                usb_device_dirpaths=self.usb_device_dirpaths,
+                data_by_dirpath=self.data_by_dirpath)
+        except OSError as exception:
+            logger.warning(f"Unable to save snapshot to {self.snapshot_filepath}: {exception}")
+
     def get_data_by_dirpath(self):
+        with self.lock:
+            if self.data_by_dirpath is None:
+                logger.info("Start get_data_by_dirpath")
+                start_time = datetime.now()
+
+                if self.snapshot_filepath is not None and self.load_snapshot():
+                    logger.info(f"End get_data_by_dirpath from snapshot duration: {(datetime.now() - start_time).total_seconds()}")  # noqa
+                    return self.data_by_dirpath
+
+                tree_dirpaths = self.get_tree_dirpaths()
+                self.signature_by_dirpath = self.find_signatures(self.get_ilk_by_dirpath(), tree_dirpaths)
+                data_by_dirpath = self.find_data_for_paths(self.get_ilk_by_dirpath(), self.get_tree_dirpaths())
+
+                self.augment_data_by_nodepath(tree_dirpaths, data_by_dirpath)
+                for dirpath in tree_dirpaths:
+                    logger.debug(f"dirpath: {dirpath} nodepath: {data_by_dirpath[dirpath]['nodepath']}")
+                self.data_by_dirpath = data_by_dirpath
+                if self.snapshot_filepath is not None:
+                    self.save_snapshot()
+
+                logger.info(f"End get_data_by_dirpath duration: {(datetime.now() - start_time).total_seconds()}")
+            return self.data_by_dirpath
+
+    def call_with_lock(self, function, *args):
+        """ Call a function while holding the tree's lock, such as on an executor thread. """
+        with self.lock:
+            return function(*args)
+
+    async def get_data_by_dirpath_async(self):
+        """ Like get_data_by_dirpath, but without blocking the event loop.
+
+        The data is extracted without holding the lock, and only kept if the
+        tree was not built or updated meanwhile, such as by a hotplug event.
+        """
         if self.data_by_dirpath is None:
-            logger.info("Start get_data_by_dirpath")
+            logger.info("Start get_data_by_dirpath_async")
             start_time = datetime.now()
 
-            tree_dirpaths = self.get_tree_dirpaths()
-            data_by_dirpath = self.find_data_for_paths(self.get_ilk_by_dirpath(), self.get_tree_dirpaths())
+            def load_snapshot_unless_built():
+                return self.data_by_dirpath is not None or self.load_snapshot()
+
+            if self.snapshot_filepath is not None:
+                if await astutus.util.aio.run_in_executor(self.call_with_lock, load_snapshot_unless_built):
+                    return self.data_by_dirpath
 
+            def find_tree_dirpaths_and_ilks():
+                if self.ilk_by_dirpath is None:
+                    self.find_usb_device_dirpaths_and_ilks()
+                tree_dirpaths = self.get_tree_dirpaths()
+                return tree_dirpaths, self.ilk_by_dirpath, self.find_signatures(self.ilk_by_dirpath, tree_dirpaths)
+
+            tree_dirpaths, ilk_by_dirpath, signature_by_dirpath = await astutus.util.aio.run_in_executor(
+                self.call_with_lock, find_tree_dirpaths_and_ilks)
+            data_by_dirpath = await self.find_data_for_paths_async(ilk_by_dirpath, tree_dirpaths)
             self.augment_data_by_nodepath(tree_dirpaths, data_by_dirpath)
-            for dirpath in tree_dirpaths:
-                logger.debug(f"dirpath: {dirpath} nodepath: {data_by_dirpath[dirpath]['nodepath']}")
-            self.data_by_dirpath = data_by_dirpath
 
-            logger.info(f"End get_data_by_dirpath duration: {(datetime.now() - start_time).total_seconds()}")
+            def publish():
+                if self.data_by_dirpath is not None or self.tree_dirpaths is not tree_dirpaths:
+                    logger.info("The tree changed while its data was extracted, so the data is discarded")
+                    return
+                self.signature_by_dirpath = signature_by_dirpath
+                self.data_by_dirpath = data_by_dirpath
+                if self.snapshot_filepath is not None:
+                    self.save_snapshot()
+
+            await astutus.util.aio.run_in_executor(self.call_with_lock, publish)
+            if self.data_by_dirpath is None:
+                await astutus.util.aio.run_in_executor(self.get_data_by_dirpath)
+            logger.info(f"End get_data_by_dirpath_async duration: {(datetime.now() - start_time).total_seconds()}")
         return self.data_by_dirpath
 
+    async def get_tree_as_dict_async(self):
+        """ Like get_tree_as_dict, but without blocking the event loop. """
+        if self.tree_as_dict is None:
+            await self.get_data_by_dirpath_async()
+            # Assembly evaluates the styler tests, which read sysfs, so it runs on the executor too.
+            await astutus.util.aio.run_in_executor(self.get_tree_as_dict)
+        return self.tree_as_dict
+
+    @staticmethod
+    def find_signature(ilk, dirpath):
+        """ A cheap signature for a directory, that changes when the device for it is replaced.
+
+        Sysfs directories are recreated when a device is plugged in, so they get
+        a new inode, and USB devices get a new devnum, even in the same port.
+        """
+        try:
+            inode = os.stat(dirpath).st_ino
+        except OSError:
+            return None
+        if ilk == 'usb':
+            return ilk, inode, astutus.util.sysfs.read_attribute(dirpath, 'devnum')
+        return ilk, inode, None
+
+    def find_signatures(self, ilk_by_dirpath, dirpaths):
+        return {dirpath: self.find_signature(ilk_by_dirpath[dirpath], dirpath) for dirpath in dirpaths}
+
+    def refresh(self):
+        """ Bring a previously built tree up to date with the devices now present.
+
+        Only the added and changed directories have their data extracted
+        again, and only the nodes whose data or nodepath changed have their
+        alias and configuration resolved again.  If nothing has changed, the
+        cost is that of enumerating the devices and checking their signatures.
+
+        Returns the delta, as a dictionary of the added, removed, and changed dirpaths.
+        """
+        with self.lock:
+            if self.data_by_dirpath is None:
+                # Nothing has been built yet, so everything is new.
+                self.get_data_by_dirpath()
+                return {'added': list(self.tree_dirpaths), 'removed': [], 'changed': []}
+            logger.info("Start refresh")
+            start_time = datetime.now()
+            self.find_usb_device_dirpaths_and_ilks()
+            delta = self.update_tree()
+            logger.info(f"End refresh - duration: {(datetime.now() - start_time).total_seconds()}")
+            return delta
+
+    def update_tree(self, changed_dirpaths=()):
+        """ Update the tree for the current USB device dirpaths and ilks, returning the delta.
+
+        Directories listed in changed_dirpaths are treated as changed, even if
+        their signatures are the same.
+        """
+        old_tree_dirpaths = self.tree_dirpaths
+        old_signature_by_dirpath = self.signature_by_dirpath
+        tree_dirpaths = self.find_tree_dirpaths(self.basepath, self.usb_device_dirpaths)
+        signature_by_dirpath = self.find_signatures(self.ilk_by_dirpath, tree_dirpaths)
+        # A new directory that has already vanished, such as for a device unplugged as soon as it was
+        # plugged in, is left out, since its data can not be extracted.
+        tree_dirpaths = [
+            dirpath for dirpath in tree_dirpaths
+            if signature_by_dirpath[dirpath] is not None or dirpath in old_signature_by_dirpath
+        ]
+        signature_by_dirpath = {dirpath: signature_by_dirpath[dirpath] for dirpath in tree_dirpaths}
+        tree_dirpath_set = set(tree_dirpaths)
+        delta = {
+            'added': [dirpath for dirpath in tree_dirpaths if dirpath not in old_signature_by_dirpath],
+            'removed': [dirpath for dirpath in old_tree_dirpaths if dirpath not in tree_dirpath_set],
+            # A directory that has vanished is left as is, until it is removed from the device dirpaths.
+            'changed': [
+                dirpath for dirpath in tree_dirpaths
+                if dirpath in old_signature_by_dirpath and signature_by_dirpath[dirpath] is not None
+                and (old_signature_by_dirpath[dirpath] != signature_by_dirpath[dirpath] or dirpath in changed_dirpaths)
+            ],
+        }
+        self.signature_by_dirpath = signature_by_dirpath
+        self.tree_dirpaths = tree_dirpaths
+        stale_dirpaths = delta['added'] + delta['changed']
+        if stale_dirpaths or delta['removed']:
+            if stale_dirpaths:
+                # Class devices, such as ttys, may have moved to new devices.
+                astutus.usb.sysfs_index.get_class_device_index().refresh()
+            old_data_by_dirpath = self.data_by_dirpath
+            old_nodepath_by_dirpath = {dirpath: data.get('nodepath') for dirpath, data in old_data_by_dirpath.items()}
+            # Copied, since augmenting them may change their nodepaths.
+            data_by_dirpath = {
+                dirpath: dict(old_data_by_dirpath[dirpath])
+                for dirpath in tree_dirpaths if dirpath in old_data_by_dirpath
+            }
+            data_by_dirpath.update(self.find_data_for_paths(self.ilk_by_dirpath, stale_dirpaths))
+            self.augment_data_by_nodepath(tree_dirpaths, data_by_dirpath)
+            self.data_by_dirpath = data_by_dirpath
+            if self.compact_tree is not None:
+                stale_dirpath_set = set(stale_dirpaths)
+                old_tree = self.compact_tree
+                reusable_node_data_by_dirpath = {
+                    dirpath: old_tree.datas[nid]
+                    for dirpath, nid in old_tree.nid_by_identifier.items()
+                    if dirpath in tree_dirpath_set
+                    and dirpath not in stale_dirpath_set
+                    and data_by_dirpath[dirpath].get('nodepath') == old_nodepath_by_dirpath.get(dirpath)
+                }
+                self.compact_tree = self.assemble_tree(
+                    basepath=self.basepath,
+                    tree_dirpaths=tree_dirpaths,
+                    data_by_dirpath=data_by_dirpath,
+                    ilk_by_dirpath=self.ilk_by_dirpath,
+                    device_aliases=self.get_aliases(),
+                    device_configurations=self.get_device_configurations(),
+                    reusable_node_data_by_dirpath=reusable_node_data_by_dirpath,
+                )
+            self.tree_as_dict = None
+        return delta
+
+    def is_within_basepath(self, dirpath):
+        return dirpath.startswith(self.basepath.rstrip('/') + '/')
+
+    def add_usb_device(self, dirpath):
+        """ Add a newly plugged in USB device to a built tree, returning the delta. """
+        with self.lock:
+            self.get_data_by_dirpath()
+            dirpath_table = astutus.usb.paths.get_dirpath_table()
+            dirpath = dirpath_table.canonical(dirpath)
+            if self.is_within_basepath(dirpath) and dirpath not in self.usb_device_dirpaths:
+                ilk_by_dirpath = dict(self.ilk_by_dirpath)
+                # The device may be the first one below a controller or hub that is not yet in the tree.
+                ancestor_dirpath = dirpath
+                while ancestor_dirpath not in ilk_by_dirpath and self.is_within_basepath(ancestor_dirpath):
+                    ilk_by_dirpath[ancestor_dirpath] = astutus.usb.usb_impl.find_ilk_for_dirpath(ancestor_dirpath)
+                    ancestor_dirpath, _ = dirpath_table.split(ancestor_dirpath)
+                ilk_by_dirpath[dirpath] = 'usb'
+                self.usb_device_dirpaths = self.usb_device_dirpaths + [dirpath]
+                self.ilk_by_dirpath = ilk_by_dirpath
+            return self.update_tree()
+
+    def remove_usb_device(self, dirpath):
+        """ Remove an unplugged USB device, and the devices attached to it, from a built tree, returning the delta. """
+        with self.lock:
+            self.get_data_by_dirpath()
+            prefix = dirpath + '/'
+            self.usb_device_dirpaths = [
+                usb_device_dirpath for usb_device_dirpath in self.usb_device_dirpaths
+                if usb_device_dirpath != dirpath and not usb_device_dirpath.startswith(prefix)
+            ]
+            self.ilk_by_dirpath = {
+                ilk_dirpath: ilk for ilk_dirpath, ilk in self.ilk_by_dirpath.items()
+                if ilk_dirpath != dirpath and not ilk_dirpath.startswith(prefix)
+            }
+            return self.update_tree()
+
+    def change_device(self, dirpath):
+        """ Extract the data for a device again, such as after a driver is bound, returning the delta. """
+        with self.lock:
+            self.get_data_by_dirpath()
+            return self.update_tree(changed_dirpaths={dirpath})
+
     def assemble_bare_tree(self):
         logger.info("Start assemble_bare_tree")
         start_time = datetime.now()
-        tree = treelib.Tree()
+        tree = astutus.usb.compact_tree.CompactTree()
         rootpath, tag = self.basepath.rsplit('/', 1)
         for dirpath in self.get_tree_dirpaths():
             parent_dirpath, dirname = dirpath.rsplit('/', 1)
@@ -259,20 +614,32 @@ class UsbDeviceTree(object):
             data_by_dirpath,
             ilk_by_dirpath,
             device_aliases,
-            device_configurations):
+            device_configurations,
+            reusable_node_data_by_dirpath=None):
+        """ Assemble the tree of nodes, resolving the alias and configuration for each.
+
+        The node data in reusable_node_data_by_dirpath is used as is, rather
+        than being resolved again.
+        """
         logger.info("Start assemble_tree")
         start_time = datetime.now()
-        tree = treelib.Tree()
+        if reusable_node_data_by_dirpath is None:
+            reusable_node_data_by_dirpath = {}
+        tree = astutus.usb.compact_tree.CompactTree()
         rootpath, tag = basepath.rsplit('/', 1)
+        # Styler test results are only valid for the devices present during this build.
+        device_configurations.predicate_cache.clear()
         for dirpath in tree_dirpaths:
-            data = data_by_dirpath[dirpath]
-            assert dirpath == data['dirpath']
             parent_dirpath, dirname = dirpath.rsplit('/', 1)
-            # ilk = ilk_by_dirpath[dirpath]
-            nodepath = data.get('nodepath')
-            alias = device_aliases.find_highest_priority(nodepath)
-            device_config = device_configurations.find_configuration(data)
-            node_data = get_node_data(data, device_config, alias)
+            node_data = reusable_node_data_by_dirpath.get(dirpath)
+            if node_data is None:
+                data = data_by_dirpath[dirpath]
+                assert dirpath == data['dirpath']
+                # ilk = ilk_by_dirpath[dirpath]
+                nodepath = data.get('nodepath')
+                alias = device_aliases.find_highest_priority(nodepath)
+                device_config = device_configurations.find_configuration(data)
+                node_data = get_node_data(data, device_config, alias)
             if parent_dirpath == basepath:
                 pass
             if parent_dirpath == rootpath:
@@ -331,18 +698,15 @@ class UsbDeviceTree(object):
 
     @staticmethod
     def sanitize_for_html(data):
-        sanitized_data = copy.deepcopy(data)
-        keys_to_remove = [
+        keys_to_remove = {
             'resolved_description',
             'resolved_color',
             'terminal_colored_node_label_verbose',
             'terminal_colored_node_label_concise',
             'terminal_colored_description',
-        ]
-        for key in keys_to_remove:
-            if sanitized_data.get(key) is not None:
-                del sanitized_data[key]
-
+        }
+        # The values are shared with the data, which is fine since they are never modified in place.
+        sanitized_data = {key: value for key, value in data.items() if key not in keys_to_remove}
         return sanitized_data
 
     def get_aliases(self):
@@ -356,23 +720,148 @@ class UsbDeviceTree(object):
                 filepath=self.device_configurations_filepath)
         return self.device_configurations
 
-    def get_treelib_tree(self):
-        if self.treelib_tree is None:
-            self.treelib_tree = self.assemble_tree(
-                basepath=self.basepath,
-                tree_dirpaths=self.get_tree_dirpaths(),
-                data_by_dirpath=self.get_data_by_dirpath(),
-                ilk_by_dirpath=self.get_ilk_by_dirpath(),
-                device_aliases=self.get_aliases(),
-                device_configurations=self.get_device_configurations(),
-            )
-        return self.treelib_tree
+    def get_compact_tree(self):
+        with self.lock:
+            if self.compact_tree is None:
+                # Get the data first, so that the tree dirpaths and ilks come from the snapshot, if available.
+                self.get_data_by_dirpath()
+                self.compact_tree = self.assemble_tree(
+                    basepath=self.basepath,
+                    tree_dirpaths=self.get_tree_dirpaths(),
+                    data_by_dirpath=self.get_data_by_dirpath(),
+                    ilk_by_dirpath=self.get_ilk_by_dirpath(),
+                    device_aliases=self.get_aliases(),
+                    device_configurations=self.get_device_configurations(),
+                )
+            return self.compact_tree
 
     def get_tree_as_dict(self):
-        if self.tree_as_dict is None:
-            tree = self.get_treelib_tree()
-            self.tree_as_dict = tree.to_dict(with_data=True)
-        return self.tree_as_dict
+        with self.lock:
+            if self.tree_as_dict is None:
+                tree = self.get_compact_tree()
+                self.tree_as_dict = tree.to_dict(with_data=True)
+            return self.tree_as_dict
+
+    @staticmethod
+    def join_nodepath(parent_nodepath, node_id):
+        """ The nodepath for a node, the same as augment_data_by_nodepath gives. """
+        if node_id is None:
+            return None
+        nodepath_table = astutus.usb.paths.get_nodepath_table()
+        if parent_nodepath is None:
+            parent_nodepath_id = astutus.usb.paths.NO_PATH
+        else:
+            parent_nodepath_id = nodepath_table.intern(parent_nodepath)
+        return nodepath_table.path(nodepath_table.intern_child(parent_nodepath_id, node_id))
+
+    def iter_nodes(self, key=None):
+        """ Yield (node_data, depth, is_last) for the nodes in display order, resolving each one as needed.
+
+        Only the directories in the tree are found up front.  The data,
+        alias, and configuration for a node are resolved when its parent is
+        reached, since the siblings must be sorted by key before the first
+        of them is yielded.  So the first nodes are available long before
+        the whole tree has been built.  is_last tells whether a node is the
+        last of its siblings.  The siblings are sorted by their key method,
+        unless another key function of the node data is given.
+
+        Once all of the nodes have been yielded, the data and tree are kept,
+        just as if they had been built by get_compact_tree.
+        """
+        if key is None:
+            key = astutus.usb.node.DeviceNode.key
+        # Take the tree data together, so that it stays consistent if the tree is updated while iterating.
+        with self.lock:
+            if self.data_by_dirpath is None and self.snapshot_filepath is not None:
+                self.load_snapshot()
+            tree_dirpaths = self.get_tree_dirpaths()
+            if not tree_dirpaths:
+                return
+            ilk_by_dirpath = self.get_ilk_by_dirpath()
+            device_aliases = self.get_aliases()
+            device_configurations = self.get_device_configurations()
+            known_data_by_dirpath = self.data_by_dirpath if self.data_by_dirpath is not None else {}
+            node_data_by_dirpath = {}
+            if self.compact_tree is not None:
+                tree = self.compact_tree
+                node_data_by_dirpath = {tree.identifiers[nid]: tree.datas[nid] for nid in range(len(tree))}
+            else:
+                # Styler test results are only valid for the devices present during this build.
+                device_configurations.predicate_cache.clear()
+        child_dirpaths_by_dirpath = {}
+        for dirpath in tree_dirpaths[1:]:
+            parent_dirpath, _ = dirpath.rsplit('/', 1)
+            child_dirpaths_by_dirpath.setdefault(parent_dirpath, []).append(dirpath)
+        data_by_dirpath = {}
+
+        def resolve(dirpath, parent_nodepath):
+            data = known_data_by_dirpath.get(dirpath)
+            if data is None:
+                data = self.find_data_for_path(ilk_by_dirpath[dirpath], dirpath)
+                data['nodepath'] = self.join_nodepath(parent_nodepath, data.get('node_id'))
+            data_by_dirpath[dirpath] = data
+            node_data = node_data_by_dirpath.get(dirpath)
+            if node_data is None:
+                alias = device_aliases.find_highest_priority(data.get('nodepath'))
+                device_config = device_configurations.find_configuration(data)
+                node_data = get_node_data(data, device_config, alias)
+                node_data_by_dirpath[dirpath] = node_data
+            return node_data
+
+        root_dirpath = tree_dirpaths[0]
+        stack = [(root_dirpath, resolve(root_dirpath, None), 0, True)]
+        while stack:
+            dirpath, node_data, depth, is_last = stack.pop()
+            yield node_data, depth, is_last
+            children = [
+                (child_dirpath, resolve(child_dirpath, data_by_dirpath[dirpath].get('nodepath')))
+                for child_dirpath in child_dirpaths_by_dirpath.get(dirpath, [])
+            ]
+            children.sort(key=lambda child: key(child[1]))
+            for idx in reversed(range(len(children))):
+                child_dirpath, child_node_data = children[idx]
+                stack.append((child_dirpath, child_node_data, depth + 1, idx == len(children) - 1))
+
+        with self.lock:
+            if self.tree_dirpaths is not tree_dirpaths:
+                # The tree was updated while iterating, so what was resolved is out of date.
+                return
+            if self.data_by_dirpath is None:
+                self.data_by_dirpath = {dirpath: data_by_dirpath[dirpath] for dirpath in tree_dirpaths}
+                self.signature_by_dirpath = self.find_signatures(ilk_by_dirpath, tree_dirpaths)
+                if self.snapshot_filepath is not None:
+                    self.save_snapshot()
+            if self.compact_tree is None:
+                self.compact_tree = self.assemble_tree(
+                    basepath=self.basepath,
+                    tree_dirpaths=tree_dirpaths,
+                    data_by_dirpath=self.data_by_dirpath,
+                    ilk_by_dirpath=ilk_by_dirpath,
+                    device_aliases=device_aliases,
+                    device_configurations=device_configurations,
+                    reusable_node_data_by_dirpath=node_data_by_dirpath,
+                )
+
+    def iter_lines(self, *, data_property=None, key=None):
+        """ Yield the lines of the rendered tree as the nodes are resolved, the same as CompactTree.iter_lines. """
+        vertical_line, line_box, line_corner = astutus.usb.compact_tree.LINE_DRAWING
+        # The leading for the descendants of the most recent node at each depth.
+        leadings = []
+        for node_data, depth, is_last in self.iter_nodes(key=key):
+            if depth == 0:
+                prefix = ''
+                leading = ''
+            else:
+                parent_leading = leadings[depth - 1]
+                prefix = parent_leading + (line_corner if is_last else line_box)
+                leading = parent_leading + (' ' * 4 if is_last else vertical_line + ' ' * 3)
+            del leadings[depth:]
+            leadings.append(leading)
+            if data_property is None:
+                label = node_data['dirname']
+            else:
+                label = getattr(node_data, data_property)
+            yield f"{prefix}{label}"
 
     def execute_tree_cmd(
             self,
@@ -380,6 +869,7 @@ class UsbDeviceTree(object):
             verbose=False,
             node_ids=[],
             show_tree=False,
+            stream=False,
             to_dict=False,
             # to_html=False,
             to_tree_dirpaths=False,
@@ -388,8 +878,12 @@ class UsbDeviceTree(object):
 
         if show_tree:
             astutus.usb.node.DeviceNode.verbose = verbose
-            tree = self.get_treelib_tree()
-            tree.show(data_property="colorized_node_label_for_terminal", key=key_by_node_data_key)
+            if stream:
+                for line in self.iter_lines(data_property="colorized_node_label_for_terminal"):
+                    print(line, flush=True)
+            else:
+                tree = self.get_compact_tree()
+                tree.show(data_property="colorized_node_label_for_terminal", key=key_by_node_data_key)
 
         if to_tree_dirpaths:
             return self.get_tree_dirpaths()
@@ -401,7 +895,7 @@ class UsbDeviceTree(object):
             return self.get_tree_as_dict()
 
         # if to_html:
-        #     tree = self.get_treelib_tree()
+        #     tree = self.get_compact_tree()
         #     tree_dict = tree.to_dict(with_data=True)
         #     return self.traverse_tree_dict_to_html(tree_dict)
 
@@ -465,6 +959,50 @@ def parse_arguments(raw_args):
         dest="device_configurations_filepath",
         help=f"specify device configurations file - defaults to {DEFAULT_DEVICE_CONFIGURATIONS_FILEPATH}")
 
+    parser.add_argument(
+        "-e", "--enumeration",
+        default=None,
+        choices=ENUMERATION_MODES,
+        dest="enumeration",
+        help="find USB devices from the links in /sys/bus or by walking the basepath"
+             " - defaults to bus, unless the basepath is outside of /sys/devices")
+
+    parser.add_argument(
+        "--prune",
+        nargs='+',
+        default=None,
+        dest="prune_patterns",
+        help="regular expression(s) for additional directory names to skip when walking the basepath")
+
+    parser.add_argument(
+        "-w", "--workers",
+        default=1,
+        type=int,
+        dest="workers",
+        help="set the number of threads used to walk the basepath - defaults to 1")
+
+    parser.add_argument(
+        "--watch",
+        default=False,
+        dest="watch",
+        action="store_true",
+        help="after showing the tree, keep running and report devices as they are plugged in and unplugged")
+
+    parser.add_argument(
+        "-s", "--stream",
+        default=False,
+        dest="stream",
+        action="store_true",
+        help="print each line of the tree as soon as it is known, rather than after the whole tree is built")
+
+    parser.add_argument(
+        "--no-snapshot",
+        default=True,
+        dest="snapshot",
+        action="store_false",
+        help=f"always rescan the devices, rather than loading them from {DEFAULT_SNAPSHOT_FILEPATH}"
+             " when nothing has been plugged in or unplugged since it was saved")
+
     args = parser.parse_args(args=raw_args)
     return args
 
@@ -481,10 +1019,35 @@ def main(raw_args=None):
     tree = UsbDeviceTree(
         basepath=args.basepath,
         device_aliases_filepath=args.device_aliases_filepath,
-        device_configurations_filepath=args.device_configurations_filepath
+        device_configurations_filepath=args.device_configurations_filepath,
+        enumeration=args.enumeration,
+        prune_patterns=args.prune_patterns,
+        workers=args.workers,
+        snapshot_filepath=DEFAULT_SNAPSHOT_FILEPATH if args.snapshot else None,
     )
 
-    tree.execute_tree_cmd(verbose=args.verbose, node_ids=args.node_id_list, show_tree=True, to_dict=False)
+    tree.execute_tree_cmd(
+        verbose=args.verbose, node_ids=args.node_id_list, show_tree=True, stream=args.stream, to_dict=False)
+
+    if args.watch:
+        watch_for_hotplug(tree)
+
+
+def watch_for_hotplug(tree):
+    def print_delta(event, delta):
+        data_by_dirpath = tree.get_data_by_dirpath()
+        for change in ['added', 'changed']:
+            for dirpath in delta[change]:
+                print(f"{change}: {data_by_dirpath[dirpath].get('nodepath')}  {dirpath}")
+        for dirpath in delta['removed']:
+            print(f"removed: {dirpath}")
+
+    monitor = astutus.usb.hotplug.HotplugMonitor(tree, astutus.usb.hotplug.NetlinkUeventSource())
+    monitor.subscribe(print_delta)
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
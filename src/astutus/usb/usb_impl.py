@@ -1,27 +1,27 @@
 import logging
 import re
 import os
-from typing import Dict, List, Optional, Set, Tuple  # noqa
+from typing import Callable, Dict, List, Optional, Set, Tuple  # noqa
 
+import astutus.usb.paths
+import astutus.usb.sysfs_index
 import astutus.util
+import astutus.util.aio
+import astutus.util.hwdata
+import astutus.util.sysfs
 
 
 logger = logging.getLogger(__name__)
 
 
 def find_paths_for_vendor_and_product(vendor_id: str, product_id: str) -> List[str]:
-    return_code, stdout, stderr = astutus.util.run_cmd(f'grep -r . -e "{vendor_id}" 2>/dev/null', cwd="/sys/devices")
+    """ Find the paths, relative to /sys/devices, of the USB devices with the vendor and product ids. """
+    dirpaths = astutus.usb.sysfs_index.get_usb_device_index().find(vendor_id, product_id)
     paths = []
-    for line in stdout.splitlines():
-        if "idVendor" in line:
-            logger.debug(f"line: {line}")
-            path_pattern = r'\.\/(.+)/idVendor:'
-            matches = re.search(path_pattern, line)
-            if not matches:
-                assert False
-            path = matches.group(1)
-            logger.debug(f"path: {path}")
-            paths.append(path)
+    for dirpath in dirpaths:
+        path = os.path.relpath(dirpath, "/sys/devices")
+        logger.debug(f"path: {path}")
+        paths.append(path)
     return paths
 
 
@@ -30,14 +30,11 @@ def find_busnum_and_devnum_for_sys_device(pci_path: str) -> Tuple[int, int]:
         abs_path = pci_path
     else:
         abs_path = f"/sys/devices/{pci_path}"
-    return_code, stdout, stderr = astutus.util.run_cmd(f'cat {abs_path}/busnum')
-    if return_code != 0:
-        raise RuntimeError(return_code, stderr, stdout)
-    busnum = int(stdout.strip())
-    return_code, stdout, stderr = astutus.util.run_cmd(f'cat {abs_path}/devnum')
-    if return_code != 0:
-        raise RuntimeError(return_code, stderr, stdout)
-    devnum = int(stdout.strip())
+    attributes = astutus.util.sysfs.read_attributes(abs_path, ['busnum', 'devnum'])
+    if attributes.get('busnum') is None or attributes.get('devnum') is None:
+        raise RuntimeError(f"Unable to read busnum and devnum for {abs_path}")
+    busnum = int(attributes['busnum'])
+    devnum = int(attributes['devnum'])
     return busnum, devnum
 
 
@@ -45,11 +42,26 @@ def find_vendor_info_from_busnum_and_devnum(busnum: int, devnum: int) -> Tuple[s
     """
     returns vendorid, productid, description
     """
-    cmd = f"lsusb -s {busnum}:{devnum}"
-    logger.debug(f"cmd: {cmd}")
-    return_code, stdout, stderr = astutus.util.run_cmd(cmd)
+    argv = ['lsusb', '-s', f'{busnum}:{devnum}']
+    logger.debug(f"argv: {argv}")
+    return_code, stdout, stderr = astutus.util.run_argv(argv)
+    if return_code != 0:
+        raise RuntimeError(return_code, stderr, stdout)
+    return parse_lsusb_output(stdout)
+
+
+async def find_vendor_info_from_busnum_and_devnum_async(busnum: int, devnum: int) -> Tuple[str, str, str]:
+    """ Like find_vendor_info_from_busnum_and_devnum, but runs lsusb as an asyncio subprocess. """
+    argv = ['lsusb', '-s', f'{busnum}:{devnum}']
+    logger.debug(f"argv: {argv}")
+    return_code, stdout, stderr = await astutus.util.aio.run_argv(argv)
     if return_code != 0:
         raise RuntimeError(return_code, stderr, stdout)
+    return parse_lsusb_output(stdout)
+
+
+def parse_lsusb_output(stdout: str) -> Tuple[str, str, str]:
+    """ Parse the output of lsusb for a single device into vendorid, productid, description """
     vendor_info_pattern = r'([0-9,a-f]{4}):([0-9,a-f]{4}) (.*)'
     matches = re.search(vendor_info_pattern, stdout, re.IGNORECASE)
     if not matches:
@@ -60,19 +72,54 @@ def find_vendor_info_from_busnum_and_devnum(busnum: int, devnum: int) -> Tuple[s
     return vendorid, productid, description
 
 
-def find_tty_from_pci_path(pci_path):
-    cmd = 'find . -name tty*'
-    return_code, stdout, stderr = astutus.util.run_cmd(cmd, cwd=pci_path)
-    assert return_code == 0, stderr
-    pattern = r'/(tty[\w]+)'
-    matches = re.search(pattern, stdout)
-    assert matches, stdout
-    tty = matches.group(1)
-    return tty
+def find_description_for_ids(id_vendor: str, id_product: str) -> Optional[str]:
+    """ Find the description that lsusb would give for a device, using the usb.ids database in-process.
+
+    Returns None if there is no usb.ids database on this system.
+    """
+    usb_ids = astutus.util.hwdata.get_usb_ids()
+    if usb_ids is None:
+        return None
+    names = [
+        usb_ids.vendor_name(id_vendor),
+        usb_ids.device_name(id_vendor, id_product),
+    ]
+    return ' '.join(name for name in names if name)
+
+
+def find_description_for_usb_device(data: Dict) -> str:
+    """ Find the vendor and product description for the extracted data of a USB device.
+
+    The usb.ids database is used if available, otherwise lsusb is run for the device.
+    """
+    description = find_description_for_ids(data['idVendor'], data['idProduct'])
+    if description is not None:
+        return description
+    try:
+        _, _, description = find_vendor_info_from_busnum_and_devnum(int(data['busnum']), int(data['devnum']))
+    except RuntimeError as exception:
+        logger.warning(f"Unable to find description for {data['dirpath']}: {exception}")
+        description = ''
+    return description
+
+
+def find_tty_from_pci_path(pci_path) -> Optional[str]:
+    """ Find the tty of the device at the dirpath, or None if it has none, such as while its driver is loading. """
+    if pci_path.startswith("/"):
+        abs_path = pci_path
+    else:
+        abs_path = f"/sys/devices/{pci_path}"
+    class_device_index = astutus.usb.sysfs_index.get_class_device_index()
+    # The device may have been plugged in, or its tty renumbered, since the index was built.
+    ttys = class_device_index.find_current(abs_path, 'tty')
+    if len(ttys) == 0:
+        logger.debug(f"No tty found for {abs_path}")
+        return None
+    return ttys[0]
 
 
 def find_tty_description_from_pci_path(pci_path: str) -> Tuple[str, str, str, str, str, str]:
-    """ returns tty, busnum, devnum, vendorid, productid, description  """
+    """ returns tty, busnum, devnum, vendorid, productid, description, with tty None if there is none """
     busnum, devnum = find_busnum_and_devnum_for_sys_device(pci_path)
     tty = find_tty_from_pci_path(pci_path)
     vendorid, productid, description = find_vendor_info_from_busnum_and_devnum(busnum, devnum)
@@ -80,26 +127,88 @@ def find_tty_description_from_pci_path(pci_path: str) -> Tuple[str, str, str, st
 
 
 def extract_specified_data(dirpath: str, filenames: List[str]) -> Dict:
-    parent_dirpath, dirname = dirpath.rsplit('/', 1)
+    dirpath_table = astutus.usb.paths.get_dirpath_table()
+    parent_dirpath, dirname = dirpath_table.split(dirpath)
+    data = {
+        'dirpath': dirpath_table.canonical(dirpath),
+        'parent_dirpath': parent_dirpath,
+        'dirname': dirname,
+    }
+    data.update(astutus.util.sysfs.read_attributes(dirpath, filenames))
+    return data
+
+
+def usb_attributes_from_uevent(uevent: Dict[str, str]) -> Dict[str, str]:
+    """ Translate the uevent of a USB device into the values of the equivalent attribute files. """
+    if uevent.get('DEVTYPE') != 'usb_device':
+        return {}
+    attributes = {}
+    product = uevent.get('PRODUCT')
+    if product is not None:
+        # PRODUCT=46d/c52b/1211 - idVendor/idProduct/bcdDevice in unpadded hex
+        id_vendor, id_product, _ = product.split('/', 2)
+        attributes['idVendor'] = f"{int(id_vendor, 16):04x}"
+        attributes['idProduct'] = f"{int(id_product, 16):04x}"
+    # BUSNUM=001, DEVNUM=003, while the busnum and devnum files are not zero padded.
+    if uevent.get('BUSNUM') is not None:
+        attributes['busnum'] = str(int(uevent['BUSNUM']))
+    if uevent.get('DEVNUM') is not None:
+        attributes['devnum'] = str(int(uevent['DEVNUM']))
+    return attributes
+
+
+def pci_attributes_from_uevent(uevent: Dict[str, str]) -> Dict[str, str]:
+    """ Translate the uevent of a PCI device into the values of the equivalent attribute files. """
+    attributes = {}
+    pci_id = uevent.get('PCI_ID')
+    if pci_id is not None:
+        # PCI_ID=8086:A36D, while the vendor and device files are like 0x8086 and 0xa36d
+        vendor, device = pci_id.split(':', 1)
+        attributes['vendor'] = f"0x{vendor.lower()}"
+        attributes['device'] = f"0x{device.lower()}"
+    pci_class = uevent.get('PCI_CLASS')
+    if pci_class is not None:
+        # PCI_CLASS=C0330, while the class file is like 0x0c0330
+        attributes['class'] = f"0x{int(pci_class, 16):06x}"
+    return attributes
+
+
+def extract_specified_data_from_uevent(
+        dirpath: str,
+        filenames: List[str],
+        attributes_from_uevent: Callable[[Dict[str, str]], Dict[str, str]]) -> Dict:
+    """ Extract data like extract_specified_data, but take as much as possible from the uevent file.
+
+    Only the attributes that can not be derived from the uevent file,
+    such as the manufacturer, product, and serial strings of a USB device,
+    are read from their individual files.
+    """
+    dirpath_table = astutus.usb.paths.get_dirpath_table()
+    parent_dirpath, dirname = dirpath_table.split(dirpath)
     data = {
-        'dirpath': dirpath,
+        'dirpath': dirpath_table.canonical(dirpath),
         'parent_dirpath': parent_dirpath,
         'dirname': dirname,
     }
+    derived_attributes = attributes_from_uevent(astutus.util.sysfs.read_uevent(dirpath))
+    remaining_filenames = []
     for filename in filenames:
-        filepath = os.path.join(dirpath, filename)
-        return_code, stdout, stderr = astutus.util.run_cmd(f"cat {filepath}")
-        if return_code != 0:
-            continue
-        data[filename] = stdout.strip()
+        value = derived_attributes.get(filename)
+        if value is None:
+            remaining_filenames.append(filename)
+        else:
+            data[filename] = value
+    data.update(astutus.util.sysfs.read_attributes(dirpath, remaining_filenames))
     return data
 
 
 def find_ilk_for_dirpath(dirpath):
-    _, dirnames, filenames = next(os.walk(dirpath))
-    if "busnum" in filenames and "devnum" in filenames:
+    def is_file(filename):
+        return os.path.isfile(os.path.join(dirpath, filename))
+
+    if is_file("busnum") and is_file("devnum"):
         return "usb"
-    elif "vendor" in filenames and "device" in filenames:
+    elif is_file("vendor") and is_file("device"):
         return "pci"
     else:
         return "other"
@@ -0,0 +1,178 @@
+"""
+
+A walker for the /sys/devices hierarchy that skips subtrees that can never hold a USB device.
+
+A full walk of /sys/devices visits tens of thousands of directories,
+almost all of which are things like power management attributes,
+USB interfaces and endpoints, and class devices such as network
+interfaces and block devices.  None of these can be the parent of a
+USB device, so the walker does not descend into them.
+
+The directories to skip are selected by prune patterns, which are regular
+expressions that must match the whole directory name.  Additional patterns
+can be given to extend the built-in list.
+
+Reading sysfs is bound by the latency of the kernel producing each
+directory listing, so on machines with many PCI root ports and hubs the
+walker can process sibling subtrees in parallel on a bounded thread pool.
+The results are merged in the same order as a sequential walk.
+
+"""
+import concurrent.futures
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRUNE_PATTERNS = [
+    # Attribute groups and links within a device directory
+    r'power',
+    r'driver',
+    r'subsystem',
+    r'firmware_node',
+    r'msi_irqs',
+    r'physical_location',
+    r'wakeup\d+',
+    # USB endpoints and interfaces, such as ep_81 and 1-2:1.0
+    r'ep_[0-9a-f]{2}',
+    r'\d+-[\d.]+:\d+\.\d+',
+    # Class devices that are children of devices
+    r'block',
+    r'drm',
+    r'graphics',
+    r'hidraw',
+    r'hwmon',
+    r'input',
+    r'net',
+    r'sound',
+    r'tty',
+    r'host\d+',
+    r'ata\d+',
+    r'nvme',
+    # Top level hierarchies of /sys/devices without any USB host controllers
+    r'system',
+    r'virtual',
+    r'software',
+    r'breakpoint',
+    r'kprobe',
+    r'tracepoint',
+    r'uprobe',
+]
+
+ILK_FILENAMES = {'busnum', 'devnum', 'vendor', 'device'}
+
+# With multiple workers, the directories down to this depth below the basepath
+# are scanned up front, and each subtree below them is walked as a separate task.
+SPLIT_DEPTH = 2
+
+
+class SysfsWalker(object):
+    """ Walks a basepath to find the USB devices and the ilk of every directory visited.
+
+    After a walk, visited_count is the number of directories that were
+    scanned, and pruned_count is the number of directories that were
+    skipped due to the prune patterns.
+
+    With more than one worker, sibling subtrees are walked concurrently.
+    """
+
+    def __init__(self, *, prune_patterns: List[str] = None, workers: int = 1):
+        patterns = list(DEFAULT_PRUNE_PATTERNS)
+        if prune_patterns is not None:
+            patterns.extend(prune_patterns)
+        self.prune_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+        self.workers = workers
+        self.visited_count = 0
+        self.pruned_count = 0
+
+    def is_pruned(self, dirname: str) -> bool:
+        return self.prune_pattern.fullmatch(dirname) is not None
+
+    def scan(self, dirpath: str) -> Tuple[str, List[str], int]:
+        """ Scan a single directory, returning its ilk, the subdirectories to visit, and the number pruned. """
+        found = set()
+        subdirpaths = []
+        pruned_count = 0
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name in ILK_FILENAMES:
+                        # Like os.walk, only count regular files, not links to directories.
+                        if not entry.is_dir():
+                            found.add(name)
+                    elif entry.is_dir(follow_symlinks=False):
+                        if self.is_pruned(name):
+                            pruned_count += 1
+                        else:
+                            subdirpaths.append(entry.path)
+        except OSError:
+            pass
+        if "busnum" in found and "devnum" in found:
+            ilk = "usb"
+        elif "vendor" in found and "device" in found:
+            ilk = "pci"
+        else:
+            ilk = "other"
+        return ilk, subdirpaths, pruned_count
+
+    def walk_subtree(self, basepath: str) -> Tuple[List[Tuple[str, str]], int, int]:
+        """ Walk a subtree top down, returning the (dirpath, ilk) pairs, visited count, and pruned count. """
+        ilk_pairs = []
+        pruned_count = 0
+        stack = [basepath]
+        while stack:
+            dirpath = stack.pop()
+            ilk, subdirpaths, pruned = self.scan(dirpath)
+            pruned_count += pruned
+            ilk_pairs.append((dirpath, ilk))
+            stack.extend(reversed(subdirpaths))
+        return ilk_pairs, len(ilk_pairs), pruned_count
+
+    def walk_concurrently(self, basepath: str) -> Tuple[List[Tuple[str, str]], int, int]:
+        """ Walk like walk_subtree, but with the subtrees below SPLIT_DEPTH walked on a thread pool. """
+        # Each item of the plan is either a (dirpath, ilk) pair already scanned, or
+        # a future for the walk of a subtree.  Expanding in preorder keeps the order
+        # of the merged results the same as for a sequential walk.
+        plan = []
+        pruned_count = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            stack = [(basepath, 0)]
+            while stack:
+                dirpath, depth = stack.pop()
+                if depth < SPLIT_DEPTH:
+                    ilk, subdirpaths, pruned = self.scan(dirpath)
+                    pruned_count += pruned
+                    plan.append((dirpath, ilk))
+                    stack.extend((subdirpath, depth + 1) for subdirpath in reversed(subdirpaths))
+                else:
+                    plan.append(executor.submit(self.walk_subtree, dirpath))
+            ilk_pairs = []
+            visited_count = 0
+            for item in plan:
+                if isinstance(item, concurrent.futures.Future):
+                    subtree_ilk_pairs, subtree_visited_count, subtree_pruned_count = item.result()
+                    ilk_pairs.extend(subtree_ilk_pairs)
+                    visited_count += subtree_visited_count
+                    pruned_count += subtree_pruned_count
+                else:
+                    ilk_pairs.append(item)
+                    visited_count += 1
+        return ilk_pairs, visited_count, pruned_count
+
+    def walk(self, basepath: str) -> Tuple[List[str], Dict[str, str]]:
+        """ Walk the basepath top down, in the same order as os.walk would. """
+        if self.workers > 1:
+            ilk_pairs, self.visited_count, self.pruned_count = self.walk_concurrently(basepath)
+        else:
+            ilk_pairs, self.visited_count, self.pruned_count = self.walk_subtree(basepath)
+        usb_device_paths = []
+        ilk_by_dirpath = {}
+        for dirpath, ilk in ilk_pairs:
+            ilk_by_dirpath[dirpath] = ilk
+            if ilk == "usb":
+                usb_device_paths.append(dirpath)
+        logger.info(f"Walked {basepath} - visited: {self.visited_count} pruned: {self.pruned_count}")
+        return usb_device_paths, ilk_by_dirpath
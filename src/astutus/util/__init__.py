@@ -3,6 +3,7 @@ from astutus.util.util_impl import create_user_data_dir_if_needed  # noqa
 from astutus.util.util_impl import get_setting  # noqa
 from astutus.util.util_impl import get_user_data_path  # noqa
 from astutus.util.util_impl import persist_setting  # noqa
+from astutus.util.util_impl import run_argv  # noqa
 from astutus.util.util_impl import run_cmd  # noqa
 from astutus.util.util_impl import run_cmds  # noqa
 from astutus.util.util_impl import convert_color_for_html_input_type_color  # noqa
\ No newline at end of file
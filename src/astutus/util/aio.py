@@ -0,0 +1,92 @@
+"""
+
+An asyncio API for running commands and reading sysfs.
+
+Web handlers and operations across many hosts spend most of their time
+waiting on subprocesses.  These coroutines let a single event loop drive
+many such queries at once, rather than blocking a thread for each one::
+
+    results = await asyncio.gather(*[
+        astutus.util.aio.run_argv(['ssh', f'pi@{ipv4}', '/usr/sbin/ifconfig'])
+        for ipv4 in ipv4s
+    ])
+
+Commands run as asyncio subprocesses, so they need no threads at all.
+Files in sysfs can not be read asynchronously by the operating system, so
+the sysfs reads are handed to the event loop's default executor, a
+bounded thread pool, keeping the event loop itself responsive.
+
+The results are the same as for the corresponding functions in
+astutus.util, astutus.util.sysfs, and astutus.util.pci.
+
+"""
+import asyncio
+import logging
+import os.path
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+import astutus.util.pci
+import astutus.util.sysfs
+import astutus.util.util_impl
+
+logger = logging.getLogger(__name__)
+
+
+async def communicate(process) -> (int, str, str):
+    stdout, stderr = await process.communicate()
+    decode_output = astutus.util.util_impl.decode_output
+    return process.returncode, decode_output(stdout), decode_output(stderr)
+
+
+async def run_cmd(cmd: str, *, cwd: str = None) -> (int, str, str):
+    process = await asyncio.create_subprocess_shell(
+        cmd,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE)
+    return await communicate(process)
+
+
+async def run_argv(argv: [str], *, cwd: str = None) -> (int, str, str):
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError as exception:
+        if not astutus.util.util_impl.is_missing_program(exception, argv):
+            raise
+        return 127, "", str(exception)
+    return await communicate(process)
+
+
+async def run_in_executor(func, *args):
+    """ Run a blocking function on the event loop's default executor. """
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def read_attribute(dirpath: str, filename: str) -> Optional[str]:
+    return await run_in_executor(astutus.util.sysfs.read_attribute, dirpath, filename)
+
+
+async def read_attributes(dirpath: str, filenames: List[str]) -> Dict[str, str]:
+    return await run_in_executor(astutus.util.sysfs.read_attributes, dirpath, filenames)
+
+
+async def read_uevent(dirpath: str) -> Dict[str, str]:
+    return await run_in_executor(astutus.util.sysfs.read_uevent, dirpath)
+
+
+async def get_slot_to_device_info_map_from_lspci() -> dict:
+    return_code, stdout, stderr = await run_argv(['lspci', '-mm', '-v'])
+    assert return_code == 0
+    assert len(stderr) == 0, stderr
+    return astutus.util.pci.parse_lspci_output(stdout)
+
+
+async def get_slot_to_device_info_map() -> dict:
+    """ Find PCI information keyed by slot, from sysfs if available, otherwise from lspci. """
+    if os.path.isdir(astutus.util.pci.SYS_BUS_PCI_DEVICES):
+        return await run_in_executor(astutus.util.pci.get_slot_to_device_info_map_from_sysfs)
+    return await get_slot_to_device_info_map_from_lspci()
@@ -0,0 +1,158 @@
+"""
+
+An opt-in cache for the results of shell commands that read slowly changing state.
+
+Commands such as ``lspci``, ``lsusb``, or ``ssh pi@... ifconfig`` are
+pure reads, but are run again by every call site that needs them.  A
+CommandCache runs such a command once, and returns the same result for
+later calls with the same command and working directory until the time
+to live for the command expires.
+
+Its run_cmd method has the same signature as astutus.util.run_cmd, so the
+cache can be passed anywhere a command_runner is accepted::
+
+    command_cache = astutus.util.command_cache.CommandCache(ttls={'lsusb': 5.0})
+    device_configurations = astutus.usb.DeviceConfigurations(command_runner=command_cache.run_cmd)
+
+The time to live for a command is found from the longest key of ttls that
+the command starts with, falling back to the default time to live.  A
+time to live of zero disables caching for matching commands.  Commands
+given as argument lists are matched, and keyed, by their shell quoted
+form, as produced by shlex.join.
+
+Only successful results are cached, so a command that fails is run again
+on the next call.
+
+Identical calls made concurrently from several threads only run the
+command once, with the other callers waiting for its result.
+
+"""
+import collections
+import concurrent.futures
+import logging
+import shlex
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union  # noqa
+
+import astutus.util.util_impl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_ENTRIES = 256
+
+
+class CommandCache(object):
+    """ Caches (return_code, stdout, stderr) by command and working directory. """
+
+    def __init__(
+            self,
+            *,
+            default_ttl: float = DEFAULT_TTL,
+            ttls: Dict[str, float] = None,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            command_runner=astutus.util.util_impl.run_cmd,
+            clock: Callable[[], float] = time.monotonic):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls) if ttls is not None else {}
+        self.max_entries = max_entries
+        self.command_runner = command_runner
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Maps (cmd, cwd) to (expiration_time, result), in least recently used order.
+        self.entries = collections.OrderedDict()
+        self.in_flight = {}  # type: Dict[Tuple[str, str], concurrent.futures.Future]
+        # Incremented on each invalidation, so that results of commands started before it are not stored.
+        self.generation = 0
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+
+    def get_ttl(self, cmd: str) -> float:
+        matches = [prefix for prefix in self.ttls if cmd.startswith(prefix)]
+        if not matches:
+            return self.default_ttl
+        return self.ttls[max(matches, key=len)]
+
+    def run_cmd(self, cmd: Union[str, List[str]], *, cwd: str = None) -> (int, str, str):
+        cmd_text = cmd if isinstance(cmd, str) else shlex.join(cmd)
+        ttl = self.get_ttl(cmd_text)
+        if ttl <= 0:
+            with self.lock:
+                self.misses[cmd_text] += 1
+            return self.command_runner(cmd, cwd=cwd)
+        key = (cmd_text, cwd)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expiration_time, result = entry
+                if self.clock() < expiration_time:
+                    self.entries.move_to_end(key)
+                    self.hits[cmd_text] += 1
+                    return result
+                del self.entries[key]
+            future = self.in_flight.get(key)
+            if future is not None:
+                # Another thread is already running this command, so share its result.
+                self.hits[cmd_text] += 1
+                owner = False
+            else:
+                future = concurrent.futures.Future()
+                self.in_flight[key] = future
+                self.misses[cmd_text] += 1
+                generation = self.generation
+                owner = True
+        if not owner:
+            return future.result()
+        try:
+            result = self.command_runner(cmd, cwd=cwd)
+        except BaseException as exception:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(exception)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            # Skip storing the result if the command failed, or the cache was invalidated while it ran.
+            if result[0] == 0 and generation == self.generation:
+                self.entries[key] = (self.clock() + ttl, result)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def invalidate(self, cmd_prefix: str = None, *, cwd: str = None) -> int:
+        """ Drop cached results, returning the number dropped.
+
+        With no arguments, everything is dropped.  Otherwise only the
+        results for commands starting with cmd_prefix, and if given, run
+        in the directory cwd are dropped.
+        """
+        with self.lock:
+            self.generation += 1
+            keys = [
+                key for key in self.entries
+                if (cmd_prefix is None or key[0].startswith(cmd_prefix)) and (cwd is None or key[1] == cwd)
+            ]
+            for key in keys:
+                del self.entries[key]
+        return len(keys)
+
+    def get_stats(self) -> List[Dict]:
+        """ Get the hits and misses for each command, with the most frequently run commands first. """
+        with self.lock:
+            cmds = set(self.hits) | set(self.misses)
+            stats = [{'cmd': cmd, 'hits': self.hits[cmd], 'misses': self.misses[cmd]} for cmd in cmds]
+        stats.sort(key=lambda item: (-(item['hits'] + item['misses']), item['cmd']))
+        return stats
+
+
+command_cache = None
+
+
+def get_command_cache() -> CommandCache:
+    """ Get a process wide command cache, with the default settings. """
+    global command_cache
+    if command_cache is None:
+        command_cache = CommandCache()
+    return command_cache
@@ -0,0 +1,218 @@
+"""
+
+In-process lookup of the names in the usb.ids and pci.ids hardware databases.
+
+Tools like ``lsusb`` and ``lspci`` get their descriptive names from these
+files.  Rather than running such a tool for each device just to get its
+name, the file is parsed once into integer keyed dictionaries.  The
+parsed form is pickled into the user's data directory, so that later
+processes can load it without parsing the text again.  The cached form
+is rebuilt automatically whenever the source file changes.
+
+Both files share a format, with a vendor section at the top::
+
+    vvvv  vendor_name
+    <tab>dddd  device_name
+    <tab><tab>ssss ssss  subsystem_name  (pci.ids only)
+
+followed by other sections, of which only the device class section
+is of interest::
+
+    C cc  class_name
+    <tab>ss  subclass_name
+    <tab><tab>pp  programming_interface_name
+
+"""
+import logging
+import os
+import os.path
+import pickle
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+import astutus.util.util_impl
+
+logger = logging.getLogger(__name__)
+
+USB_IDS_FILEPATHS = [
+    '/usr/share/hwdata/usb.ids',
+    '/usr/share/misc/usb.ids',
+    '/usr/share/usb.ids',
+    '/var/lib/usbutils/usb.ids',
+]
+
+PCI_IDS_FILEPATHS = [
+    '/usr/share/hwdata/pci.ids',
+    '/usr/share/misc/pci.ids',
+    '/usr/share/pci.ids',
+]
+
+# Increment when the pickled layout of IdsDatabase changes.
+CACHE_FORMAT_VERSION = 1
+
+
+def is_hex(value: str) -> bool:
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+class IdsDatabase(object):
+    """ The names from a usb.ids or pci.ids file, keyed by integer ids. """
+
+    def __init__(self):
+        self.vendors = {}  # type: Dict[int, str]
+        # Keyed by vendor << 16 | device
+        self.devices = {}  # type: Dict[int, str]
+        # Keyed by vendor << 48 | device << 32 | subvendor << 16 | subdevice
+        self.subsystems = {}  # type: Dict[int, str]
+        # Keyed by the hex digits of the class, class + subclass, and class + subclass + interface.
+        self.classes = {}  # type: Dict[str, str]
+
+    @staticmethod
+    def as_int(value) -> int:
+        if isinstance(value, int):
+            return value
+        if value.startswith('0x'):
+            value = value[2:]
+        return int(value, 16)
+
+    def parse_lines(self, lines) -> None:
+        section = 'vendor'
+        vendor = None
+        device = None
+        class_code = None
+        subclass_code = None
+        for line in lines:
+            if not line.strip() or line.startswith('#'):
+                continue
+            if not line.startswith('\t'):
+                head, _, name = line.partition('  ')
+                if len(head) == 4 and is_hex(head):
+                    section = 'vendor'
+                    vendor = int(head, 16)
+                    device = None
+                    self.vendors[vendor] = name.strip()
+                elif head.startswith('C '):
+                    section = 'class'
+                    class_code = head[2:].strip().lower()
+                    subclass_code = None
+                    self.classes[class_code] = name.strip()
+                else:
+                    # Some other section, such as the HID usages in usb.ids.
+                    section = None
+            elif section == 'vendor' and vendor is not None:
+                if line.startswith('\t\t'):
+                    head, _, name = line[2:].partition('  ')
+                    subvendor, _, subdevice = head.partition(' ')
+                    if device is not None and is_hex(subvendor) and is_hex(subdevice):
+                        key = vendor << 48 | device << 32 | int(subvendor, 16) << 16 | int(subdevice, 16)
+                        self.subsystems[key] = name.strip()
+                else:
+                    head, _, name = line[1:].partition('  ')
+                    if is_hex(head):
+                        device = int(head, 16)
+                        self.devices[vendor << 16 | device] = name.strip()
+            elif section == 'class' and class_code is not None:
+                if line.startswith('\t\t'):
+                    head, _, name = line[2:].partition('  ')
+                    if subclass_code is not None:
+                        self.classes[subclass_code + head.lower()] = name.strip()
+                else:
+                    head, _, name = line[1:].partition('  ')
+                    subclass_code = class_code + head.lower()
+                    self.classes[subclass_code] = name.strip()
+
+    def vendor_name(self, vendor) -> Optional[str]:
+        return self.vendors.get(self.as_int(vendor))
+
+    def device_name(self, vendor, device) -> Optional[str]:
+        return self.devices.get(self.as_int(vendor) << 16 | self.as_int(device))
+
+    def subsystem_name(self, vendor, device, subvendor, subdevice) -> Optional[str]:
+        key = (self.as_int(vendor) << 48 | self.as_int(device) << 32
+               | self.as_int(subvendor) << 16 | self.as_int(subdevice))
+        return self.subsystems.get(key)
+
+    def class_name(self, class_code: str) -> Optional[str]:
+        """ Look up a class by hex digits - cc for a class, ccss for a subclass, or ccsspp for an interface. """
+        return self.classes.get(class_code.lower())
+
+
+def find_ids_filepath(candidate_filepaths: List[str]) -> Optional[str]:
+    for filepath in candidate_filepaths:
+        if os.path.isfile(filepath):
+            return filepath
+    return None
+
+
+def get_cache_dirpath() -> str:
+    return os.path.join(astutus.util.util_impl.get_user_data_path(), 'cache')
+
+
+def load_ids_database(filepath: str, *, cache_dirpath: str = None) -> IdsDatabase:
+    """ Load the database for an ids file, using the pickled form if it is up to date. """
+    if cache_dirpath is None:
+        cache_dirpath = get_cache_dirpath()
+    stat = os.stat(filepath)
+    source_key = (CACHE_FORMAT_VERSION, os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+    cache_filepath = os.path.join(cache_dirpath, os.path.basename(filepath) + '.pickle')
+    try:
+        with open(cache_filepath, 'rb') as cache_file:
+            cached_source_key, database = pickle.load(cache_file)
+        if cached_source_key == source_key:
+            return database
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+        pass
+    logger.info(f"Parsing hardware ids file {filepath}")
+    database = IdsDatabase()
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as ids_file:
+        database.parse_lines(ids_file)
+    try:
+        os.makedirs(cache_dirpath, exist_ok=True)
+        with open(cache_filepath, 'wb') as cache_file:
+            pickle.dump((source_key, database), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as exception:
+        logger.warning(f"Unable to cache hardware ids database in {cache_filepath}: {exception}")
+    return database
+
+
+usb_ids = None
+usb_ids_loaded = False
+
+
+def get_usb_ids() -> Optional[IdsDatabase]:
+    """ Get the database for the system's usb.ids file, or None if there is no such file.
+
+    The file is only loaded once per process.
+    """
+    global usb_ids, usb_ids_loaded
+    if not usb_ids_loaded:
+        filepath = find_ids_filepath(USB_IDS_FILEPATHS)
+        if filepath is None:
+            logger.warning("No usb.ids file found.")
+        else:
+            usb_ids = load_ids_database(filepath)
+        usb_ids_loaded = True
+    return usb_ids
+
+
+pci_ids = None
+pci_ids_loaded = False
+
+
+def get_pci_ids() -> Optional[IdsDatabase]:
+    """ Get the database for the system's pci.ids file, or None if there is no such file.
+
+    The file is only loaded once per process.
+    """
+    global pci_ids, pci_ids_loaded
+    if not pci_ids_loaded:
+        filepath = find_ids_filepath(PCI_IDS_FILEPATHS)
+        if filepath is None:
+            logger.warning("No pci.ids file found.")
+        else:
+            pci_ids = load_ids_database(filepath)
+        pci_ids_loaded = True
+    return pci_ids
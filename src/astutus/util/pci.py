@@ -1,5 +1,18 @@
+import logging
+import os
+import os.path
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+import astutus.util.hwdata
+import astutus.util.sysfs
 import astutus.util.util_impl
 
+logger = logging.getLogger(__name__)
+
+SYS_BUS_PCI_DEVICES = '/sys/bus/pci/devices'
+
+PCI_INFO_ATTRIBUTES = ['vendor', 'device', 'class', 'subsystem_vendor', 'subsystem_device', 'revision', 'numa_node']
+
 
 def get_device_info_from_dirname(device_info_map, dirname):
     slot = dirname[5:]
@@ -12,11 +25,19 @@ def get_slot_to_device_info_map_from_lspci(*, command_runner=None) -> dict:
     Produces a dictionary keyed by slot, with the value being a
     dictionary of attributes.
     """
-    if command_runner is None:
-        command_runner = astutus.util.util_impl.run_cmd
     # For lspci
     # -mm             Produce machine-readable output
-    return_code, stdout, stderr = command_runner('lspci -mm -v')
+    if command_runner is None:
+        return_code, stdout, stderr = astutus.util.util_impl.run_argv(['lspci', '-mm', '-v'])
+    else:
+        return_code, stdout, stderr = command_runner('lspci -mm -v')
+    assert return_code == 0
+    assert len(stderr) == 0, stderr
+    return parse_lspci_output(stdout)
+
+
+def parse_lspci_output(stdout: str) -> dict:
+    """ Parse the output of lspci -mm -v into a dictionary keyed by slot. """
     # Sample Output with blank lines between devices:
     #
     # Slot:   04:00.0
@@ -28,8 +49,6 @@ def get_slot_to_device_info_map_from_lspci(*, command_runner=None) -> dict:
     # Rev:    01
     # ProgIf: 01
     # NUMANode:
-    assert return_code == 0
-    assert len(stderr) == 0, stderr
     slot_to_device_info_map = {}
     device_info = {}
     for line in stdout.splitlines():
@@ -45,3 +64,93 @@ def get_slot_to_device_info_map_from_lspci(*, command_runner=None) -> dict:
         slot_to_device_info_map[device_info['Slot']] = device_info
         device_info = {}
     return slot_to_device_info_map
+
+
+def slot_from_dirname(dirname: str) -> str:
+    """ Convert a sysfs PCI dirname like 0000:04:00.0 to the slot as shown by lspci, like 04:00.0 """
+    if dirname.startswith('0000:'):
+        return dirname[5:]
+    return dirname
+
+
+def dirname_from_slot(slot: str) -> str:
+    if slot.count(':') == 1:
+        return '0000:' + slot
+    return slot
+
+
+def get_device_info_for_dirpath(dirpath: str) -> Optional[Dict[str, str]]:
+    """ Find the PCI information for a device directory, in the same form as the lspci -mm -v output.
+
+    The identifiers are read from sysfs, and the names are resolved through the
+    pci.ids database.  Returns None if the directory is not a PCI device.
+    """
+    attributes = astutus.util.sysfs.read_attributes(dirpath, PCI_INFO_ATTRIBUTES)
+    if attributes.get('vendor') is None or attributes.get('device') is None:
+        return None
+    pci_ids = astutus.util.hwdata.get_pci_ids()
+    if pci_ids is None:
+        # With an empty database, all of the names fall back to the numeric ids, just like lspci.
+        pci_ids = astutus.util.hwdata.IdsDatabase()
+    vendor = int(attributes['vendor'], 16)
+    device = int(attributes['device'], 16)
+    pci_class = int(attributes.get('class', '0'), 16)
+    _, dirname = dirpath.rstrip('/').rsplit('/', 1)
+    device_info = {
+        'Slot': slot_from_dirname(dirname),
+        'Class': pci_ids.class_name(f"{pci_class >> 8:04x}") or f"Class {pci_class >> 8:04x}",
+        'Vendor': pci_ids.vendor_name(vendor) or f"Vendor {vendor:04x}",
+        'Device': pci_ids.device_name(vendor, device) or f"Device {device:04x}",
+    }
+    subsystem_vendor = int(attributes.get('subsystem_vendor', '0'), 16)
+    subsystem_device = int(attributes.get('subsystem_device', '0'), 16)
+    if subsystem_vendor not in (0, 0xffff):
+        device_info['SVendor'] = pci_ids.vendor_name(subsystem_vendor) or f"Vendor {subsystem_vendor:04x}"
+        subsystem_name = pci_ids.subsystem_name(vendor, device, subsystem_vendor, subsystem_device)
+        if subsystem_name is None and (subsystem_vendor, subsystem_device) == (vendor, device):
+            subsystem_name = device_info['Device']
+        device_info['SDevice'] = subsystem_name or f"Device {subsystem_device:04x}"
+    revision = int(attributes.get('revision', '0'), 16)
+    if revision != 0:
+        device_info['Rev'] = f"{revision:02x}"
+    programming_interface = pci_class & 0xff
+    if programming_interface != 0:
+        device_info['ProgIf'] = f"{programming_interface:02x}"
+    numa_node = attributes.get('numa_node')
+    if numa_node is not None and numa_node != '-1':
+        device_info['NUMANode'] = numa_node
+    return device_info
+
+
+def get_device_info_for_slot(
+        slot: str,
+        *,
+        sysfs_dirpath: str = SYS_BUS_PCI_DEVICES,
+        command_runner=None) -> Optional[Dict[str, str]]:
+    """ Find the PCI information for a single slot, without enumerating all of the PCI devices.
+
+    If sysfs is unavailable, falls back to lspci, run with the command_runner if one is given.
+    """
+    if not os.path.isdir(sysfs_dirpath):
+        return get_slot_to_device_info_map_from_lspci(command_runner=command_runner).get(slot)
+    return get_device_info_for_dirpath(os.path.join(sysfs_dirpath, dirname_from_slot(slot)))
+
+
+def get_slot_to_device_info_map_from_sysfs(*, sysfs_dirpath: str = SYS_BUS_PCI_DEVICES) -> dict:
+    """ Find PCI information by reading sysfs, with names from the pci.ids database.
+
+    Produces the same dictionary, keyed by slot, as get_slot_to_device_info_map_from_lspci.
+    """
+    slot_to_device_info_map = {}
+    for dirname in sorted(os.listdir(sysfs_dirpath)):
+        device_info = get_device_info_for_dirpath(os.path.join(sysfs_dirpath, dirname))
+        if device_info is not None:
+            slot_to_device_info_map[device_info['Slot']] = device_info
+    return slot_to_device_info_map
+
+
+def get_slot_to_device_info_map(*, sysfs_dirpath: str = SYS_BUS_PCI_DEVICES, command_runner=None) -> dict:
+    """ Find PCI information keyed by slot, from sysfs if available, otherwise from lspci. """
+    if os.path.isdir(sysfs_dirpath):
+        return get_slot_to_device_info_map_from_sysfs(sysfs_dirpath=sysfs_dirpath)
+    return get_slot_to_device_info_map_from_lspci(command_runner=command_runner)
@@ -0,0 +1,92 @@
+"""
+
+Direct, in-process access to the attribute files in the /sys hierarchy.
+
+The attribute files are tiny and are produced by the kernel on demand,
+so reading them directly is far cheaper than running a command such as
+``cat`` in a subprocess for each one.  A missing or unreadable attribute
+is reported as None, rather than as an error, since the absence of an
+attribute is routinely used to decide what kind of device a directory
+represents.
+
+"""
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+
+def read_attribute(dirpath: str, filename: str) -> Optional[str]:
+    """ Read a single attribute file, returning the stripped value or None if not readable. """
+    filepath = os.path.join(dirpath, filename)
+    try:
+        with open(filepath, 'rb') as attribute_file:
+            raw_value = attribute_file.read()
+    except OSError:
+        return None
+    try:
+        return raw_value.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        return "<<not unicode>>"
+
+
+def read_attributes(dirpath: str, filenames: List[str]) -> Dict[str, str]:
+    """ Read the attribute files of a directory.
+
+    Only the attributes that could be read are present in the returned
+    dictionary.  The directory file descriptor is opened once, so the
+    path to the directory is only resolved once for all of the attributes.
+    """
+    attributes = {}
+    try:
+        dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return attributes
+    try:
+        for filename in filenames:
+            try:
+                fd = os.open(filename, os.O_RDONLY, dir_fd=dir_fd)
+            except OSError:
+                continue
+            try:
+                raw_value = os.read(fd, 65536)
+            except OSError:
+                continue
+            finally:
+                os.close(fd)
+            try:
+                attributes[filename] = raw_value.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                attributes[filename] = "<<not unicode>>"
+    finally:
+        os.close(dir_fd)
+    return attributes
+
+
+def read_uevent(dirpath: str) -> Dict[str, str]:
+    """ Read the uevent file of a device directory as a dictionary of KEY=VALUE pairs.
+
+    The uevent file holds several of the identifying attributes of a
+    device in a single small file.  An empty dictionary is returned
+    if the file is not readable.
+    """
+    content = read_attribute(dirpath, 'uevent')
+    if content is None:
+        return {}
+    uevent = {}
+    for line in content.splitlines():
+        if '=' in line:
+            key, value = line.split('=', 1)
+            uevent[key] = value
+    return uevent
+
+
+def read_binary_attribute(dirpath: str, filename: str) -> Optional[bytes]:
+    """ Read a binary attribute file, such as the descriptors of a USB device, or None if not readable. """
+    filepath = os.path.join(dirpath, filename)
+    try:
+        with open(filepath, 'rb') as attribute_file:
+            return attribute_file.read()
+    except OSError:
+        return None
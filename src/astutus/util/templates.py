@@ -0,0 +1,79 @@
+"""
+
+Compiled format templates, that tolerate missing fields.
+
+The description templates for aliases, device configurations, and
+classifier rules are written by users, so they may refer to fields that a
+particular device does not have.  Rather than failing, such fields are
+rendered with a placeholder::
+
+    astutus.util.templates.render("{product} - {serial}", {'product': 'Hub'})
+    # 'Hub - --serial missing--'
+
+Each template is parsed once, recording the fields it refers to, and the
+compiled template is cached by the template string.  Rendering then looks
+up just those fields, and formats in a single pass.
+
+"""
+import functools
+import logging
+import string
+from typing import Dict, List, Mapping, Optional, Set, Tuple  # noqa
+
+logger = logging.getLogger(__name__)
+
+MAX_COMPILED_TEMPLATES = 1024
+
+
+def missing_placeholder(field: str) -> str:
+    return f"--{field} missing--"
+
+
+def find_field_names(template: str) -> List[str]:
+    """ Find the names at the start of the replacement fields, including those nested in format specs. """
+    field_names = []
+    for _, field_name, format_spec, _ in string.Formatter().parse(template):
+        if field_name is None:
+            continue
+        # For {name.attribute} or {name[index]}, only the name is looked up in the data.
+        name = field_name.split('.', 1)[0].split('[', 1)[0]
+        if name not in field_names:
+            field_names.append(name)
+        if format_spec and '{' in format_spec:
+            for nested_name in find_field_names(format_spec):
+                if nested_name not in field_names:
+                    field_names.append(nested_name)
+    return field_names
+
+
+class CompiledTemplate(object):
+
+    def __init__(self, template: str):
+        self.template = template
+        self.field_names = find_field_names(template)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.template!r})"
+
+    def render(self, *maps: Mapping) -> str:
+        """ Format the template with each field taken from the first of the maps that has it. """
+        values = {}
+        for name in self.field_names:
+            for data in maps:
+                if name in data:
+                    values[name] = data[name]
+                    break
+            else:
+                logger.debug(f'Missing field for template {self.template!r}: {name}')
+                values[name] = missing_placeholder(name)
+        return self.template.format_map(values)
+
+
+@functools.lru_cache(maxsize=MAX_COMPILED_TEMPLATES)
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+def render(template: str, *maps: Mapping) -> str:
+    """ Render a template, with a placeholder for any field that is in none of the maps. """
+    return compile_template(template).render(*maps)
@@ -5,10 +5,14 @@ import astutus.util.util_impl
 
 logger = logging.getLogger(__name__)
 
+HASH_HEX_PATTERN = re.compile(r"^#([a-f,0-9]{2})([a-f,0-9]{2})([a-f,0-9]{2})$", re.IGNORECASE)
+
 
 class AnsiSequenceStack(object):
 
     RESET_ALL = '\x1b[0m'
+    # Shared by all stacks, since the same few colors are used over and over again.
+    escape_sequence_by_attribute = {}
 
     def __init__(self):
         self.stack = []
@@ -17,9 +21,8 @@ class AnsiSequenceStack(object):
     def hash_hex_to_escape_sequence(hash_hex: str) -> str:
         # Parse the attribute that might be something like #00ffff into an ANSI escape sequence.
         # Need to translate it to something like:  'orange': '\x1b[38;2;255;165;0m',
-        pattern = r"^#([a-f,0-9]{2})([a-f,0-9]{2})([a-f,0-9]{2})$"
-        matches = re.match(pattern, hash_hex, re.IGNORECASE)
-        assert matches, (pattern, hash_hex)
+        matches = HASH_HEX_PATTERN.match(hash_hex)
+        assert matches, (HASH_HEX_PATTERN.pattern, hash_hex)
         rr = matches.group(1)
         gg = matches.group(2)
         bb = matches.group(3)
@@ -31,11 +34,15 @@ class AnsiSequenceStack(object):
 
     @staticmethod
     def attribute_to_escape_sequence(attribute):
-        if attribute.startswith("#"):
-            return AnsiSequenceStack.hash_hex_to_escape_sequence(attribute)
-        else:
-            hash_hex = astutus.util.util_impl.convert_color_for_html_input_type_color(attribute)
-            return AnsiSequenceStack.hash_hex_to_escape_sequence(hash_hex)
+        escape_sequence = AnsiSequenceStack.escape_sequence_by_attribute.get(attribute)
+        if escape_sequence is None:
+            if attribute.startswith("#"):
+                escape_sequence = AnsiSequenceStack.hash_hex_to_escape_sequence(attribute)
+            else:
+                hash_hex = astutus.util.util_impl.convert_color_for_html_input_type_color(attribute)
+                escape_sequence = AnsiSequenceStack.hash_hex_to_escape_sequence(hash_hex)
+            AnsiSequenceStack.escape_sequence_by_attribute[attribute] = escape_sequence
+        return escape_sequence
 
     def push(self, attribute):
         escape_sequence = self.attribute_to_escape_sequence(attribute)
@@ -1,15 +1,29 @@
+import concurrent.futures
 import json
 import logging
 import os
 import os.path
 import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
 import webcolors
 
 logger = logging.getLogger(__name__)
 
 
-def run_cmd(cmd: str, *, cwd: str = None) -> (int, str, str):
+def decode_output(raw_output: bytes) -> str:
+    try:
+        return raw_output.decode('utf-8')
+    except UnicodeDecodeError:
+        return "<<not unicode>>"
+
+
+def run_cmd(cmd: Union[str, List[str]], *, cwd: str = None) -> (int, str, str):
+    """ Run a shell command string, or an argument list without a shell, as for run_argv. """
+    if not isinstance(cmd, str):
+        return run_argv(cmd, cwd=cwd)
     completed_process = subprocess.run(
             args=cmd,
             cwd=cwd,
@@ -17,29 +31,144 @@ def run_cmd(cmd: str, *, cwd: str = None) -> (int, str, str):
             capture_output=True
         )
     return_code = completed_process.returncode
-    try:
-        stdout = completed_process.stdout.decode('utf-8')
-    except UnicodeDecodeError:
-        stdout = "<<not unicode>>"
-    try:
-        stderr = completed_process.stderr.decode('utf-8')
-    except UnicodeDecodeError:
-        stderr = "<<not unicode>>"
+    stdout = decode_output(completed_process.stdout)
+    stderr = decode_output(completed_process.stderr)
     return return_code, stdout, stderr
 
 
-def run_cmds(cmds: [str], cwd: str = None, stop_on_error: bool = True) -> [(int, str, str)]:
-    results = []
-    for cmd in cmds:
+def is_missing_program(exception: FileNotFoundError, argv: [str]) -> bool:
+    """ Tell whether starting argv failed because the program, rather than the working directory, was not found. """
+    return exception.filename == argv[0]
+
+
+def run_argv(argv: [str], *, cwd: str = None, stdout_callback=None) -> (int, str, str):
+    """ Run a program directly from an argument list, without starting a shell.
+
+    The return value is the same as for run_cmd.  Like the shell, a
+    program that can not be found is reported with a return code of 127.
+    As for run_cmd, a working directory that does not exist raises
+    FileNotFoundError.
+
+    If stdout_callback is given, it is called with each line of stdout as
+    soon as it is produced, as well as the full stdout being returned.
+    """
+    try:
+        if stdout_callback is None:
+            completed_process = subprocess.run(args=argv, cwd=cwd, capture_output=True)
+            return (
+                completed_process.returncode,
+                decode_output(completed_process.stdout),
+                decode_output(completed_process.stderr)
+            )
+        process = subprocess.Popen(args=argv, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as exception:
+        if not is_missing_program(exception, argv):
+            raise
+        return 127, "", str(exception)
+    # Drain stderr on a separate thread, so that neither pipe can fill up and block the program.
+    stderr_chunks = []
+    stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()))
+    stderr_thread.start()
+    stdout_lines = []
+    for raw_line in process.stdout:
+        line = decode_output(raw_line)
+        stdout_lines.append(line)
+        stdout_callback(line)
+    stderr_thread.join()
+    return_code = process.wait()
+    process.stdout.close()
+    process.stderr.close()
+    return return_code, "".join(stdout_lines), decode_output(b"".join(stderr_chunks))
+
+
+def run_cmds(
+        cmds: [Union[str, List[str]]],
+        cwd: str = None,
+        stop_on_error: bool = True,
+        command_runner=None,
+        *,
+        max_workers: int = 1,
+        dependencies: Dict[int, List[int]] = None,
+        with_timings: bool = False) -> [Optional[Tuple]]:
+    """ Run a batch of commands, each given as a shell command string or an argument list.
+
+    Each command is run with the command_runner, which defaults to run_cmd,
+    so it must accept both forms.
+
+    By default, the commands run one after another, and with stop_on_error,
+    the batch stops at the first command that fails.
+
+    To run commands concurrently, give max_workers, and the dependencies
+    as a dictionary from the index of a command to the indices of the
+    earlier commands that must finish before it starts.  Commands without
+    dependencies are independent.  With stop_on_error, a command is skipped
+    if any of its dependencies failed or was skipped.
+
+    When run concurrently, there is a result for each command, in the order
+    of the commands, with None for the skipped commands.  With with_timings, each result has a fourth item, a
+    dictionary with the start of the command relative to the start of the
+    batch and its duration, both in seconds.
+    """
+    # Command runner is a dependency injection point, such as for the run_cmd of a CommandCache
+    if command_runner is None:
+        command_runner = run_cmd
+    batch_start_time = time.monotonic()
+
+    def run_one(cmd):
         logger.debug(f"cmd: {cmd}")
-        result = run_cmd(cmd, cwd=cwd)
+        start_time = time.monotonic()
+        result = command_runner(cmd, cwd=cwd)
         logger.debug(f"result: {result}")
-        results.append(result)
-        if stop_on_error:
-            return_code, _, _ = result
-            if return_code != 0:
-                break
-    return results
+        if with_timings:
+            timing = {
+                'start': start_time - batch_start_time,
+                'duration': time.monotonic() - start_time,
+            }
+            result = (*result, timing)
+        return result
+
+    if dependencies is None and max_workers <= 1:
+        results = []
+        for cmd in cmds:
+            result = run_one(cmd)
+            results.append(result)
+            if stop_on_error:
+                return_code = result[0]
+                if return_code != 0:
+                    break
+        return results
+
+    if dependencies is None:
+        # Without a hint, keep the commands in order.
+        dependencies = {idx: [idx - 1] for idx in range(1, len(cmds))}
+    for idx, prerequisites in dependencies.items():
+        for prerequisite in prerequisites:
+            if not 0 <= prerequisite < idx < len(cmds):
+                raise ValueError(f"Command {idx} can only depend on earlier commands, not {prerequisite}")
+    results_by_idx = {}
+    skipped = set()
+    pending = list(range(len(cmds)))
+    futures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or futures:
+            still_pending = []
+            for idx in pending:
+                prerequisites = dependencies.get(idx, [])
+                if any(prerequisite not in results_by_idx and prerequisite not in skipped
+                       for prerequisite in prerequisites):
+                    still_pending.append(idx)
+                elif stop_on_error and any(
+                        prerequisite in skipped or results_by_idx[prerequisite][0] != 0
+                        for prerequisite in prerequisites):
+                    skipped.add(idx)
+                else:
+                    futures[executor.submit(run_one, cmds[idx])] = idx
+            pending = still_pending
+            if futures:
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    results_by_idx[futures.pop(future)] = future.result()
+    return [results_by_idx.get(idx) for idx in range(len(cmds))]
 
 
 def get_user_data_path():
@@ -80,14 +209,46 @@ def persist_setting(category_as_url, attribute, value):
         json.dump(categories, settings_file, indent=4, sort_keys=True)
 
 
+# The colors used when none is specified, picked to work against either black or white.
+DEFAULT_COLOR = 'green'
+
+hex_by_color_name = None
+# Memoizes convert_color_for_html_input_type_color, including for hex values.
+resolved_color_by_color = {}  # type: Dict[str, str]
+
+
+def get_hex_by_color_name() -> Dict[str, str]:
+    """ Get the #rrggbb value for each CSS color name, computed once per process. """
+    global hex_by_color_name
+    if hex_by_color_name is None:
+        try:
+            names = webcolors.names('css3')
+        except AttributeError:
+            # Older versions of webcolors provide the table directly.
+            hex_by_color_name = dict(webcolors.CSS3_NAMES_TO_HEX)
+        else:
+            hex_by_color_name = {name: webcolors.name_to_hex(name) for name in names}
+    return hex_by_color_name
+
+
+def resolve_color(color: str) -> str:
+    if color.startswith("#"):
+        # Hex values are passed through as is, so that they round trip through the aliases and web color inputs.
+        return color
+    resolved_color = get_hex_by_color_name().get(color.lower())
+    if resolved_color is None:
+        # Raises a ValueError for names that are not colors.
+        resolved_color = webcolors.name_to_hex(color)
+    return resolved_color
+
+
 def convert_color_for_html_input_type_color(color):
     # Need to interpret named color into hexidecimal format
-    if color is None:
-        # Pick a color that works against either black or white
-        color = webcolors.name_to_hex('green')
-    elif color == 'None':
-        color = webcolors.name_to_hex('green')
-    elif not color.startswith("#"):
-        color = webcolors.name_to_hex(color)
-    assert color.startswith("#")
-    return color
+    if color is None or color == 'None':
+        color = DEFAULT_COLOR
+    resolved_color = resolved_color_by_color.get(color)
+    if resolved_color is None:
+        resolved_color = resolve_color(color)
+        resolved_color_by_color[color] = resolved_color
+    assert resolved_color.startswith("#")
+    return resolved_color
@@ -132,7 +132,8 @@ def handle_label(path):
         result = {
             'html_label': node_data.get('html_label'),
             'sys_devices_path': sys_devices_path,
-            'node_data': node_data,
+            # Serialize the labels, as the node data did before they were rendered on first use.
+            'node_data': node_data.include_labels(),
         }
         return result, HTTPStatus.OK
 
@@ -177,7 +178,7 @@ def handle_usb_device():
     if flask.request.method == 'GET':
         begin = datetime.now()
         logger.info("Start device tree data creation")
-        pci_device_info_map = astutus.util.pci.get_slot_to_device_info_map_from_lspci()
+        pci_device_info_map = astutus.util.pci.get_slot_to_device_info_map()
         logger.debug(f"pci_device_info_map: {pci_device_info_map}")
         device_tree = astutus.usb.UsbDeviceTree(basepath=None, device_aliases_filepath=None)
         device_configurations = astutus.usb.DeviceConfigurations()